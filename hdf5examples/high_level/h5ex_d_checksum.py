@@ -6,6 +6,8 @@ the Fletcher32 checksum filter.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_checksum.h5"
 DATASET = "DS1"
 
@@ -14,28 +16,29 @@ DIM1 = 64
 CHUNK0 = 4
 CHUNK1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create the dataset with chunking and the Fletcher32 filter.
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), chunks=(CHUNK0, CHUNK1),
-                                fletcher32=True, dtype='<i4')
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, chunks=tuple(chunks),
+                                fletcher32=True, dtype=dtype)
         dset[...] = wdata
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
         if f[DATASET].fletcher32:
-            print("Filter type is H5Z_FILTER_FLETCHER32.")
+            if not quiet:
+                print("Filter type is H5Z_FILTER_FLETCHER32.")
         else:
             raise RuntimeError("Fletcher32 filter not retrieved.")
 
-        rdata = np.zeros((DIM0, DIM1))
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
 
     # Verify that the dataset was read correctly.
@@ -11,6 +11,8 @@ result to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_fillval.h5"
 DATASET = "DS1"
 
@@ -22,41 +24,45 @@ CHUNK0 = 4
 CHUNK1 = 4
 FILLVAL = 99
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+def run(shape=(DIM0, DIM1), extdims=(EDIM0, EDIM1), chunks=(CHUNK0, CHUNK1),
+        dtype='<i4', filename=FILE, quiet=False):
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), maxshape=(None, None),
-                                chunks=(CHUNK0, CHUNK1), fillvalue=FILLVAL,
-                                dtype='<i4')
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, maxshape=(None, None),
+                                chunks=tuple(chunks), fillvalue=FILLVAL,
+                                dtype=dtype)
 
         # Read from the dataset, which has not been written to yet.
-        print("\nDataset before being written to:")
-        rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
-        print(rdata)
+        if not quiet:
+            print("\nDataset before being written to:")
+            print(rdata)
 
         # Write the data to the dataset.
         dset[...] = wdata
 
         # Read the data back.
-        print("\nDataset after being written to:")
-        rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
-        print(rdata)
+        if not quiet:
+            print("\nDataset after being written to:")
+            print(rdata)
 
         # Extend the dataset.
-        dset.resize((EDIM0, EDIM1))
+        dset.resize(extdims)
 
         # Read from the extended dataset.
-        print("\nDataset after extension:")
-        rdata2 = np.zeros((EDIM0, EDIM1), dtype=np.int32)
+        rdata2 = np.zeros(extdims, dtype=dtype)
         dset.read_direct(rdata2)
-        print(rdata2)
+        if not quiet:
+            print("\nDataset after extension:")
+            print(rdata2)
 
 if __name__ == "__main__":
     run()
@@ -8,6 +8,8 @@ compression and the maximum value in the dataset to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_gzip.h5"
 DATASET = "DS1"
 
@@ -16,30 +18,48 @@ DIM1 = 64
 CHUNK0 = 4
 CHUNK1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False,
+        rdcc_nslots=None, rdcc_nbytes=None, rdcc_w0=None):
+
+    dims = tuple(shape)
+
+    # Raw data chunk cache settings for the file access and dataset access
+    # property lists.  Any left as None keep the library default.
+    cache = {'rdcc_nslots': rdcc_nslots,
+             'rdcc_nbytes': rdcc_nbytes,
+             'rdcc_w0': rdcc_w0}
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), chunks=(CHUNK0, CHUNK1),
-                                compression='gzip', dtype='<i4')
+    with h5py.File(filename, 'w', **cache) as f:
+        dset = f.create_dataset(DATASET, dims, chunks=tuple(chunks),
+                                compression='gzip', dtype=dtype, **cache)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename, 'r', **cache) as f:
         dset = f[DATASET]
-        print("Filter type for {0} is {1}".format(DATASET, dset.compression))
 
-        rdata = np.zeros((DIM0, DIM1))
+        # The high level interface only takes dataset access settings when
+        # creating a dataset, so on reopening the file access settings
+        # apply.
+        nslots, nbytes, w0 = dset.id.get_access_plist().get_chunk_cache()
+        if not quiet:
+            msg = "Chunk cache for {0} is {1} slots, {2} bytes, w0 = {3}"
+            print(msg.format(DATASET, nslots, nbytes, w0))
+
+        if not quiet:
+            print("Filter type for {0} is {1}".format(DATASET, dset.compression))
+
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
 
         # Verify that the dataset was read correctly.
         np.testing.assert_array_equal(rdata, wdata)
-        print("Maximum value in DS1 is:  %d" % rdata.max())
+        if not quiet:
+            print("Maximum value in DS1 is:  %d" % rdata.max())
 
 if __name__ == "__main__":
     run()
@@ -8,6 +8,8 @@ to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_lzf.h5"
 DATASET = "DS1"
 
@@ -16,31 +18,33 @@ DIM1 = 64
 CHUNK0 = 4
 CHUNK1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), chunks=(CHUNK0, CHUNK1),
-                                compression='lzf', dtype='<i4')
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, chunks=tuple(chunks),
+                                compression='lzf', dtype=dtype)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
-        print("Filter type for {0} is {1}".format(DATASET, dset.compression))
+        if not quiet:
+            print("Filter type for {0} is {1}".format(DATASET, dset.compression))
 
-        rdata = np.zeros((DIM0, DIM1))
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
 
         # Verify that the dataset was read correctly.
         np.testing.assert_array_equal(rdata, wdata)
-        print("Maximum value in DS1 is:  %d" % rdata.max())
+        if not quiet:
+            print("Maximum value in DS1 is:  %d" % rdata.max())
 
 if __name__ == "__main__":
     run()
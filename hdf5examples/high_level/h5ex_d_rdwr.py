@@ -7,33 +7,35 @@ reads back the data, and outputs it to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_rdwr.h5"
 DATASET = "DS1"
 
 DIM0 = 4
 DIM1 = 7
 
-def run():
+def run(shape=(DIM0, DIM1), dtype='<i4', filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), dtype='<i4')
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, dtype=dtype)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
-        rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
 
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 if __name__ == "__main__":
     run()        
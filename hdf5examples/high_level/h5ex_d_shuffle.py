@@ -11,6 +11,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_shuffle.h5"
 DATASET = "DS1"
 
@@ -19,38 +21,41 @@ DIM1 = 64
 CHUNK0 = 4
 CHUNK1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), chunks=(CHUNK0, CHUNK1),
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, chunks=tuple(chunks),
                                 compression='gzip', fletcher32=True,
-                                dtype='<i4')
+                                dtype=dtype)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
 
         msg = "{0} has gzip filter enabled:  {1}"
         msg = msg.format(DATASET, dset.compression == 'gzip')
-        print(msg)
+        if not quiet:
+            print(msg)
 
         msg = "{0} has shuffle filter enabled:  {1}"
         msg = msg.format(DATASET, dset.fletcher32)
-        print(msg)
+        if not quiet:
+            print(msg)
 
-        rdata = np.zeros((DIM0, DIM1))
+        rdata = np.zeros(dims, dtype=dtype)
         dset.read_direct(rdata)
 
         # Verify that the dataset was read correctly.
         np.testing.assert_array_equal(rdata, wdata)
-        print("Maximum value in DS1 is:  %d" % rdata.max())
+        if not quiet:
+            print("Maximum value in DS1 is:  %d" % rdata.max())
 
 if __name__ == "__main__":
     run()
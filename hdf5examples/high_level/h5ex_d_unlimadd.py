@@ -7,9 +7,10 @@ the dataset, and writes new data to the extended portions of the
 dataset.  Finally it reopens the file again, reads back the data,
 and outputs it to the screen.
 """
-import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_unlimadd.h5"
 DATASET = "DS1"
 
@@ -20,53 +21,68 @@ EDIM1 = 10
 CHUNK0 = 4
 CHUNK1 = 4
 
-def run():
+def run(shape=(DIM0, DIM1), extdims=(EDIM0, EDIM1), chunks=(CHUNK0, CHUNK1),
+        dtype='<i4', filename=FILE, quiet=False,
+        rdcc_nslots=None, rdcc_nbytes=None, rdcc_w0=None):
+
+    dims = tuple(shape)
+
+    # Raw data chunk cache settings for the file access and dataset access
+    # property lists.  Any left as None keep the library default.
+    cache = {'rdcc_nslots': rdcc_nslots,
+             'rdcc_nbytes': rdcc_nbytes,
+             'rdcc_w0': rdcc_w0}
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), maxshape=(None, None),
-                                chunks=(CHUNK0, CHUNK1), compression='gzip',
-                                dtype='<i4')
+    with h5py.File(filename, 'w', **cache) as f:
+        dset = f.create_dataset(DATASET, dims, maxshape=(None, None),
+                                chunks=tuple(chunks), compression='gzip',
+                                dtype=dtype, **cache)
         dset[...] = wdata
 
-    with h5py.File(FILE, 'r+') as f:
+    with h5py.File(filename, 'r+', **cache) as f:
         dset = f[DATASET]
         rdata = dset[...]
 
-        print("\nDataset before extension:")
-        print(rdata)
+        if not quiet:
+            print("\nDataset before extension:")
+            print(rdata)
 
         # Extend the dataset.
-        dset.resize((EDIM0, EDIM1))
+        dset.resize(extdims)
 
-        # Initialize data for writing to the extended dataset.
-        wdata = np.zeros((EDIM0, EDIM1), dtype=np.int32)
-        for i in range(EDIM0):
-            for j in range(EDIM1):
-                wdata[i][j] = j
+        # Initialize data for writing to the extended dataset, wdata[i][j] = j.
+        wdata = datagen.generate(extdims, 'column', dtype=dtype)
 
         # The corresponding C API example writes the data using a hyperslab
         # subtraction.  This does not translate well into the high level
         # h5py API (it *IS* available in the low-level h5py API, however).
         # The same effect can be achieved with two writes instead of one.
-        dset[DIM0:EDIM0, 0:EDIM1] = wdata[DIM0:EDIM0, 0:EDIM1]
-        dset[0:DIM0, DIM1:EDIM1] = wdata[0:DIM0, DIM1:EDIM1]
+        dset[dims[0]:, :] = wdata[dims[0]:, :]
+        dset[0:dims[0], dims[1]:] = wdata[0:dims[0], dims[1]:]
 
         # It could also be done with
         # dset.write_direct(wdata, np.s_[DIM0:EDIM0, 0:EDIM1], np.s_[DIM0:EDIM0, 0:EDIM1])
         # dset.write_direct(wdata, np.s_[0:DIM0, DIM1:EDIM1], np.s_[0:DIM0, DIM1:EDIM1])
 
     # Now simply read back the data and echo to the screen.
-    with h5py.File(FILE, 'r') as f:
+    with h5py.File(filename, 'r', **cache) as f:
         dset = f[DATASET]
+
+        # The high level interface only takes dataset access settings when
+        # creating a dataset, so on reopening the file access settings
+        # apply.
+        nslots, nbytes, w0 = dset.id.get_access_plist().get_chunk_cache()
+        if not quiet:
+            msg = "Chunk cache for {0} is {1} slots, {2} bytes, w0 = {3}"
+            print(msg.format(DATASET, nslots, nbytes, w0))
+
         rdata = dset[...]
-        print("\nDataset after extension:")
-        print(rdata)
+        if not quiet:
+            print("\nDataset after extension:")
+            print(rdata)
 
 if __name__ == "__main__":
     run()
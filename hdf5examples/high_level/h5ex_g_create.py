@@ -7,13 +7,13 @@ import h5py
 FILE = "h5ex_g_create.h5"
 GROUP = "/G1"
 
-def run():
+def run(filename=FILE, quiet=False):
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         grp = f.create_group(GROUP)
 
     # Re-open the group, obtaining a new handle.
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         grp = f[GROUP]
 
 if __name__ == "__main__":
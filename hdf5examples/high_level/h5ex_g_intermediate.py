@@ -7,13 +7,14 @@ import h5py
 FILE = "h5ex_g_intermediate.h5"
 GROUP = "/G1/G2/G3"
 
-def run():
+def run(filename=FILE, quiet=False):
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         grp = f.create_group(GROUP)
 
-        print("\nObjects in the file:")
-        f.visititems(printme)
+        if not quiet:
+            print("\nObjects in the file:")
+            f.visititems(printme)
 
 def printme(name, obj):
 
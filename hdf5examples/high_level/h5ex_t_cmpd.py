@@ -12,13 +12,15 @@ DATASET = "DS1"
 
 DIM0 = 4
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
     # Create the compound datatype.
     dtype = np.dtype([("Serial number", np.int32), 
                       ("Location",      h5py.special_dtype(vlen=str)),
-                      ("Temperature",   np.float),
-                      ("Pressure",      np.float)])
+                      ("Temperature",   np.float64),
+                      ("Pressure",      np.float64)])
 
     wdata = np.zeros((DIM0,), dtype=dtype)
     wdata['Serial number'] = (1153, 1184, 1027, 1313)
@@ -27,20 +29,24 @@ def run():
     wdata['Temperature'] = (53.23, 55.12, 103.55, 1252.89)
     wdata['Pressure'] = (24.57, 22.95, 31.23, 84.11)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0,), dtype=dtype)
+    # Repeat the records as needed to fill out the requested dataspace.
+    wdata = np.resize(wdata, dims)
+
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, dtype=dtype)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
         rdata = dset[...]
 
-    print("%s:" % DATASET)
-    print("\tSerial number:  {0}".format(rdata["Serial number"]))
-    print("\tLocation:  {0}".format(rdata["Location"]))
-    print("\tTemperature:  {0}".format(rdata["Temperature"]))
-    print("\tPressure:  {0}".format(rdata["Pressure"]))
+    if not quiet:
+        print("%s:" % DATASET)
+        print("\tSerial number:  {0}".format(rdata["Serial number"]))
+        print("\tLocation:  {0}".format(rdata["Location"]))
+        print("\tTemperature:  {0}".format(rdata["Temperature"]))
+        print("\tPressure:  {0}".format(rdata["Pressure"]))
 
 
 if __name__ == "__main__":
@@ -13,13 +13,15 @@ ATTRIBUTE = "A1"
 
 DIM0 = 4
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
     # Create the compound datatype.
     dtype = np.dtype([("Serial number", np.int32), 
                       ("Location",      h5py.special_dtype(vlen=str)),
-                      ("Temperature",   np.float),
-                      ("Pressure",      np.float)])
+                      ("Temperature",   np.float64),
+                      ("Pressure",      np.float64)])
 
     wdata = np.zeros((DIM0,), dtype=dtype)
     wdata['Serial number'] = (1153, 1184, 1027, 1313)
@@ -28,18 +30,22 @@ def run():
     wdata['Temperature'] = (53.23, 55.12, 103.55, 1252.89)
     wdata['Pressure'] = (24.57, 22.95, 31.23, 84.11)
 
-    with h5py.File(FILE, 'w') as f:
+    # Repeat the records as needed to fill out the requested dataspace.
+    wdata = np.resize(wdata, dims)
+
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, data=0)
         dset.attrs.create(ATTRIBUTE, wdata, dtype=dtype)
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         rdata = f[DATASET].attrs[ATTRIBUTE]
 
-    print("%s:" % ATTRIBUTE)
-    print("\tSerial number:  {0}".format(rdata["Serial number"]))
-    print("\tLocation:  {0}".format(rdata["Location"]))
-    print("\tTemperature:  {0}".format(rdata["Temperature"]))
-    print("\tPressure:  {0}".format(rdata["Pressure"]))
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print("\tSerial number:  {0}".format(rdata["Serial number"]))
+        print("\tLocation:  {0}".format(rdata["Location"]))
+        print("\tTemperature:  {0}".format(rdata["Temperature"]))
+        print("\tPressure:  {0}".format(rdata["Pressure"]))
 
 
 if __name__ == "__main__":
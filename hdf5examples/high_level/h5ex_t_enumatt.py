@@ -7,6 +7,8 @@ and outputs it to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen, enums
+
 FILE = "h5ex_t_enumatt.h5"
 DATASET = "DS1"
 ATTRIBUTE = "A1"
@@ -14,30 +16,33 @@ ATTRIBUTE = "A1"
 DIM0 = 4
 DIM1 = 7
 
-def run():
+def run(shape=(DIM0, DIM1), dtype=np.int16, filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
     # Create the enum datatype.
     mapping = {'SOLID': 0, 'LIQUID': 1, 'GAS': 2, 'PLASMA': 3}
-    dtype = h5py.special_dtype(enum=(np.int16, mapping))
+    enumtype = h5py.special_dtype(enum=(dtype, mapping))
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = ((i + 1) * j - j) % (mapping['PLASMA'] + 1)
+    # Initialize the data,
+    # wdata[i][j] = ((i + 1) * j - j) % (mapping['PLASMA'] + 1).
+    wdata = datagen.generate(dims, 'outer', dtype=np.int32,
+                             modulo=mapping['PLASMA'] + 1)
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, data=0)
-        dset.attrs.create(ATTRIBUTE, wdata, dtype=dtype)
+        dset.attrs.create(ATTRIBUTE, wdata, dtype=enumtype)
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         rdata = f[DATASET].attrs[ATTRIBUTE]
 
-    # Make the inverse mapping so that it's easier to interpret the output.
-    inv_mapping = {v:k for (k,v) in mapping.items()}
-    print("%s:" % ATTRIBUTE)
-    for row in rdata:
-        print([inv_mapping[item] for item in row])
+    # Decode the values to names with a lookup table built from the type, so
+    # that it's easier to interpret the output.
+    names = enums.Enum(rdata).decode(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        for row in names:
+            print(row.tolist())
 
 
 if __name__ == "__main__":
@@ -7,30 +7,33 @@ it to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_t_float.h5"
 DATASET = "DS1"
 
 DIM0 = 4
 DIM1 = 7
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.float64)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i / (j + 0.5) + j
+def run(shape=(DIM0, DIM1), dtype='<f8', filename=FILE, quiet=False):
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i / (j + 0.5) + j.
+    wdata = datagen.generate(dims, 'quotient', dtype=np.float64)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0, DIM1), dtype='<f8')
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, dtype=dtype)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
         rdata = dset[...]
 
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
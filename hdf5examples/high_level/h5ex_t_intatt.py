@@ -7,6 +7,8 @@ it to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_t_intatt.h5"
 DATASET = "DS1"
 ATTRIBUTE = "A1"
@@ -15,22 +17,23 @@ DIM0 = 4
 DIM1 = 7
 DIMS = (DIM0, DIM1)
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int64)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+def run(shape=DIMS, dtype='<i8', filename=FILE, quiet=False):
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=np.int64)
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, data=0)
-        dset.attrs[ATTRIBUTE] = wdata
+        dset.attrs.create(ATTRIBUTE, wdata, dtype=dtype)
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         rdata = f[DATASET].attrs[ATTRIBUTE]
 
-    print("%s:" % ATTRIBUTE)
-    print(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print(rdata)
 
 
 if __name__ == "__main__":
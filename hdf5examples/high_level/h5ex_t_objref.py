@@ -8,15 +8,15 @@ targets to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import objrefs
+
 FILE = "h5ex_t_objref.h5"
 DATASET = "DS1"
 DIM0 = 2
 
-ref_type = {h5py._hl.dataset.Dataset: 'Dataset',
-            h5py._hl.group.Group:  'Group'}
-def run():
+def run(filename=FILE, quiet=False):
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         dset2 = f.create_dataset("DS2", data=0)
         grp = f.create_group("G1")
 
@@ -24,12 +24,13 @@ def run():
         dset = f.create_dataset(DATASET, (DIM0,), dtype=dtype)
         dset[...] = [dset2.ref, grp.ref]
 
-    with h5py.File(FILE) as f:
-        dset = f[DATASET]
-        rdata = dset[...]
+    with h5py.File(filename) as f:
+        # Resolve the paths and types of all the references at once.
+        paths, types = objrefs.Resolver(f).resolve(f[DATASET])
 
-        for ref in rdata:
-            print("{0} {1}".format(ref_type[type(f[ref])], f[ref].name))
+        for path, type_ in zip(paths, types):
+            if not quiet:
+                print("{0} {1}".format(objrefs.TYPES[type_], path))
 
 
 if __name__ == "__main__":
@@ -8,16 +8,16 @@ targets to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import objrefs
+
 FILE = "h5ex_t_objref.h5"
 DATASET = "DS1"
 ATTRIBUTE = "A1"
 DIM0 = 2
 
-ref_type = {h5py._hl.dataset.Dataset: 'Dataset',
-            h5py._hl.group.Group:  'Group'}
-def run():
+def run(filename=FILE, quiet=False):
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         # Create a scalar dataset and group to serve as targets of the 
         # reference attribute.
         dset2 = f.create_dataset("DS2", data=0)
@@ -29,11 +29,13 @@ def run():
         dtype = h5py.special_dtype(ref=h5py.Reference)
         dset.attrs.create(ATTRIBUTE, wdata, dtype=dtype)
 
-    with h5py.File(FILE) as f:
-        rdata = f[DATASET].attrs[ATTRIBUTE]
+    with h5py.File(filename) as f:
+        # Resolve the paths and types of all the references at once.
+        paths, types = objrefs.Resolver(f).resolve(f[DATASET], ATTRIBUTE)
 
-        for ref in rdata:
-            print("{0} {1}".format(ref_type[type(f[ref])], f[ref].name))
+        for path, type_ in zip(paths, types):
+            if not quiet:
+                print("{0} {1}".format(objrefs.TYPES[type_], path))
 
 
 if __name__ == "__main__":
@@ -7,32 +7,38 @@ and outputs it to the screen.
 import numpy as np
 import h5py
 
+from hdf5examples.tools import opaque
+
 FILE = "h5ex_t_opaque.h5"
 DATASET = "DS1"
 
 DIM0 = 4
 LEN = 7
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
     # Initialize the data. Use the Numpy void datatype to stand in for
     # H5T_OPAQUE
     dtype=np.dtype('V7')
-    wdata = np.zeros((DIM0,), dtype=dtype)
-    for i in range(DIM0):
-        wdata[i]= b'OPAQUE' + bytes([i + 48])
+    wdata = np.zeros(dims, dtype=dtype)
+    for i in range(dims[0]):
+        wdata[i]= b'OPAQUE' + bytes([i % 10 + 48])
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0,), dtype=dtype)
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, dtype=dtype)
         dset[...] = wdata
 
-    with h5py.File(FILE) as f:
-        dset = f[DATASET]
-        rdata = dset[...]
+    with h5py.File(filename) as f:
+        # Read the records into one buffer of bytes.
+        rdata = opaque.read(f[DATASET])
 
-    print("%s:" % DATASET)
-    for row in rdata:
-        print(row.tostring())
+    if not quiet:
+        print("%s:" % DATASET)
+        # Each record is a view of the buffer, not a copy.
+        for record in opaque.Records(rdata):
+            print(bytes(record))
 
 
 if __name__ == "__main__":
@@ -13,7 +13,10 @@ DATASET = "DS1"
 DIM0 = 4
 SDIM = 8
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
+
     wdata = ['Parting', 'is such', 'sweet', 'sorrow']
     
     # Figure out the length of the longest string, use that to construct the
@@ -21,17 +24,21 @@ def run():
     maxlen = max(map(len, wdata))
     dtype = 'S{0}'.format(maxlen)
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0,), dtype=dtype)
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(np.array(wdata, dtype=dtype), dims)
+
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, dtype=dtype)
         dset[...] = wdata
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
         rdata = dset[...]
 
     # Output the data to the screen.
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
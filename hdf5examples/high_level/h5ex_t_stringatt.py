@@ -14,7 +14,10 @@ ATTRIBUTE = "A1"
 DIM0 = 4
 SDIM = 8
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
+
     wdata = ['Parting', 'is such', 'sweet', 'sorrow']
     
     # Figure out the length of the longest string, use that to construct the
@@ -22,15 +25,19 @@ def run():
     maxlen = max(map(len, wdata))
     dtype = 'S{0}'.format(maxlen)
 
-    with h5py.File(FILE, 'w') as f:
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(np.array(wdata, dtype=dtype), dims)
+
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, data=0)
         dset.attrs[ATTRIBUTE] = wdata
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         rdata = f[DATASET].attrs[ATTRIBUTE]
 
-    print("%s:" % ATTRIBUTE)
-    print(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print(rdata)
 
 
 if __name__ == "__main__":
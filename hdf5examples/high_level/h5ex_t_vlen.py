@@ -17,7 +17,7 @@ DATASET = "DS1"
 LEN0 = 3
 LEN1 = 12
 
-def run():
+def run(filename=FILE, quiet=False):
 
     # Initialize variable-length data.  wdata[0] is a countdown of length LEN0,
     # wdata[1] is a Fibonacci sequence of length LEN1
@@ -31,16 +31,17 @@ def run():
     wdata = [wdata0, wdata1]
 
     dtype = h5py.special_dtype(vlen=np.dtype('int32'))
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, (2,), dtype=dtype)
         dset[...] = wdata
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
         rdata = dset[...]
 
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
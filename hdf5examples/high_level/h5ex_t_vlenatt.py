@@ -18,7 +18,7 @@ ATTRIBUTE = "DS1"
 LEN0 = 3
 LEN1 = 12
 
-def run():
+def run(filename=FILE, quiet=False):
 
     # Initialize variable-length data.  wdata[0] is a countdown of length LEN0,
     # wdata[1] is a Fibonacci sequence of length LEN1
@@ -33,15 +33,16 @@ def run():
     dtype = h5py.special_dtype(vlen=np.int32)
     attr = np.array([np.array(wdata[0]), np.array(wdata[1])], dtype=dtype)
 
-    with h5py.File(FILE, 'w') as f:
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, data=0)
         dset.attrs[ATTRIBUTE] = attr
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         rdata = f[DATASET].attrs[ATTRIBUTE]
 
-    print("%s:" % ATTRIBUTE)
-    print(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print(rdata)
 
 
 if __name__ == "__main__":
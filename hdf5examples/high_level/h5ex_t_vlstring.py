@@ -12,23 +12,29 @@ DATASET = "DS1"
 
 DIM0 = 4
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
     # Must use the special variable-length string dtype.
     dtype = h5py.special_dtype(vlen=str)
     wdata = ['Parting', 'is such', 'sweet', 'sorrow']
 
-    with h5py.File(FILE, 'w') as f:
-        dset = f.create_dataset(DATASET, (DIM0,), dtype=dtype)
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(np.array(wdata, dtype=object), dims)
+
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset(DATASET, dims, dtype=dtype)
         dset[...] = wdata
 
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         dset = f[DATASET]
         rdata = dset[...]
 
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
@@ -11,21 +11,29 @@ FILE = "h5ex_t_vlstringatt.h5"
 DATASET = "DS1"
 ATTRIBUTE = "A1"
 
-def run():
+DIM0 = 4
+
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    dims = tuple(shape)
 
     # Must use the special variable-length string dtype.
     dtype = h5py.special_dtype(vlen=str)
     wdata = ['Parting', 'is such', 'sweet', 'sorrow']
 
-    with h5py.File(FILE, 'w') as f:
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(np.array(wdata, dtype=object), dims)
+
+    with h5py.File(filename, 'w') as f:
         dset = f.create_dataset(DATASET, data=0)
         dset.attrs.create(ATTRIBUTE, wdata, dtype=dtype)
 
-    with h5py.File(FILE) as f:
+    with h5py.File(filename) as f:
         rdata = f[DATASET].attrs[ATTRIBUTE]
 
-    print("%s:" % ATTRIBUTE)
-    print(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print(rdata)
 
 
 if __name__ == "__main__":
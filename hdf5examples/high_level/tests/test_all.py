@@ -1,5 +1,6 @@
 import glob
 import os
+import re
 import sys
 if sys.hexversion < 0x03000000:
     from StringIO import StringIO
@@ -9,6 +10,7 @@ else:
 import unittest
 
 import numpy as np
+import h5py
 import pkg_resources
 
 import hdf5examples
@@ -42,12 +44,13 @@ class TestHdf5Examples(unittest.TestCase):
 
     def test_all(self):
         # Just run all the examples.
-        for x in dir(hdf5examples.low_level):
-            example = getattr(hdf5examples.low_level, x)
+        for x in dir(hdf5examples.high_level):
+            example = getattr(hdf5examples.high_level, x)
             if hasattr(example, 'run'):
                 
-                # Szip not available on my machine.
-                if x == 'h5ex_d_szip':
+                # Szip is an optional part of the hdf5 library.
+                if (x == 'h5ex_d_szip' and
+                        not h5py.h5z.filter_avail(h5py.h5z.FILTER_SZIP)):
                     with self.assertRaises(RuntimeError):
                         example.run()
                 elif x == 'h5ex_g_visit':
@@ -65,6 +68,36 @@ class TestHdf5Examples(unittest.TestCase):
 
         self.assertTrue(True)
 
+    def test_scaled(self):
+        # The examples should run unchanged at a non-default size, and quietly.
+        examples = hdf5examples.high_level
+        examples.h5ex_d_shuffle.run(shape=(64, 96), chunks=(16, 32),
+                                    dtype='<i8',
+                                    filename='h5ex_d_shuffle_scaled.h5',
+                                    quiet=True)
+        examples.h5ex_d_unlimmod.run(shape=(8, 8), extdims=(12, 20),
+                                     chunks=(4, 8), quiet=True)
+        examples.h5ex_t_cmpd.run(shape=(10,), quiet=True)
+        self.assertEqual(sys.stdout.getvalue(), '')
+
+        with h5py.File('h5ex_d_shuffle_scaled.h5', 'r') as f:
+            self.assertEqual(f['DS1'].shape, (64, 96))
+            self.assertEqual(f['DS1'].chunks, (16, 32))
+            self.assertEqual(f['DS1'].dtype, np.dtype('<i8'))
+        with h5py.File('h5ex_t_cmpd.h5', 'r') as f:
+            self.assertEqual(f['DS1'].shape, (10,))
+
+    def test_chunk_cache(self):
+        # The chunk cache settings should be in effect when reading back.
+        examples = hdf5examples.high_level
+        examples.h5ex_d_unlimmod.run(rdcc_nslots=10007,
+                                     rdcc_nbytes=4 * 1024 * 1024,
+                                     rdcc_w0=1.0)
+        output = sys.stdout.getvalue()
+        self.assertTrue(re.search(r"Chunk cache for .*DS1.* is 10007 slots, "
+                                  r"4194304 bytes, w0 = 1", output))
+        examples.h5ex_d_gzip.run(rdcc_nbytes=0, quiet=True)
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -6,6 +6,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "cmprss.h5"
 DATASET = "Compressed_Data"
 
@@ -16,50 +18,61 @@ if sys.hexversion >= 0x03000000:
 
 DIM0 = 100
 DIM1 = 20
+CHUNK0 = 20
+CHUNK1 = 20
+
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='>i4',
+        filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
 
-def run():
     # Create a file.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create dataset "Compressed Data" in the group using absolute names.
-    dims = (DIM0, DIM1)
+    dims = tuple(shape)
     space_id = h5py.h5s.create_simple(dims)
 
     dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
 
     # Datasets must be chunked for compression.
-    cdims = (20, 20)
+    cdims = tuple(chunks)
     dcpl.set_chunk(cdims)
 
     # Set ZLIB / DEFLATE compression using compression level 6.
     dcpl.set_deflate(6)
 
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
     dset = h5py.h5d.create(fid, DATASET,
-                           h5py.h5t.STD_I32BE, 
+                           filetype, 
                            space_id, dcpl, h5py.h5p.DEFAULT)
 
-    buf = np.zeros((DIM0, DIM1))
-    for i in range(DIM0):
-        buf[i] = i + np.arange(DIM1)
+    # buf[i][j] = i + j
+    buf = datagen.generate(dims, 'sum', dtype=dtype)
 
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, buf)
 
     # Now reopen the file and dataset.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
 
     dcpl = dset.get_create_plist()
 
     numfilt = dcpl.get_nfilters()
-    print("Number of filters associated with dataset:  %d" % numfilt)
+    if not quiet:
+        print("Number of filters associated with dataset:  %d" % numfilt)
 
     for j in range(numfilt):
         code, flags, values, name = dcpl.get_filter(j)
-        print(name)
+        if not quiet:
+            print(name)
 
-    newdata = np.zeros((DIM0, DIM1))
+    newdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL,h5py.h5s.ALL, newdata)
-    print(newdata)
+    if not quiet:
+        print(newdata)
 
 if __name__ == "__main__":
     run()
@@ -34,22 +34,30 @@ DIM1 = 3
 DIM2 = 4
 NUMP = 2
 
-def run():
+def run(shape=(DIM1, DIM2), dtype=np.int32, filename1=FILE1,
+        filename2=FILE2, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename1, bytes):
+        filename1 = filename1.encode()
+    if not isinstance(filename2, bytes):
+        filename2 = filename2.encode()
 
     # Create two files containing identical datasets.  Write 0's to one and
     # 1's to the other.
-    buf1 = np.zeros((DIM1, DIM2), dtype=np.int32)
-    buf2 = np.ones((DIM1, DIM2), dtype=np.int32)
+    dims = tuple(shape)
+    buf1 = np.zeros(dims, dtype=dtype)
+    buf2 = np.ones(dims, dtype=dtype)
 
-    fid1 = h5py.h5f.create(FILE1)
-    fid2 = h5py.h5f.create(FILE2)
+    fid1 = h5py.h5f.create(filename1)
+    fid2 = h5py.h5f.create(filename2)
 
-    dims = (DIM1, DIM2)
     space1 = h5py.h5s.create_simple(dims)
     space2 = h5py.h5s.create_simple(dims)
 
-    dset1 = h5py.h5d.create(fid1, DATASET1, h5py.h5t.NATIVE_INT32, space1)
-    dset2 = h5py.h5d.create(fid2, DATASET2, h5py.h5t.NATIVE_INT32, space2)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset1 = h5py.h5d.create(fid1, DATASET1, filetype, space1)
+    dset2 = h5py.h5d.create(fid2, DATASET2, filetype, space2)
 
     dset1.write(h5py.h5s.ALL, h5py.h5s.ALL, buf1)
     dset2.write(h5py.h5s.ALL, h5py.h5s.ALL, buf2)
@@ -58,8 +66,8 @@ def run():
     # Open the two files.  Select two point in one file, write values to
     # those point locations, then copy and write the values to the other
     # file.
-    file1 = h5py.h5f.open(FILE1)
-    file2 = h5py.h5f.open(FILE2)
+    file1 = h5py.h5f.open(filename1)
+    file2 = h5py.h5f.open(filename2)
     dset1 = h5py.h5d.open(file1, DATASET1)
     dset2 = h5py.h5d.open(file2, DATASET2)
     fid1 = dset1.get_space()
@@ -70,28 +78,31 @@ def run():
     coord[1] = [0, 1]
     fid1.select_elements(coord)
 
-    val = np.array([53, 59], dtype=np.int32)
-    dset1.write(mid1, fid1, val, h5py.h5t.NATIVE_INT32)
+    val = np.array([53, 59], dtype=dtype)
+    memtype = h5py.h5t.py_create(val.dtype)
+    dset1.write(mid1, fid1, val, memtype)
 
     fid2 = fid1.copy()
-    dset2.write(mid1, fid2, val, h5py.h5t.NATIVE_INT32)
+    dset2.write(mid1, fid2, val, memtype)
 
     # Open both files and print the contents of the datasets.
-    file1 = h5py.h5f.open(FILE1)
-    file2 = h5py.h5f.open(FILE2)
+    file1 = h5py.h5f.open(filename1)
+    file2 = h5py.h5f.open(filename2)
     dset1 = h5py.h5d.open(file1, DATASET1)
     dset2 = h5py.h5d.open(file2, DATASET2)
 
-    bufnew = np.zeros((DIM1, DIM2), dtype=np.int32)
+    bufnew = np.zeros(dims, dtype=dtype)
     dset1.read(h5py.h5s.ALL, h5py.h5s.ALL, bufnew)
 
-    print("\nDataset '%s' in file '%s' contains:" % (DATASET1, FILE1))
-    print(bufnew)
+    if not quiet:
+        print("\nDataset '%s' in file '%s' contains:" % (DATASET1, filename1))
+        print(bufnew)
 
     dset2.read(h5py.h5s.ALL, h5py.h5s.ALL, bufnew)
 
-    print("\nDataset '%s' in file '%s' contains:" % (DATASET2, FILE2))
-    print(bufnew)
+    if not quiet:
+        print("\nDataset '%s' in file '%s' contains:" % (DATASET2, filename2))
+        print(bufnew)
 
 if __name__ == "__main__":
     run()
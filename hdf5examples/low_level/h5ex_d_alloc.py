@@ -12,6 +12,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_alloc.h5"
 DATASET1 = "DS1"
 DATASET2 = "DS2"
@@ -26,18 +28,21 @@ DIM0 = 4
 DIM1 = 7
 FILLVAL = 99
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+def run(shape=(DIM0, DIM1), dtype='>i4', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space_id = h5py.h5s.create_simple(dims)
 
     # Create the dataset creation property list.
@@ -46,32 +51,37 @@ def run():
     # Set the allocation time to "early".
     dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
 
-    print("%s has late allocation time" % DATASET1);
-    print("%s has early allocation time" % DATASET2);
+    if not quiet:
+        print("%s has late allocation time" % DATASET1);
+        print("%s has early allocation time" % DATASET2);
 
     # Create the datasets using the dataset creation property list.
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
     dset1 = h5py.h5d.create(fid, DATASET1,
-                            h5py.h5t.STD_I32BE, 
+                            filetype, 
                             space_id, h5py.h5p.DEFAULT, h5py.h5p.DEFAULT)
     dset2 = h5py.h5d.create(fid, DATASET2,
-                            h5py.h5t.STD_I32BE, 
+                            filetype, 
                             space_id, dcpl, h5py.h5p.DEFAULT)
 
     # Retrieve and print space status and storage size for dset1.
     space_status = dset1.get_space_status()
     storage_size = dset1.get_storage_size()
     args = (DATASET1, " " if space_status == h5py.h5d.SPACE_STATUS_ALLOCATED else " not ")
-    print("Space for %s has%sbeen allocated." % args)
-    print("Storage size for %s is:  %d bytes" % (DATASET1, storage_size))
+    if not quiet:
+        print("Space for %s has%sbeen allocated." % args)
+        print("Storage size for %s is:  %d bytes" % (DATASET1, storage_size))
 
     # Retrieve and print space status and storage size for dset2.
     space_status = dset2.get_space_status()
     storage_size = dset2.get_storage_size()
     args = (DATASET2, " " if space_status == h5py.h5d.SPACE_STATUS_ALLOCATED else " not ")
-    print("Space for %s has%sbeen allocated." % args)
-    print("Storage size for %s is:  %d bytes" % (DATASET2, storage_size))
+    if not quiet:
+        print("Space for %s has%sbeen allocated." % args)
+        print("Storage size for %s is:  %d bytes" % (DATASET2, storage_size))
 
-    print("Writing data...\n")
+    if not quiet:
+        print("Writing data...\n")
     dset1.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
     dset2.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
 
@@ -79,15 +89,17 @@ def run():
     space_status = dset1.get_space_status()
     storage_size = dset1.get_storage_size()
     args = (DATASET1, " " if space_status == h5py.h5d.SPACE_STATUS_ALLOCATED else " not ")
-    print("Space for %s has%sbeen allocated." % args)
-    print("Storage size for %s is:  %d bytes" % (DATASET1, storage_size))
+    if not quiet:
+        print("Space for %s has%sbeen allocated." % args)
+        print("Storage size for %s is:  %d bytes" % (DATASET1, storage_size))
 
     # Retrieve and print space status and storage size for dset2.
     space_status = dset2.get_space_status()
     storage_size = dset2.get_storage_size()
     args = (DATASET2, " " if space_status == h5py.h5d.SPACE_STATUS_ALLOCATED else " not ")
-    print("Space for %s has%sbeen allocated." % args)
-    print("Storage size for %s is:  %d bytes" % (DATASET2, storage_size))
+    if not quiet:
+        print("Space for %s has%sbeen allocated." % args)
+        print("Storage size for %s is:  %d bytes" % (DATASET2, storage_size))
 
 
 if __name__ == "__main__":
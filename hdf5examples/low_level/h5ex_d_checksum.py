@@ -12,6 +12,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_checksum.h5"
 DATASET = "DS1"
 
@@ -24,9 +26,15 @@ DIM0 = 32
 DIM1 = 64 
 CHUNK0 = 4
 CHUNK1 = 8
-chunk = (CHUNK0, CHUNK1)
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
 
     # Check if the fletcher32 filter is available and can be used for both
     # encoding and decoding.
@@ -39,27 +47,25 @@ def run():
         msg = "Fletcher32 filter not available for encoding and decoding."
         raise RuntimeError(msg)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space_id = h5py.h5s.create_simple(dims)
 
     # Create the dataset creation property list, add the fletcher32 filter
     # and set a chunk size.
+    chunk = tuple(chunks)
     dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
     dcpl.set_fletcher32()
     dcpl.set_chunk(chunk)
 
     # Create the datasets using the dataset creation property list.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, 
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, 
                            space_id, dcpl, h5py.h5p.DEFAULT)
 
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -71,7 +77,7 @@ def run():
     del fid
 
     # Open file and dataset using the default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
     dcpl = dset.get_create_plist()
 
@@ -80,10 +86,10 @@ def run():
     filter_type, flags, vals, name = dcpl.get_filter(0)
     if filter_type != h5py.h5z.FILTER_FLETCHER32:
         raise RuntimeError("Fletcher32 filter not retrieved.")
-    else:
+    elif not quiet:
         print("Filter type is H5Z_FILTER_FLETCHER32.")
 
-    rdata = np.zeros((DIM0, DIM1))
+    rdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
     # Verify that the dataset was read correctly.
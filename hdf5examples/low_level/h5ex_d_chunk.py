@@ -21,28 +21,37 @@ if sys.hexversion >= 0x03000000:
 
 DIM0 = 6
 DIM1 = 8
-dims = (DIM0, DIM1)
 CHUNK0 = 4
 CHUNK1 = 4
-chunk = (CHUNK0, CHUNK1)
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
     # Initialize data to 1 to make it easier to see the selections.
-    wdata = np.ones((DIM0, DIM1))
-    print(wdata)
+    wdata = np.ones(dims)
+    if not quiet:
+        print(wdata)
 
     # Create a new file using the default properties.
-    file = h5py.h5f.create(FILE)
+    file = h5py.h5f.create(filename)
 
     # Create the dataspace.  
     space = h5py.h5s.create_simple(dims)
 
     # Create the dataset creation property list and set the chunk size.
+    chunk = tuple(chunks)
     dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
     dcpl.set_chunk(chunk)
 
     # Create the chunked dataset.
-    dset = h5py.h5d.create(file, DATASET, h5py.h5t.STD_I32LE, space, dcpl)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(file, DATASET, filetype, space, dcpl)
 
     # Define and select the first part of the hyperslab selection.
     start = (0, 0)
@@ -67,7 +76,7 @@ def run():
 
     # Now we begin the read section of this example.
     # Open the file and dataset using the default properties.
-    file = h5py.h5f.open(FILE)
+    file = h5py.h5f.open(filename)
     dset = h5py.h5d.open(file, DATASET)
 
     # Retrieve the dataset creation property list and print the storage
@@ -81,13 +90,16 @@ def run():
         msg += "H5D_CONTIGUOUS"
     elif layout == h5py.h5d.CHUNKED:
         msg += "H5D_CHUNKED"
-    print(msg)
+    if not quiet:
+        print(msg)
 
-    # Read the data using the default properties.
-    rdata = np.zeros(dims, dtype=np.int32)
+    # Read the data using the default properties.  The read fills the whole
+    # buffer, so it need not be zeroed.
+    rdata = np.empty(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
-    print("Data as written to disk by hyperslab:")
-    print(rdata)
+    if not quiet:
+        print("Data as written to disk by hyperslab:")
+        print(rdata)
 
     # Define and select the hyperslab to use for reading.
     space = dset.get_space()
@@ -99,8 +111,9 @@ def run():
 
     # Read the data using the previously defined hyperslab.
     dset.read(h5py.h5s.ALL, space, rdata)
-    print("Data as read from disk by hyperslab:")
-    print(rdata)
+    if not quiet:
+        print("Data as read from disk by hyperslab:")
+        print(rdata)
 
 
 if __name__ == "__main__":
@@ -9,6 +9,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_compact.h5"
 DATASET = "DS1"
 
@@ -20,18 +22,21 @@ if sys.hexversion >= 0x03000000:
 DIM0 = 4
 DIM1 = 7
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+def run(shape=(DIM0, DIM1), dtype='>i4', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space_id = h5py.h5s.create_simple(dims)
 
     # Create the dataset creation property list.  Set the layout to compact.
@@ -39,7 +44,8 @@ def run():
     dcpl.set_layout(h5py.h5d.COMPACT)
 
     # Create the datasets using the dataset creation property list.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32BE, space_id, dcpl)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space_id, dcpl)
 
     # Write the data to the dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -51,7 +57,7 @@ def run():
     del fid
 
     # Reopen file and dataset.
-    file = h5py.h5f.open(FILE)
+    file = h5py.h5f.open(filename)
     dset = h5py.h5d.open(file, DATASET)
 
     # Retrieve the dataset creation property list and print the layout.
@@ -61,12 +67,14 @@ def run():
     ddict = {h5py.h5d.COMPACT: "H5D_COMPACT",
              h5py.h5d.CONTIGUOUS: "H5D_CONTIGUOUS",
              h5py.h5d.CHUNKED: "H5D_CHUNKED"}
-    print("Storage layout for %s is %s" % (DATASET, ddict[layout])) 
+    if not quiet:
+        print("Storage layout for %s is %s" % (DATASET, ddict[layout])) 
 
     # Read the data and output to the screen.
-    newdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+    newdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL,h5py.h5s.ALL, newdata)
-    print(newdata)
+    if not quiet:
+        print(newdata)
 
 
 if __name__ == "__main__":
@@ -12,6 +12,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_fillval.h5"
 DATASET = "DS1"
 
@@ -28,24 +30,28 @@ CHUNK0 = 4
 CHUNK1 = 4
 FILLVAL = 99
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+def run(shape=(DIM0, DIM1), extdims=(EDIM0, EDIM1), chunks=(CHUNK0, CHUNK1),
+        dtype='<i4', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  
-    dims = (DIM0, DIM1)
     maxdims = (h5py.h5s.UNLIMITED, h5py.h5s.UNLIMITED)
     space_id = h5py.h5s.create_simple(dims, maxdims)
 
     # Create the dataset creation property list.  Set the layout to compact.
     dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
-    chunk = (CHUNK0, CHUNK1)
+    chunk = tuple(chunks)
     dcpl.set_chunk(chunk)
 
     # Set the fill value for the dataset.
@@ -57,32 +63,36 @@ def run():
     dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_EARLY)
 
     # Create the datasets using the dataset creation property list.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, space_id, dcpl)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space_id, dcpl)
 
     # Read from the dataset, which has not been written to yet.
-    print("\nDataset before being written to:")
-    rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+    rdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL,h5py.h5s.ALL, rdata)
-    print(rdata)
+    if not quiet:
+        print("\nDataset before being written to:")
+        print(rdata)
 
     # Write the data to the dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
 
     # Read the data back.
-    print("\nDataset after being written to:")
-    rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+    rdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL,h5py.h5s.ALL, rdata)
-    print(rdata)
+    if not quiet:
+        print("\nDataset after being written to:")
+        print(rdata)
 
     # Extend the dataset.
-    extdims = (EDIM0, EDIM1)
+    extdims = tuple(extdims)
     dset.set_extent(extdims)
 
     # Read from the extended dataset.
-    print("\nDataset after extension:")
-    rdata2 = np.zeros((EDIM0, EDIM1), dtype=np.int32)
+    rdata2 = np.zeros(extdims, dtype=dtype)
     dset.read(h5py.h5s.ALL,h5py.h5s.ALL, rdata2)
-    print(rdata2)
+    if not quiet:
+        print("\nDataset after extension:")
+        print(rdata2)
 
 if __name__ == "__main__":
     run()        
@@ -11,6 +11,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_gzip.h5"
 DATASET = "DS1"
 
@@ -24,7 +26,15 @@ DIM1 = 64
 CHUNK0 = 4
 CHUNK1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False,
+        rdcc_nslots=None, rdcc_nbytes=None, rdcc_w0=None):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
 
     # Check if gzip compression is available and can be used for
     # both compression and decompression.  Normally we do not perform
@@ -40,28 +50,41 @@ def run():
         msg = "Gzip filter not available for encoding and decoding."
         raise RuntimeError(msg)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Set up the raw data chunk cache on the file access and dataset access
+    # property lists.  Any setting left as None keeps the library default.
+    # The file access settings apply to every chunked dataset in the file,
+    # the dataset access settings override them for this one.
+    fapl = h5py.h5p.create(h5py.h5p.FILE_ACCESS)
+    mdc, nslots, nbytes, w0 = fapl.get_cache()
+    if rdcc_nslots is not None:
+        nslots = rdcc_nslots
+    if rdcc_nbytes is not None:
+        nbytes = rdcc_nbytes
+    if rdcc_w0 is not None:
+        w0 = rdcc_w0
+    fapl.set_cache(mdc, nslots, nbytes, w0)
+    dapl = h5py.h5p.create(h5py.h5p.DATASET_ACCESS)
+    dapl.set_chunk_cache(nslots, nbytes, w0)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space_id = h5py.h5s.create_simple(dims)
 
     # Create the dataset creation property list, add the fletcher32 filter
     # and set a chunk size.
-    chunk = (CHUNK0, CHUNK1)
+    chunk = tuple(chunks)
     dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
     dcpl.set_deflate(9)
     dcpl.set_chunk(chunk)
 
     # Create the datasets using the dataset creation property list.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, space_id, dcpl)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space_id, dcpl)
 
     # Write the data to the dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -72,11 +95,17 @@ def run():
     del space_id
     del fid
 
-    # Reopen the file and dataset using default properties.
-    fid = h5py.h5f.open(FILE)
-    dset = h5py.h5d.open(fid, DATASET)
+    # Reopen the file and dataset using the chunk cache settings.
+    fid = h5py.h5f.open(filename, fapl=fapl)
+    dset = h5py.h5d.open(fid, DATASET, dapl)
     dcpl = dset.get_create_plist()
 
+    # Print the chunk cache settings in effect for the dataset.
+    nslots, nbytes, w0 = dset.get_access_plist().get_chunk_cache()
+    if not quiet:
+        msg = "Chunk cache for %s is %d slots, %d bytes, w0 = %g"
+        print(msg % (DATASET, nslots, nbytes, w0))
+
     # Retrieve and print the filter type.  We know there is only one filter,
     # so the index is zero.
     filter_type, flags, vals, name = dcpl.get_filter(0)
@@ -87,14 +116,16 @@ def run():
              h5py.h5z.FILTER_FLETCHER32: "FLETCHER32",
              h5py.h5z.FILTER_SZIP: "SZIP",
              h5py.h5z.FILTER_LZF: "LZF"}
-    print("Filter type for %s is H5Z_%s" % (DATASET, ddict[filter_type])) 
+    if not quiet:
+        print("Filter type for %s is H5Z_%s" % (DATASET, ddict[filter_type])) 
 
-    rdata = np.zeros((DIM0, DIM1))
+    rdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
     # Verify that the dataset was read correctly.
     np.testing.assert_array_equal(rdata, wdata)
-    print("Maximum value in DS1 is:  %d" % rdata.max())
+    if not quiet:
+        print("Maximum value in DS1 is:  %d" % rdata.max())
 
 if __name__ == "__main__":
     run()        
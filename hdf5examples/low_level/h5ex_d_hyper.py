@@ -23,24 +23,31 @@ if sys.hexversion >= 0x03000000:
 DIM0 = 6
 DIM1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), dtype='<i4', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
 
     # Initialize the data.
-    wdata = np.ones((DIM0, DIM1), dtype=np.int32)
+    wdata = np.ones(dims, dtype=dtype)
 
     # Print the data to the screen.
-    print("Original Data:")
-    print(wdata)
+    if not quiet:
+        print("Original Data:")
+        print(wdata)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space = h5py.h5s.create_simple(dims)
 
     # Create the datasets using the dataset creation property list.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, space)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space)
 
     # Define and select the first part of the hyperslab selection.
     start = (0, 0)
@@ -63,15 +70,17 @@ def run():
     del fid
 
     # Reopen the file and dataset using default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
 
-    # Read the data using default properties.
-    rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+    # Read the data using default properties.  The read fills the whole
+    # buffer, so it need not be zeroed.
+    rdata = np.empty(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
-    print("\nData as written to disk by hyperslabs:")
-    print(rdata)
+    if not quiet:
+        print("\nData as written to disk by hyperslabs:")
+        print(rdata)
 
     # Define and select the hyperslab to use for reading.
     space = dset.get_space()
@@ -81,12 +90,14 @@ def run():
     block = (2, 3)
     space.select_hyperslab(start, count, stride, block)
 
-    # Read the data using the previously selected hyperslab.
-    rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+    # Read the data using the previously selected hyperslab, reusing the
+    # buffer.  Only the selection is read, so zero the rest.
+    rdata.fill(0)
     dset.read(h5py.h5s.ALL, space, rdata)
 
-    print("\nData as read from disk by hyperslab:")
-    print(rdata)
+    if not quiet:
+        print("\nData as read from disk by hyperslab:")
+        print(rdata)
 
 if __name__ == "__main__":
     run()        
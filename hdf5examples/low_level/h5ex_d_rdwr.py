@@ -9,6 +9,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_rdwr.h5"
 DATASET = "DS1"
 
@@ -20,23 +22,26 @@ if sys.hexversion >= 0x03000000:
 DIM0 = 4
 DIM1 = 7
 
-def run():
+def run(shape=(DIM0, DIM1), dtype='<i4', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space = h5py.h5s.create_simple(dims)
 
     # Create the datasets using default properties.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, space)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space)
 
     # Write the data to the dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -47,15 +52,16 @@ def run():
     del fid
 
     # Reopen the file and dataset using default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
 
     # Read the data using default properties.
-    rdata = np.zeros((DIM0, DIM1), dtype=np.int32)
+    rdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 if __name__ == "__main__":
     run()        
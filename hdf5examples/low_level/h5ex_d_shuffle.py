@@ -12,6 +12,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_shuffle.h5"
 DATASET = "DS1"
 
@@ -25,7 +27,14 @@ DIM1 = 64
 CHUNK0 = 4
 CHUNK1 = 8
 
-def run():
+def run(shape=(DIM0, DIM1), chunks=(CHUNK0, CHUNK1), dtype='<i4',
+        filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
 
     # Check if gzip compression is available and can be used for
     # both compression and decompression.  Normally we do not perform
@@ -51,17 +60,13 @@ def run():
         msg = "Shuffle filter not available for encoding and decoding."
         raise RuntimeError(msg)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space_id = h5py.h5s.create_simple(dims)
 
     # Create the dataset creation property list, add the fletcher32 filter
@@ -70,11 +75,12 @@ def run():
     dcpl.set_shuffle()
     dcpl.set_deflate(9)
 
-    chunk = (CHUNK0, CHUNK1)
+    chunk = tuple(chunks)
     dcpl.set_chunk(chunk)
 
     # Create the datasets using the dataset creation property list.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, space_id, dcpl)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space_id, dcpl)
 
     # Write the data to the dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -86,7 +92,7 @@ def run():
     del fid
 
     # Reopen the file and dataset using default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
     dcpl = dset.get_create_plist()
 
@@ -101,14 +107,16 @@ def run():
     n = dcpl.get_nfilters()
     for j in range(n):
         filter_type, flags, vals, name = dcpl.get_filter(j)
-        print("Filter %d: Type is H5Z_%s" % (j, ddict[filter_type])) 
+        if not quiet:
+            print("Filter %d: Type is H5Z_%s" % (j, ddict[filter_type])) 
 
-    rdata = np.zeros((DIM0, DIM1))
+    rdata = np.zeros(dims, dtype=dtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
     # Verify that the dataset was read correctly.
     np.testing.assert_array_equal(rdata, wdata)
-    print("Maximum value in DS1 is:  %d" % rdata.max())
+    if not quiet:
+        print("Maximum value in DS1 is:  %d" % rdata.max())
 
 if __name__ == "__main__":
     run()        
@@ -12,6 +12,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_d_unlimmod.h5"
 DATASET = "DS1"
 
@@ -27,29 +29,33 @@ EDIM1 = 10
 CHUNK0 = 4
 CHUNK1 = 4
 
-def run():
+def run(shape=(DIM0, DIM1), extdims=(EDIM0, EDIM1), chunks=(CHUNK0, CHUNK1),
+        dtype='<i4', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
 
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=dtype)
 
     # Create a new file using the default properties.
-    file = h5py.h5f.create(FILE)
+    file = h5py.h5f.create(filename)
 
     # Create the dataspace.  
-    dims = (DIM0, DIM1)
     maxdims = (h5py.h5s.UNLIMITED, h5py.h5s.UNLIMITED)
     space = h5py.h5s.create_simple(dims, maxdims)
 
     # Create the dataset creation property list and set the chunk size.
     dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
-    chunk = (CHUNK0, CHUNK1)
+    chunk = tuple(chunks)
     dcpl.set_chunk(chunk)
 
     # Create the chunked dataset.
-    dset = h5py.h5d.create(file, DATASET, h5py.h5t.STD_I32LE, space, dcpl)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(file, DATASET, filetype, space, dcpl)
 
     # Write the data to the dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -62,29 +68,27 @@ def run():
 
     # Now we begin the read section of this example.
     # Open the file and dataset.
-    file = h5py.h5f.open(FILE, h5py.h5f.ACC_RDWR)
+    file = h5py.h5f.open(filename, h5py.h5f.ACC_RDWR)
     dset = h5py.h5d.open(file, DATASET)
 
     # Get the dataspace and allocate an array for reading.  Numpy makes this
     # MUCH easier than C.
     space = dset.get_space()
     dims = space.get_simple_extent_dims()
-    rdata = np.zeros(dims, dtype=np.int32)
+    rdata = np.zeros(dims, dtype=dtype)
 
     # Read the data using the default properties.
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
-    print("Dataset before extension:")
-    print(rdata)
+    if not quiet:
+        print("Dataset before extension:")
+        print(rdata)
 
     # Extend the dataset.
-    extdims = (EDIM0, EDIM1)
+    extdims = tuple(extdims)
     dset.set_extent(extdims)
 
-    # Initialize data for writing to the extended dataset.
-    wdata = np.zeros((EDIM0, EDIM1), dtype=np.int32)
-    for i in range(EDIM0):
-        for j in range(EDIM1):
-            wdata[i][j] = j
+    # Initialize data for writing to the extended dataset, wdata[i][j] = j.
+    wdata = datagen.generate(extdims, 'column', dtype=dtype)
 
     # Write to the extended dataset.
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
@@ -95,18 +99,19 @@ def run():
     del file
 
     # Now simply read back the data and echo to the screen.
-    file = h5py.h5f.open(FILE)
+    file = h5py.h5f.open(filename)
     dset = h5py.h5d.open(file, DATASET)
 
     # Get the dataspace and allocate an array for reading.
     space = dset.get_space()
     dims = space.get_simple_extent_dims()
-    rdata = np.zeros(dims, dtype=np.int32)
+    rdata = np.zeros(dims, dtype=dtype)
 
     # Read the data using the default properties.
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
-    print("Dataset after extension:")
-    print(rdata)
+    if not quiet:
+        print("Dataset after extension:")
+        print(rdata)
 
     # Close and release resources.
     del dset
@@ -14,10 +14,14 @@ if sys.hexversion >= 0x03000000:
     FILE = FILE.encode()
     GROUP = GROUP.encode()
 
-def run():
+def run(filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create a group named "G1" in the file.
     group = h5py.h5g.create(fid, GROUP)
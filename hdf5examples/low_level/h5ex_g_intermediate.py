@@ -15,10 +15,14 @@ if sys.hexversion >= 0x03000000:
     FILE = FILE.encode()
     GROUP = GROUP.encode()
 
-def run():
+def run(filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create group creation property list and set it to allow creation of
     # intermediate groups.
@@ -30,8 +34,9 @@ def run():
 
     # Print all the objects in the file to show that intermediate groups
     # have been created.
-    print("\nObjects in the file:")
-    h5py.h5o.visit(fid, op_func, info=True)
+    if not quiet:
+        print("\nObjects in the file:")
+        h5py.h5o.visit(fid, op_func, info=True)
 
     # Close the group.  The handle "group" can no longer be used.
     del gcpl
@@ -7,22 +7,25 @@ import sys
 import numpy as np
 import h5py
 
-def run(FILE):
+def run(FILE, quiet=False):
 
     ROOTGROUP = "/"
 
     # Strings are handled very differently between python2 and python3.
     if sys.hexversion >= 0x03000000:
-        FILE = FILE.encode()
+        if not isinstance(FILE, bytes):
+            FILE = FILE.encode()
         ROOTGROUP = ROOTGROUP.encode()
 
-    fid = h5py.h5f.open(FILE)
+    # Open the file read-only, the low-level default is read/write.
+    fid = h5py.h5f.open(FILE, h5py.h5f.ACC_RDONLY)
     gid = h5py.h5g.open(fid, ROOTGROUP)
 
     # Print all the objects in the file to show that intermediate groups
     # have been created.
-    print("\nObjects in the file:")
-    h5py.h5o.visit(gid, ovisit, info=True)
+    if not quiet:
+        print("\nObjects in the file:")
+        h5py.h5o.visit(gid, ovisit, info=True)
 
 def ovisit(name, info):
     """Operator function, prints name and type of object being examined."""
@@ -9,6 +9,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_t_floatatt.h5"
 DATASET = "DS1"
 ATTRIBUTE = "A1"
@@ -23,15 +25,19 @@ DIM0 = 4
 DIM1 = 7
 DIMS = (DIM0, DIM1)
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.float64)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i / (j + 0.5) + j
+def run(shape=DIMS, dtype='<f8', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i / (j + 0.5) + j.
+    wdata = datagen.generate(dims, 'quotient', dtype=np.float64)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create a dataset with a scalar dataspace.
     # The origin C example uses a NULL dataspace, but this does not seem to
@@ -43,14 +49,15 @@ def run():
 
     # Create the attribute dataspace.  Not supplying a maximum size results
     # in the maximum size being equal to the current size.
-    space = h5py.h5s.create_simple(DIMS)
+    space = h5py.h5s.create_simple(dims)
 
     # Create the attribute and write the floating point data to it.
     # In this example we will save the data as 64 bit little endian
     # IEEE floating point numbers, regardless of the native type.  The
     # HDF5 library automatically converts between different floating point
     # types.
-    attr = h5py.h5a.create(dset, ATTRIBUTE, h5py.h5t.IEEE_F64LE, space)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    attr = h5py.h5a.create(dset, ATTRIBUTE, filetype, space)
     attr.write(wdata)
             
 
@@ -61,19 +68,20 @@ def run():
     del fid
 
     # Open file and dataset using the default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
     attr = h5py.h5a.open(dset, ATTRIBUTE)
 
     # Get the dataspace and allocate space for the read buffer.
     space = attr.get_space()
-    rdata = np.zeros((DIM0, DIM1), dtype=np.float64)
+    rdata = np.zeros(dims, dtype=np.float64)
 
     attr.read(rdata)
 
     # Output the data to the screen.
-    print("%s:" % ATTRIBUTE)
-    print(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print(rdata)
 
 
 if __name__ == "__main__":
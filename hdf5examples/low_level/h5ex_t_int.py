@@ -9,6 +9,8 @@ import sys
 import numpy as np
 import h5py
 
+from hdf5examples.tools import datagen
+
 FILE = "h5ex_t_int.h5"
 DATASET = "DS1"
 
@@ -20,25 +22,29 @@ if sys.hexversion >= 0x03000000:
 DIM0 = 4
 DIM1 = 7
 
-def run():
-    # Initialize the data.
-    wdata = np.zeros((DIM0, DIM1), dtype=np.int32)
-    for i in range(DIM0):
-        for j in range(DIM1):
-            wdata[i][j] = i * j - j
+def run(shape=(DIM0, DIM1), dtype='>i8', filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
+    # Initialize the data, wdata[i][j] = i * j - j.
+    wdata = datagen.generate(dims, 'product', dtype=np.int32)
 
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the dataspace.  No maximum size parameter needed.
-    dims = (DIM0, DIM1)
     space = h5py.h5s.create_simple(dims)
 
     # Create the dataset and write the integer data to it.  In this
     # example, we will save the data as 64 bit big endian integers,
     # The HDF5 library automatically converts between different floating point
     # types.
-    dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I64BE, space)
+    filetype = h5py.h5t.py_create(np.dtype(dtype))
+    dset = h5py.h5d.create(fid, DATASET, filetype, space)
     dset.write(h5py.h5s.ALL, h5py.h5s.ALL, wdata)
 
     # Explicitly close and release resources.
@@ -47,15 +53,16 @@ def run():
     del fid
 
     # Open file and dataset using the default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
 
-    rdata = np.zeros((DIM0, DIM1), dtype=np.int64)
+    rdata = np.zeros(dims, dtype=np.int64)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
     # Output the data to the screen.
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
@@ -20,7 +20,14 @@ if sys.hexversion >= 0x03000000:
 DIM0 = 4
 SDIM = 8
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
     npdtype = '|S' + str(SDIM)
     wdata = np.empty((4,), npdtype)
     wdata[0] = "Parting"
@@ -28,8 +35,11 @@ def run():
     wdata[2] = "sweet"
     wdata[3] = "sorrow"
 
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(wdata, dims)
+
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the file and memory datatypes.  For this example we will save the
     # strings as FORTRAN strings, therefore they do not need space for the null
@@ -41,7 +51,7 @@ def run():
 
 
     # Create the dataspace.  No maximum size parameter needed.
-    space = h5py.h5s.create_simple((DIM0,))
+    space = h5py.h5s.create_simple(dims)
 
     # Create the dataset and write the string data to it.
     dset = h5py.h5d.create(fid, DATASET, filetype, space)
@@ -53,15 +63,16 @@ def run():
     del fid
 
     # Open file and dataset using the default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
 
-    rdata = np.empty((DIM0,), dtype=npdtype)
+    rdata = np.empty(dims, dtype=npdtype)
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
     # Output the data to the screen.
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
@@ -21,7 +21,14 @@ if sys.hexversion >= 0x03000000:
 
 DIM0 = 4
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
     # The "write" data must be a numpy array for variable length strings,
     # not a list.  
     #
@@ -32,8 +39,11 @@ def run():
     wdata[2] = "sweet"
     wdata[3] = "sorrow"
 
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(wdata, dims)
+
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the file and memory datatypes.  
     filetype = h5py.h5t.FORTRAN_S1.copy()
@@ -42,7 +52,7 @@ def run():
     memtype.set_size(h5py.h5t.VARIABLE)
 
     # Create the dataspace.  No maximum size parameter needed.
-    space = h5py.h5s.create_simple((DIM0,))
+    space = h5py.h5s.create_simple(dims)
 
     # Create the dataset and write the string data to it.
     dset = h5py.h5d.create(fid, DATASET, filetype, space)
@@ -54,15 +64,16 @@ def run():
     del fid
 
     # Open file and dataset using the default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
 
-    rdata = np.empty((DIM0,), dtype="|O")
+    rdata = np.empty(dims, dtype="|O")
     dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
 
     # Output the data to the screen.
-    print("%s:" % DATASET)
-    print(rdata)
+    if not quiet:
+        print("%s:" % DATASET)
+        print(rdata)
 
 
 if __name__ == "__main__":
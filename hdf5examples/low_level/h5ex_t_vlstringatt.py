@@ -22,7 +22,14 @@ if sys.hexversion >= 0x03000000:
 DIM0 = 4
 SDIM = 8
 
-def run():
+def run(shape=(DIM0,), filename=FILE, quiet=False):
+
+    # Strings are handled very differently between python2 and python3.
+    if not isinstance(filename, bytes):
+        filename = filename.encode()
+
+    dims = tuple(shape)
+
     # The "write" data must be a numpy array for variable length strings,
     # not a list.  
     #
@@ -33,8 +40,11 @@ def run():
     wdata[2] = "sweet"
     wdata[3] = "sorrow"
 
+    # Repeat the strings as needed to fill out the requested dataspace.
+    wdata = np.resize(wdata, dims)
+
     # Create a new file using the default properties.
-    fid = h5py.h5f.create(FILE)
+    fid = h5py.h5f.create(filename)
 
     # Create the file and memory datatypes.  For this example we will save the
     # strings as FORTRAN strings, therefore they do not need space for the null
@@ -52,7 +62,7 @@ def run():
     dset = h5py.h5d.create(fid, DATASET, h5py.h5t.STD_I32LE, space)
 
     # Create the attribute dataspace.
-    space = h5py.h5s.create_simple((DIM0,))
+    space = h5py.h5s.create_simple(dims)
 
     # Create the attribute and write the string data to it.
     attr = h5py.h5a.create(dset, ATTRIBUTE, filetype, space)
@@ -65,7 +75,7 @@ def run():
     del fid
 
     # Open file and dataset using the default properties.
-    fid = h5py.h5f.open(FILE)
+    fid = h5py.h5f.open(filename)
     dset = h5py.h5d.open(fid, DATASET)
     attr = h5py.h5a.open(dset, ATTRIBUTE)
 
@@ -77,8 +87,9 @@ def run():
     attr.read(rdata)
 
     # Output the data to the screen.
-    print("%s:" % ATTRIBUTE)
-    print(rdata)
+    if not quiet:
+        print("%s:" % ATTRIBUTE)
+        print(rdata)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+from . import appender
+from . import bufpool
+from . import bulkattrs
+from . import cachebench
+from . import catalog
+from . import chunkio
+from . import chunktune
+from . import crawler
+from . import datagen
+from . import enums
+from . import filterbench
+from . import layout
+from . import memmap
+from . import objrefs
+from . import opaque
+from . import points
+from . import ragged
+from . import rawcopy
+from . import selplan
+from . import sparse
+from . import table
@@ -0,0 +1,253 @@
+"""
+Buffered appends to datasets with an unlimited first dimension.
+
+h5ex_d_unlimadd, h5ex_d_unlimmod and h5ex_d_unlimgzip extend their datasets
+once and write once.  A stream that arrives a few rows at a time and is
+written the same way calls set_extent and write for every few rows, which is
+slow, rewrites (and with compression, recompresses) the same partial chunk
+over and over, and leaves the abandoned versions of it scattered through the
+file.
+
+An Appender collects rows in memory and only writes whole chunk rows, so
+every chunk is written exactly once.  The dataset is grown geometrically
+(or by whole chunks) rather than on every write, and trimmed to the exact
+number of rows on close.
+
+    >>> import h5py
+    >>> from hdf5examples.tools.appender import Appender
+    >>> with h5py.File('stream.h5', 'w') as f:
+    ...     dset = f.create_dataset('DS1', (0, 7), maxshape=(None, 7),
+    ...                             chunks=(1024, 7), dtype='<i4')
+    ...     with Appender(dset) as app:
+    ...         for row in rows:
+    ...             app.append(row)
+
+Run the module to compare against resizing and writing on every append:
+
+    $ python -m hdf5examples.tools.appender --rows 100000 --per-append 1
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+
+class Appender(object):
+    """
+    Append rows to a chunked dataset whose first dimension is unlimited.
+
+    Rows are buffered until at least buffer_rows have accumulated, and then
+    everything up to the last chunk boundary is written.  When the dataset
+    must grow, its first dimension is multiplied by growth (rounded up to
+    whole chunks); with growth=1 it grows by just enough whole chunks.
+    Until close() is called the dataset may be longer than the rows
+    appended, with the excess holding the fill value.
+    """
+
+    def __init__(self, dset, growth=2.0, buffer_rows=None):
+        if dset.chunks is None or dset.maxshape[0] is not None:
+            msg = "Dataset {0} must be chunked, with an unlimited first axis."
+            raise ValueError(msg.format(dset.name))
+        if growth < 1:
+            raise ValueError("growth must be at least 1.")
+
+        self.dset = dset
+        self.growth = growth
+        self.chunk_rows = dset.chunks[0]
+        if buffer_rows is None:
+            # Whole chunk rows, about 1 MiB.
+            row_bytes = int(np.prod(dset.shape[1:])) * dset.dtype.itemsize
+            nchunks = (1024 * 1024) // max(1, self.chunk_rows * row_bytes)
+            buffer_rows = self.chunk_rows * max(1, nchunks)
+        self.buffer_rows = buffer_rows
+
+        # Rows already in the file, and rows waiting in the buffer.  The
+        # buffer always starts at self.flushed.
+        self.flushed = dset.shape[0]
+        self.capacity = dset.shape[0]
+        self._buffer = np.empty((buffer_rows + self.chunk_rows,) +
+                                dset.shape[1:], dtype=dset.dtype)
+        self._nbuffered = 0
+        # h5py looks these up in the library every time, so keep them.
+        self._dtype = dset.dtype
+        self._row_shape = dset.shape[1:]
+        self.resizes = 0
+        self.writes = 0
+
+    def __len__(self):
+        return self.flushed + self._nbuffered
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, rows):
+        """
+        Append one row (shaped like dset[0]) or several rows (shaped like
+        dset[:n]).
+        """
+        rows = np.asarray(rows, dtype=self._dtype)
+        if rows.shape == self._row_shape:
+            # The common case of a single row, which always fits.
+            self._buffer[self._nbuffered] = rows
+            self._nbuffered += 1
+            if self._nbuffered >= self.buffer_rows:
+                self.flush()
+            return
+        if rows.shape[1:] != self._row_shape:
+            msg = "Rows have shape {0}, dataset {1} has rows of shape {2}."
+            raise ValueError(msg.format(rows.shape[1:], self.dset.name,
+                                        self._row_shape))
+
+        while len(rows) > 0:
+            room = len(self._buffer) - self._nbuffered
+            n = min(room, len(rows))
+            self._buffer[self._nbuffered:self._nbuffered + n] = rows[:n]
+            self._nbuffered += n
+            rows = rows[n:]
+            if self._nbuffered >= self.buffer_rows:
+                self.flush()
+
+    def flush(self, partial=False):
+        """
+        Write the buffered rows up to the last chunk boundary, or all of
+        them if partial is True.  Writing a partial chunk means it is
+        written again when more rows arrive, so close() is the usual way to
+        write the last one.
+        """
+        end = self.flushed + self._nbuffered
+        if not partial:
+            end -= end % self.chunk_rows
+        n = end - self.flushed
+        if n <= 0:
+            return
+
+        if end > self.capacity:
+            self._grow(end)
+        self.dset.write_direct(self._buffer, np.s_[:n],
+                               np.s_[self.flushed:end])
+        self.writes += 1
+
+        # Move the remaining partial chunk to the front of the buffer.
+        rest = self._nbuffered - n
+        self._buffer[:rest] = self._buffer[n:self._nbuffered]
+        self._nbuffered = rest
+        self.flushed = end
+
+    def _grow(self, needed):
+        size = max(needed, int(np.ceil(self.capacity * self.growth)))
+        size = -(-size // self.chunk_rows) * self.chunk_rows
+        self.dset.resize(size, axis=0)
+        self.capacity = size
+        self.resizes += 1
+
+    def close(self):
+        """
+        Write any remaining rows and trim the dataset to the rows appended.
+        """
+        self.flush(partial=True)
+        if self.dset.shape[0] != self.flushed:
+            self.dset.resize(self.flushed, axis=0)
+            self.resizes += 1
+        self.capacity = self.flushed
+
+
+def naive_append(dset, rows):
+    """
+    Append rows the way the examples extend a dataset: resize, then write.
+    """
+    rows = np.asarray(rows, dtype=dset.dtype)
+    if rows.shape == dset.shape[1:]:
+        rows = rows[np.newaxis]
+    n = dset.shape[0]
+    dset.resize(n + len(rows), axis=0)
+    dset[n:] = rows
+
+
+def benchmark(nrows=100000, row_shape=(8,), per_append=1, chunk_rows=1024,
+              dtype='<f8', compression=None, growth=2.0, directory=None):
+    """
+    Append nrows rows, per_append at a time, first with naive_append and
+    then with an Appender, returning a record for each with the elapsed
+    seconds, rows per second and final file size.
+    """
+    row_shape = tuple(row_shape)
+    rs = np.random.RandomState(0)
+    data = rs.standard_normal((nrows,) + row_shape).astype(dtype)
+    if compression is not None:
+        # Something compressible.
+        data = np.round(data, 1)
+
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        for method in ['naive', 'appender']:
+            filename = os.path.join(tmpdir, method + '.h5')
+            t0 = time.perf_counter()
+            with h5py.File(filename, 'w') as f:
+                dset = f.create_dataset('DS1', (0,) + row_shape, dtype=dtype,
+                                        maxshape=(None,) + row_shape,
+                                        chunks=(chunk_rows,) + row_shape,
+                                        compression=compression)
+                if method == 'naive':
+                    for k in range(0, nrows, per_append):
+                        naive_append(dset, data[k:k + per_append])
+                else:
+                    with Appender(dset, growth=growth) as app:
+                        for k in range(0, nrows, per_append):
+                            app.append(data[k:k + per_append])
+            seconds = time.perf_counter() - t0
+
+            with h5py.File(filename, 'r') as f:
+                if not np.array_equal(f['DS1'][...], data):
+                    raise RuntimeError("Data read back does not match.")
+            records.append({'method': method,
+                            'rows': nrows,
+                            'per_append': per_append,
+                            'chunk_rows': chunk_rows,
+                            'compression': compression,
+                            'seconds': seconds,
+                            'rows_per_s': nrows / seconds,
+                            'file_bytes': os.path.getsize(filename),
+                            'data_bytes': data.nbytes})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare Appender with resize-per-append, printing JSON.")
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--width', type=int, default=8,
+                        help="elements per row")
+    parser.add_argument('--per-append', type=int, default=1,
+                        help="rows per append call")
+    parser.add_argument('--chunk-rows', type=int, default=1024)
+    parser.add_argument('--dtype', default='<f8')
+    parser.add_argument('--compression', default=None,
+                        help="e.g. gzip or lzf")
+    parser.add_argument('--growth', type=float, default=2.0)
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(nrows=args.rows, row_shape=(args.width,),
+                        per_append=args.per_append,
+                        chunk_rows=args.chunk_rows, dtype=args.dtype,
+                        compression=args.compression, growth=args.growth,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+A pool of reusable read buffers.
+
+Nearly every example allocates a fresh buffer with np.zeros before each
+dset.read, and h5ex_d_hyper does it twice.  That is harmless once, but in a
+loop reading the same shape over and over the allocating and zeroing can
+cost more than the read.  A BufferPool hands out arrays keyed by shape and
+dtype and takes them back when the caller is done with them, so a loop
+allocates once.  Buffers come back uninitialized (like np.empty) unless
+zeroing is asked for, which is only needed when a read selects part of the
+buffer and the rest must read as zero.
+
+    >>> from hdf5examples.tools import bufpool
+    >>> pool = bufpool.BufferPool()
+    >>> for k in range(1000):
+    ...     with pool.borrow(dims, '<i4') as rdata:
+    ...         dset.read(h5py.h5s.ALL, h5py.h5s.ALL, rdata)
+    ...         total += rdata.sum()
+    >>> pool.stats()['hit_rate']
+    0.999
+
+read() is a helper for the low-level read calls in the examples that takes
+an out= buffer or draws one from a pool.
+"""
+import collections
+import contextlib
+import threading
+
+import numpy as np
+import h5py
+
+# The most the pool holds on to by default.
+MAX_BYTES = 256 * 1024 * 1024
+
+
+class BufferPool(object):
+    """
+    A thread-safe pool of NumPy arrays keyed by shape and dtype.
+
+    Buffers returned with put() are kept for reuse until the pool would
+    hold more than max_bytes, at which point the least recently returned
+    are dropped.  The counters record every get(): hits were served from
+    the pool, misses allocated, and bytes_avoided is the size of the
+    allocations the hits saved.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        # The free buffers by key, and their keys in the order returned.
+        self._free = {}
+        self._order = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_avoided = 0
+
+    @property
+    def nbytes(self):
+        """The bytes currently held by the pool."""
+        return self._nbytes
+
+    def get(self, shape, dtype, zero=False):
+        """
+        Return a C-contiguous array of the given shape and dtype, reused
+        if one is free.  Its contents are undefined unless zero is True.
+        """
+        if isinstance(shape, int):
+            shape = (shape,)
+        key = (tuple(shape), np.dtype(dtype))
+        buf = None
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                buf = free.pop()
+                if not free:
+                    del self._free[key]
+                del self._order[id(buf)]
+                self._nbytes -= buf.nbytes
+                self.hits += 1
+                self.bytes_avoided += buf.nbytes
+            else:
+                self.misses += 1
+        if buf is None:
+            buf = np.empty(key[0], dtype=key[1])
+        if zero:
+            buf.fill(0)
+        return buf
+
+    def put(self, buf):
+        """
+        Give a buffer back to the pool.  Views and non-contiguous arrays are
+        not kept.
+        """
+        if buf.base is not None or not buf.flags.c_contiguous:
+            return
+        if buf.nbytes > self.max_bytes:
+            return
+        key = (buf.shape, buf.dtype)
+        with self._lock:
+            if id(buf) in self._order:
+                return
+            self._free.setdefault(key, []).append(buf)
+            self._order[id(buf)] = key
+            self._nbytes += buf.nbytes
+            while self._nbytes > self.max_bytes:
+                ident, oldest = self._order.popitem(last=False)
+                free = self._free[oldest]
+                k = [id(b) for b in free].index(ident)
+                dropped = free.pop(k)
+                if not free:
+                    del self._free[oldest]
+                self._nbytes -= dropped.nbytes
+
+    @contextlib.contextmanager
+    def borrow(self, shape, dtype, zero=False):
+        """
+        A context manager yielding get(shape, dtype, zero) and putting the
+        buffer back afterwards.
+        """
+        buf = self.get(shape, dtype, zero)
+        try:
+            yield buf
+        finally:
+            self.put(buf)
+
+    def clear(self):
+        """Drop every free buffer, keeping the counters."""
+        with self._lock:
+            self._free.clear()
+            self._order.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """
+        Return a dict of the requests, hits, misses, hit rate, bytes of
+        allocation avoided, and bytes held.
+        """
+        requests = self.hits + self.misses
+        return {'requests': requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / requests if requests else 0.0,
+                'bytes_avoided': self.bytes_avoided,
+                'bytes_held': self._nbytes}
+
+
+def read(dset, mspace=h5py.h5s.ALL, fspace=h5py.h5s.ALL, out=None,
+         pool=None):
+    """
+    Read from a low-level dataset (an h5py.h5d.DatasetID) as dset.read
+    does, returning the buffer.
+
+    The buffer is out if given; otherwise it has the shape of mspace (or
+    of the dataset) and the dataset's dtype, and comes from pool if one is
+    given.  When the file selection covers less than the whole buffer the
+    buffer is zeroed first, as np.zeros would have been.  Give a pooled
+    buffer back with pool.put() when finished with it.
+    """
+    if out is None:
+        space = dset.get_space() if mspace == h5py.h5s.ALL else mspace
+        shape = space.get_simple_extent_dims()
+        dtype = dset.dtype
+        # Both selections have the same number of elements.
+        selected = fspace if fspace != h5py.h5s.ALL else mspace
+        zero = selected != h5py.h5s.ALL and (
+            selected.get_select_npoints() < int(np.prod(shape)))
+        if pool is None:
+            out = np.zeros(shape, dtype) if zero else np.empty(shape, dtype)
+        else:
+            out = pool.get(shape, dtype, zero)
+    dset.read(mspace, fspace, out)
+    return out
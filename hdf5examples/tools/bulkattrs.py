@@ -0,0 +1,369 @@
+"""
+Read and write the attributes of many objects at once.
+
+The attribute examples (h5ex_t_intatt, h5ex_t_floatatt, h5ex_t_stringatt,
+h5ex_t_vlstringatt, h5ex_t_cmpdatt, h5ex_t_enumatt) each open one dataset
+and read one attribute.  Doing the same for every object of a large file,
+
+    for path in paths:
+        value = f[path].attrs[name]
+
+opens each object through the high-level API, and looks it up by path, for
+every attribute read.
+
+collect() visits the file once, skipping objects without attributes by the
+count the visit reports, opens only the objects that have some, and reads
+their attributes (all of them, or those named) with the low-level calls.
+The result is columnar: a dict whose 'path' entry is an array of the paths
+of the objects with any of the attributes, and whose other entries are,
+for each attribute name, a masked array of its values with one row per
+path, masked where the object lacks the attribute.  Numbers, or strings
+of one kind, all of one shape are stacked into one array; others make an
+object array.
+
+update() applies many attribute writes in one pass, opening each object
+once and overwriting attributes of the same shape and type in place rather
+than deleting and recreating them.  collect_files() and update_files() do
+the same for many files at once in a process pool.
+
+    >>> from hdf5examples.tools import bulkattrs
+    >>> with h5py.File('catalog.h5', 'r') as f:
+    ...     columns = bulkattrs.collect(f, names=['units', 'scale'])
+    >>> columns['path'][:2], columns['scale'][:2]
+    >>> with h5py.File('catalog.h5', 'r+') as f:
+    ...     bulkattrs.update(f, [('/DS1', 'scale', 2.0),
+    ...                          ('/DS2', 'units', 'm/s')])
+
+Run the module to compare against reading through obj.attrs:
+
+    $ python -m hdf5examples.tools.bulkattrs --objects 10000
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+
+class _Types(object):
+    # The dtype, memory type and string info of attributes, looked up by
+    # name and HDF5 type, since the attributes of many objects mostly
+    # repeat a few of each and working them out is most of a small read.
+
+    def __init__(self):
+        self._types = {}
+
+    def lookup(self, name, tid):
+        types = self._types.setdefault(name, [])
+        for cached, dtype, mtype, info in types:
+            if cached.equal(tid):
+                return dtype, mtype, info
+        dtype = tid.dtype
+        mtype = h5py.h5t.py_create(dtype)
+        info = h5py.check_string_dtype(dtype)
+        types.append((tid, dtype, mtype, info))
+        return dtype, mtype, info
+
+
+def _read(aid, name, types):
+    # An attribute's value as h5py's attrs returns it.
+    dtype, mtype, info = types.lookup(name, aid.get_type())
+    space = aid.get_space()
+    if space.get_simple_extent_type() == h5py.h5s.NULL:
+        return h5py.Empty(dtype)
+    value = np.empty(space.shape, dtype=dtype)
+    aid.read(value, mtype=mtype)
+    if info is not None and info.length is None:
+        # Variable-length strings read as bytes; attrs decodes them.
+        flat = value.reshape(-1)
+        for k, item in enumerate(flat):
+            if isinstance(item, bytes):
+                flat[k] = item.decode(info.encoding, 'surrogateescape')
+    return value[()] if value.ndim == 0 else value
+
+
+def _column(values, present):
+    # A masked array of values, one per row, masked where not present.
+    mask = ~present
+    found = [np.asarray(v) for v, p in zip(values, present) if p]
+    shape = found[0].shape if found else ()
+    kinds = set(a.dtype.kind for a in found)
+    # Numbers stack with numbers, strings only with strings of one kind,
+    # and anything else only with its own dtype.
+    stackable = (found and
+                 all(a.shape == shape for a in found) and
+                 (kinds <= set('biuf') or
+                  kinds in ({'S'}, {'U'}) or
+                  all(a.dtype == found[0].dtype for a in found)))
+    if stackable:
+        try:
+            dtype = np.result_type(*found)
+        except TypeError:
+            stackable = False
+    if stackable:
+        data = np.zeros((len(values),) + shape, dtype=dtype)
+        data[present] = np.stack(found)
+        mask = np.broadcast_to(mask.reshape((-1,) + (1,) * len(shape)),
+                               data.shape).copy()
+    else:
+        data = np.empty(len(values), dtype=object)
+        for k, (v, p) in enumerate(zip(values, present)):
+            if p:
+                data[k] = v
+    return np.ma.MaskedArray(data, mask=mask)
+
+
+def collect(group, names=None):
+    """
+    Read the attributes named (or all) of group and every object below it
+    in one visit, returning a dict of the paths of the objects having any
+    of them under 'path', and a masked array of each attribute's values,
+    one per path, under its name.
+    """
+    if names is not None:
+        names = [n if isinstance(n, str) else n.decode('utf-8')
+                 for n in names]
+    base = group.name.rstrip('/')
+
+    # Every object with attributes, in one visit.
+    found = []
+    root = h5py.h5o.get_info(group.id)
+    if root.num_attrs:
+        found.append((b'.', group.name))
+
+    def visit(name, info):
+        if info.num_attrs:
+            found.append((name, base + '/' + name.decode('utf-8')))
+    h5py.h5o.visit(group.id, visit, info=True)
+
+    types = _Types()
+    paths = []
+    values = {}
+    if names is not None:
+        for n in names:
+            values[n] = {}
+    for name, path in found:
+        oid = h5py.h5o.open(group.id, name)
+        row = {}
+        if names is None:
+            for k in range(h5py.h5a.get_num_attrs(oid)):
+                aid = h5py.h5a.open(oid, index=k)
+                n = aid.name.decode('utf-8')
+                row[n] = _read(aid, n, types)
+        else:
+            for n in names:
+                key = n.encode('utf-8')
+                if h5py.h5a.exists(oid, key):
+                    row[n] = _read(h5py.h5a.open(oid, key), n, types)
+        if not row:
+            continue
+        for n, value in row.items():
+            values.setdefault(n, {})[len(paths)] = value
+        paths.append(path)
+
+    columns = {}
+    columns['path'] = np.array(paths, dtype=object)
+    for n, by_row in values.items():
+        present = np.zeros(len(paths), dtype=bool)
+        present[list(by_row)] = True
+        rows = [by_row.get(k) for k in range(len(paths))]
+        columns[n] = _column(rows, present)
+    return columns
+
+
+def _collect_file(filename, path, names):
+    with h5py.File(filename, 'r') as f:
+        return collect(f[path], names)
+
+
+def _executor(executor, workers):
+    # The executor to use, and whether to shut it down afterwards.
+    if executor is not None:
+        return executor, False
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers), True
+
+
+def collect_files(filenames, names=None, path='/', workers=None,
+                  executor=None):
+    """
+    Return collect() of the group path of each file, as a list in the
+    order of filenames, the files being read in parallel by executor or by
+    a new process pool of workers processes.
+    """
+    executor, owned = _executor(executor, workers)
+    try:
+        futures = [executor.submit(_collect_file, filename, path, names)
+                   for filename in filenames]
+        return [future.result() for future in futures]
+    finally:
+        if owned:
+            executor.shutdown()
+
+
+def update(group, updates):
+    """
+    Write updates, an iterable of (path, name, value) with paths relative
+    to group, opening each object once.  An attribute that exists with the
+    shape and type class of the new value, and whose type holds the value
+    exactly, is overwritten in place; one that does not is (re)created.  Returns the number of attributes
+    written.
+    """
+    by_path = {}
+    for path, name, value in updates:
+        by_path.setdefault(path, []).append((name, value))
+
+    types = _Types()
+    count = 0
+    for path, items in by_path.items():
+        key = path.encode('utf-8') if isinstance(path, str) else path
+        oid = h5py.h5o.open(group.id, key)
+        for name, value in items:
+            if not isinstance(name, str):
+                name = name.decode('utf-8')
+            key = name.encode('utf-8')
+            if h5py.h5a.exists(oid, key):
+                aid = h5py.h5a.open(oid, key)
+                dtype, mtype, info = types.lookup(name, aid.get_type())
+                space = aid.get_space()
+                if _fits(space, dtype, info, value):
+                    aid.write(np.asarray(value, dtype=dtype), mtype=mtype)
+                    count += 1
+                    continue
+            group[path].attrs[name] = value
+            count += 1
+    return count
+
+
+def _fits(space, dtype, info, value):
+    # Whether value can be written over an attribute of that dataspace,
+    # dtype and string info as it is.
+    if space.get_simple_extent_type() == h5py.h5s.NULL:
+        return False
+    arr = np.asarray(value)
+    if arr.shape != space.shape:
+        return False
+    if info is not None:
+        return arr.dtype.kind in 'OSU' and (
+            info.length is None or
+            arr.dtype.kind == 'S' and arr.dtype.itemsize <= dtype.itemsize)
+    if dtype.kind in 'OV' or dtype.names is not None:
+        return arr.dtype == dtype
+    if arr.dtype.kind not in 'biuf' or not np.can_cast(arr.dtype, dtype,
+                                                       'same_kind'):
+        return False
+    if np.can_cast(arr.dtype, dtype, 'safe'):
+        return True
+    # A narrowing cast, so only if every value survives it.
+    with np.errstate(over='ignore', invalid='ignore'):
+        cast = arr.astype(dtype)
+    return np.array_equal(cast, arr, equal_nan=arr.dtype.kind == 'f')
+
+
+def _update_file(filename, path, updates):
+    with h5py.File(filename, 'r+') as f:
+        return update(f[path], updates)
+
+
+def update_files(updates, path='/', workers=None, executor=None):
+    """
+    Apply update() to the group path of each file, updates mapping each
+    filename to its updates, in parallel by executor or by a new process
+    pool of workers processes.  Returns a dict of the attributes written
+    to each file.
+    """
+    executor, owned = _executor(executor, workers)
+    try:
+        futures = [(filename, executor.submit(_update_file, filename, path,
+                                              list(items)))
+                   for filename, items in updates.items()]
+        return dict((filename, future.result())
+                    for filename, future in futures)
+    finally:
+        if owned:
+            executor.shutdown()
+
+
+def make_file(filename, nobjects=10000):
+    """
+    Write a file of nobjects scalar datasets, each with the attributes
+    'index' (int), 'scale' (float) and 'units' (variable-length string),
+    and every tenth also with 'flag' (int).
+    """
+    with h5py.File(filename, 'w') as f:
+        for k in range(nobjects):
+            dset = f.create_dataset('DS{0:06d}'.format(k), data=k)
+            dset.attrs['index'] = k
+            dset.attrs['scale'] = k * 0.5
+            dset.attrs['units'] = 'm/s'
+            if k % 10 == 0:
+                dset.attrs['flag'] = 1
+
+
+def benchmark(nobjects=10000, directory=None):
+    """
+    Read every attribute of a new file of nobjects datasets and then
+    rewrite 'scale' on all of them, through each object's attrs ('attrs')
+    and with collect() and update() ('bulk').
+
+    Returns a record for each with the seconds taken to read and to write.
+    """
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        paths = ['/DS{0:06d}'.format(k) for k in range(nobjects)]
+        for method in ['attrs', 'bulk']:
+            filename = os.path.join(tmpdir, method + '.h5')
+            make_file(filename, nobjects)
+            with h5py.File(filename, 'r') as f:
+                t0 = time.perf_counter()
+                if method == 'attrs':
+                    rows = dict((path, dict(f[path].attrs.items()))
+                                for path in paths)
+                    scale = [rows[path]['scale'] for path in paths]
+                else:
+                    columns = collect(f)
+                    scale = list(columns['scale'])
+                read_s = time.perf_counter() - t0
+            if scale != [k * 0.5 for k in range(nobjects)]:
+                raise RuntimeError("Attributes read do not match.")
+
+            with h5py.File(filename, 'r+') as f:
+                t0 = time.perf_counter()
+                if method == 'attrs':
+                    for k, path in enumerate(paths):
+                        f[path].attrs['scale'] = k * 0.25
+                else:
+                    update(f, [(path, 'scale', k * 0.25)
+                               for k, path in enumerate(paths)])
+                write_s = time.perf_counter() - t0
+            records.append({'method': method,
+                            'objects': nobjects,
+                            'read_s': read_s,
+                            'write_s': write_s})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare reading and writing attributes one object at "
+                    "a time and in bulk, printing JSON.")
+    parser.add_argument('--objects', type=int, default=10000)
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(nobjects=args.objects, directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Benchmark read latency and chunk decompressions against chunk cache size.
+
+h5ex_d_unlimgzip and h5ex_d_gzip read deflate-9 chunks through whatever
+chunk cache the library defaults to.  When consecutive reads share chunks,
+as row-by-row reads of chunks several rows tall do, a cache too small to
+hold those chunks makes HDF5 decompress each of them once per read instead
+of once overall.
+
+This module writes one compressed dataset, then reads it back with a range
+of cache sizes and two access patterns
+
+    rows       one row at a time, top to bottom
+    strided    every step-th row in one hyperslab, for each of step offsets;
+               each read crosses every chunk row of the dataset
+
+and reports for each the number of chunk decompressions and the read
+latency.  Decompressions are counted exactly, by opening the file through a
+Python file object and counting the reads that land on a chunk's address.
+The latencies are timed separately, through the normal file driver.
+
+    $ python -m hdf5examples.tools.cachebench --shape 4096x4096 \
+          --chunks 64x256 --cache 0 --cache 8388608
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import bufpool, chunktune, datagen
+
+SHAPE = (1024, 1024)
+CHUNKS = (64, 256)
+CACHE_SIZES = [0, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024,
+               16 * 1024 * 1024, 64 * 1024 * 1024]
+PATTERNS = ['rows', 'strided']
+
+
+class _CountingFile(io.FileIO):
+    # A read-only file object recording the offset of every read, for use
+    # with h5py's fileobj driver.
+
+    def __init__(self, name):
+        io.FileIO.__init__(self, name, 'rb')
+        self.offsets = []
+
+    def readinto(self, b):
+        self.offsets.append(self.tell())
+        return io.FileIO.readinto(self, b)
+
+
+def accesses(pattern, shape, step=None):
+    """
+    Return the hyperslabs (start, stride, count, block) read by a pattern,
+    in order.  For 'strided', step defaults to 8.
+    """
+    if pattern == 'rows':
+        return chunktune.rows(1)(shape)
+    if pattern == 'strided':
+        step = step or 8
+        rest = tuple(shape[1:])
+        lst = []
+        for offset in range(step):
+            count = (shape[0] - offset + step - 1) // step
+            lst.append(((offset,) + (0,) * len(rest),
+                        (step,) + (1,) * len(rest),
+                        (count,) + (1,) * len(rest),
+                        (1,) + rest))
+        return lst
+    msg = "Unknown pattern '{0}', choose from {1}."
+    raise ValueError(msg.format(pattern, PATTERNS))
+
+
+def _read_all(dsid, dtype, lst, latencies=None):
+    pool = bufpool.BufferPool()
+    for start, stride, count, block in lst:
+        mshape = tuple(c * b for c, b in zip(count, block))
+        mspace = h5py.h5s.create_simple(mshape)
+        fspace = dsid.get_space()
+        fspace.select_hyperslab(start, count, stride, block)
+        with pool.borrow(mshape, dtype) as buf:
+            t0 = time.perf_counter()
+            dsid.read(mspace, fspace, buf)
+            if latencies is not None:
+                latencies.append(time.perf_counter() - t0)
+
+
+def measure(filename, lst, rdcc_nbytes, rdcc_nslots=None, rdcc_w0=0.75):
+    """
+    Read the hyperslabs in lst from dataset DS1 of filename with the given
+    chunk cache, returning the number of chunks decompressed and the
+    latency of each read.
+    """
+    cache = {'rdcc_nbytes': rdcc_nbytes, 'rdcc_nslots': rdcc_nslots,
+             'rdcc_w0': rdcc_w0}
+
+    fileobj = _CountingFile(filename)
+    try:
+        with h5py.File(fileobj, 'r', **cache) as f:
+            dsid = f['DS1'].id
+            dtype = f['DS1'].dtype
+            chunk_offsets = set(dsid.get_chunk_info(k).byte_offset
+                                for k in range(dsid.get_num_chunks()))
+            nread = len(fileobj.offsets)
+            _read_all(dsid, dtype, lst)
+            decompressions = sum(1 for offset in fileobj.offsets[nread:]
+                                 if offset in chunk_offsets)
+    finally:
+        fileobj.close()
+
+    latencies = []
+    with h5py.File(filename, 'r', **cache) as f:
+        _read_all(f['DS1'].id, f['DS1'].dtype, lst, latencies)
+    return decompressions, latencies
+
+
+def run(shape=SHAPE, chunks=CHUNKS, dtype='<i4', level=9,
+        cache_sizes=CACHE_SIZES, patterns=PATTERNS, step=None,
+        directory=None):
+    """
+    Write a deflate-compressed dataset and read it back with each cache
+    size and pattern.
+
+    Returns a list of records with the cache settings, the number of reads,
+    the chunks decompressed (and the number of chunks in the dataset, the
+    least any pattern covering it could decompress), and the total, mean,
+    median and 95th percentile read latency in seconds.  Hash slots are
+    sized by chunktune.cache_settings.
+    """
+    shape = tuple(shape)
+    chunks = tuple(chunks)
+    if step is None:
+        step = chunks[0]
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    filename = os.path.join(tmpdir, 'cachebench.h5')
+    records = []
+    try:
+        with h5py.File(filename, 'w') as f:
+            dset = f.create_dataset('DS1', shape, dtype=dtype, chunks=chunks,
+                                    compression='gzip',
+                                    compression_opts=level)
+            datagen.fill(dset, 'product')
+            nchunks = dset.id.get_num_chunks()
+
+        for pattern in patterns:
+            lst = accesses(pattern, shape, step)
+            for nbytes in cache_sizes:
+                nslots, nbytes, w0 = chunktune.cache_settings(chunks, dtype,
+                                                              nbytes,
+                                                              shape=shape)
+                decompressions, latencies = measure(filename, lst, nbytes,
+                                                    nslots, w0)
+                latencies = np.array(latencies)
+                records.append({'pattern': pattern,
+                                'shape': list(shape),
+                                'chunks': list(chunks),
+                                'dtype': np.dtype(dtype).str,
+                                'rdcc_nbytes': nbytes,
+                                'rdcc_nslots': nslots,
+                                'rdcc_w0': w0,
+                                'reads': len(lst),
+                                'chunks_in_dataset': nchunks,
+                                'decompressions': decompressions,
+                                'total_s': float(latencies.sum()),
+                                'mean_s': float(latencies.mean()),
+                                'median_s': float(np.median(latencies)),
+                                'p95_s': float(np.percentile(latencies,
+                                                             95))})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def _shape(s):
+    return tuple(int(x) for x in s.split('x'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the chunk cache, printing JSON.")
+    parser.add_argument('--shape', type=_shape, default=SHAPE,
+                        help="dataset shape, e.g. 1024x1024")
+    parser.add_argument('--chunks', type=_shape, default=CHUNKS,
+                        help="chunk shape, e.g. 64x256")
+    parser.add_argument('--dtype', default='<i4')
+    parser.add_argument('--level', type=int, default=9,
+                        help="deflate level")
+    parser.add_argument('--cache', type=int, action='append',
+                        help="cache size in bytes, may be repeated")
+    parser.add_argument('--pattern', action='append', choices=PATTERNS)
+    parser.add_argument('--step', type=int, default=None,
+                        help="row step for the strided pattern "
+                             "(default: chunk height)")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch file")
+    args = parser.parse_args(argv)
+
+    records = run(shape=args.shape, chunks=args.chunks, dtype=args.dtype,
+                  level=args.level, cache_sizes=args.cache or CACHE_SIZES,
+                  patterns=args.pattern or PATTERNS, step=args.step,
+                  directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
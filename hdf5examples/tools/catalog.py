@@ -0,0 +1,345 @@
+"""
+Keep a sidecar catalog of a file's objects, to query without opening it.
+
+h5ex_g_visit walks the whole file with h5py.h5o.visit every time it is
+run, and finding, say, the int32 datasets under /G1 also means opening
+every dataset to look at its type.  For files of millions of objects each
+such question takes minutes.
+
+build() walks the file once and records, for every object, its path,
+type, and for datasets their shape, dtype, layout, chunk shape, filters
+and storage size, in a NumPy structured array sorted by path.  The array
+is saved next to the file (by default as FILE.catalog.npz), stamped with
+the file's size and modification time.  load() reads the catalog back
+only if the stamp still matches the file, and get() loads it or builds it
+anew.  Queries then never touch the HDF5 file: the objects under a group
+are a range of the sorted paths found by binary search, and the other
+conditions are vectorized comparisons.
+
+    >>> from hdf5examples.tools import catalog
+    >>> cat = catalog.get('h5ex_g_visit.h5')
+    >>> rows = cat.find('/group1', type='Dataset', dtype='<i4')
+    >>> [path.decode('utf-8') for path in rows['path']]
+    >>> rows['shape'][:, :rows['ndim'].max()]
+
+Each object is listed once, under the path the visit reached it by, as
+h5ex_g_visit prints it.  Compound and other structured types are recorded
+by dtype.str, so they all appear as '|V' with their size.
+
+Run the module to compare against visiting the file for every query:
+
+    $ python -m hdf5examples.tools.catalog --groups 100 --datasets 1000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+# Bumped whenever the fields change, so that old catalogs are rebuilt.
+VERSION = 2
+
+SUFFIX = '.catalog.npz'
+
+TYPES = {h5py.h5o.TYPE_GROUP: 'Group',
+         h5py.h5o.TYPE_DATASET: 'Dataset',
+         h5py.h5o.TYPE_NAMED_DATATYPE: 'Datatype'}
+
+LAYOUTS = {h5py.h5d.COMPACT: 'compact',
+           h5py.h5d.CONTIGUOUS: 'contiguous',
+           h5py.h5d.CHUNKED: 'chunked',
+           h5py.h5d.VIRTUAL: 'virtual'}
+
+
+def _code(value, names):
+    # The code of a type or layout given by name or code.
+    if isinstance(value, str):
+        for code, name in names.items():
+            if name.lower() == value.lower():
+                return code
+        raise ValueError("Unknown name {0}.".format(value))
+    return value
+
+
+def _state(filename):
+    # The stamp a catalog of the file must carry to be current.
+    st = os.stat(filename)
+    return np.array([VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def sidecar(filename):
+    """Return the default path of the catalog of filename."""
+    return filename + SUFFIX
+
+
+def _dtype(tid, types):
+    # The dtype.str of an HDF5 type, kept in types, a list of the types
+    # seen and theirs, as a file's datasets mostly share a few types.
+    for seen, dtype in types:
+        if seen.equal(tid):
+            return dtype
+    dtype = tid.dtype.str.encode('ascii')
+    types.append((tid, dtype))
+    return dtype
+
+
+def _describe(fid, name, info, types):
+    # The row of one object: path, type, and for datasets the rest.
+    row = {'path': b'/' if name == b'.' else b'/' + name,
+           'type': info.type,
+           'ndim': 0,
+           'shape': (),
+           'dtype': b'',
+           'layout': -1,
+           'chunks': (),
+           'filters': b'',
+           'storage': 0}
+    if info.type == h5py.h5o.TYPE_DATASET:
+        dsid = h5py.h5o.open(fid, name)
+        dcpl = dsid.get_create_plist()
+        # A null dataspace (h5py.Empty) has no shape at all.
+        if dsid.shape is None:
+            row['ndim'] = -1
+        else:
+            row['shape'] = dsid.shape
+            row['ndim'] = len(dsid.shape)
+        row['dtype'] = _dtype(dsid.get_type(), types)
+        row['layout'] = dcpl.get_layout()
+        if row['layout'] == h5py.h5d.CHUNKED:
+            row['chunks'] = dcpl.get_chunk()
+        row['filters'] = b','.join(dcpl.get_filter(k)[3]
+                                   for k in range(dcpl.get_nfilters()))
+        row['storage'] = dsid.get_storage_size()
+    elif info.type == h5py.h5o.TYPE_NAMED_DATATYPE:
+        row['dtype'] = _dtype(h5py.h5o.open(fid, name), types)
+    return row
+
+
+def _records(rows):
+    # The structured array of rows, sorted by path, its string fields as
+    # wide as their longest value and its shapes as long as the most axes.
+    ndim = max([len(row['shape']) for row in rows] + [1])
+
+    def width(field):
+        return max([len(row[field]) for row in rows] + [1])
+    dtype = np.dtype([('path', 'S{0}'.format(width('path'))),
+                      ('type', 'i1'),
+                      ('ndim', 'i1'),
+                      ('shape', 'i8', (ndim,)),
+                      ('dtype', 'S{0}'.format(width('dtype'))),
+                      ('layout', 'i1'),
+                      ('chunks', 'i8', (ndim,)),
+                      ('filters', 'S{0}'.format(width('filters'))),
+                      ('storage', 'i8')])
+    records = np.zeros(len(rows), dtype=dtype)
+    for k, row in enumerate(rows):
+        rec = records[k]
+        for field in ['path', 'type', 'ndim', 'dtype', 'layout', 'filters',
+                      'storage']:
+            rec[field] = row[field]
+        rec['ndim'] = row['ndim']
+        rec['shape'][:len(row['shape'])] = row['shape']
+        rec['chunks'][:len(row['chunks'])] = row['chunks']
+    return records[np.argsort(records['path'], kind='stable')]
+
+
+class Catalog(object):
+    """
+    The objects of a file as a structured array, records, sorted by path,
+    with the fields path (bytes), type (h5py.h5o.TYPE_*), ndim (-1 for a
+    dataset with a null dataspace), shape and chunks (padded with zeros to
+    the most axes of any dataset), dtype (dtype.str as bytes), layout
+    (h5py.h5d.*, or -1 if not a dataset), filters (names joined by commas,
+    as bytes) and storage (bytes allocated).
+    """
+
+    def __init__(self, records, filename=None):
+        self.records = records
+        self.filename = filename
+
+    def __len__(self):
+        return len(self.records)
+
+    def under(self, group='/'):
+        """Return the records of the objects below group, not itself."""
+        if not isinstance(group, bytes):
+            group = group.encode('utf-8')
+        group = group.rstrip(b'/')
+        if not group:
+            return self.records[self.records['path'] != b'/']
+        # Paths below group sort after group + '/' and before group + '0',
+        # '0' being the byte after '/'.
+        paths = self.records['path']
+        start = np.searchsorted(paths, group + b'/', side='left')
+        stop = np.searchsorted(paths, group + b'0', side='left')
+        return self.records[start:stop]
+
+    def find(self, group='/', type=None, dtype=None, layout=None,
+             filter=None):
+        """
+        Return the records of the objects below group, of the type and
+        layout given (by code or by name, as in TYPES and LAYOUTS), with
+        the dtype given and using the filter named, those given.
+        """
+        rows = self.under(group)
+        keep = np.ones(len(rows), dtype=bool)
+        if type is not None:
+            keep &= rows['type'] == _code(type, TYPES)
+        if dtype is not None:
+            keep &= rows['dtype'] == np.dtype(dtype).str.encode('ascii')
+        if layout is not None:
+            keep &= rows['layout'] == _code(layout, LAYOUTS)
+        if filter is not None:
+            if not isinstance(filter, bytes):
+                filter = filter.encode('utf-8')
+            filters = np.char.add(np.char.add(b',', rows['filters']), b',')
+            keep &= np.char.find(filters, b',' + filter + b',') >= 0
+        return rows[keep]
+
+
+def build(filename, path=None):
+    """
+    Visit every object of filename and save their catalog at path (by
+    default sidecar(filename)), returning it as a Catalog.
+    """
+    if path is None:
+        path = sidecar(filename)
+    state = _state(filename)
+    fid = h5py.h5f.open(os.fsencode(filename), h5py.h5f.ACC_RDONLY)
+    try:
+        types = []
+        rows = [_describe(fid, b'.', h5py.h5o.get_info(fid), types)]
+
+        def visit(name, info):
+            rows.append(_describe(fid, name, info, types))
+        h5py.h5o.visit(fid, visit, info=True)
+    finally:
+        fid.close()
+    records = _records(rows)
+
+    # Written aside and moved into place, so that readers never see half a
+    # catalog.
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fh:
+        np.savez(fh, records=records, state=state)
+    os.replace(tmp, path)
+    return Catalog(records, filename)
+
+
+def load(filename, path=None):
+    """
+    Return the catalog of filename saved at path (by default
+    sidecar(filename)) as a Catalog, or None if there is none or the file
+    has changed since it was made.  The file itself is not opened.
+    """
+    if path is None:
+        path = sidecar(filename)
+    try:
+        with np.load(path) as saved:
+            if not np.array_equal(saved['state'], _state(filename)):
+                return None
+            return Catalog(saved['records'], filename)
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def get(filename, path=None):
+    """Return load(filename, path), or build(filename, path) if None."""
+    cat = load(filename, path)
+    if cat is None:
+        cat = build(filename, path)
+    return cat
+
+
+def make_file(filename, ngroups=100, ndatasets=1000):
+    """
+    Write a file of ngroups groups holding ndatasets small datasets
+    between them, alternately int32 and float64, every other one chunked
+    and compressed.
+    """
+    with h5py.File(filename, 'w') as f:
+        groups = [f.create_group('G{0:04d}'.format(k))
+                  for k in range(ngroups)]
+        for k in range(ndatasets):
+            group = groups[k % ngroups]
+            dtype = 'i4' if k % 2 == 0 else 'f8'
+            kwargs = {}
+            if k % 4 < 2:
+                kwargs = {'chunks': (4,), 'compression': 'gzip'}
+            group.create_dataset('DS{0:06d}'.format(k), (8,), dtype=dtype,
+                                 **kwargs)
+
+
+def benchmark(ngroups=100, ndatasets=1000, group='/', directory=None):
+    """
+    Find the int32 datasets under group of a new file of ngroups groups
+    and ndatasets datasets by visiting the group, opening each dataset to
+    check its type ('visit'); by building the catalog and then querying it
+    ('build'); and by loading the catalog saved and querying it ('load').
+
+    Returns a record for each with the seconds taken.
+    """
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        filename = os.path.join(tmpdir, 'catalog.h5')
+        make_file(filename, ngroups, ndatasets)
+        for method in ['visit', 'build', 'load']:
+            t0 = time.perf_counter()
+            if method == 'visit':
+                found = []
+                with h5py.File(filename, 'r') as f:
+                    def visit(name, obj):
+                        if (isinstance(obj, h5py.Dataset) and
+                                obj.dtype == np.dtype('<i4')):
+                            found.append(obj.name)
+                    f[group].visititems(visit)
+                found.sort()
+            else:
+                if method == 'build':
+                    cat = build(filename)
+                else:
+                    cat = load(filename)
+                rows = cat.find(group, type='Dataset', dtype='<i4')
+                found = [p.decode('utf-8') for p in rows['path']]
+            seconds = time.perf_counter() - t0
+            if method == 'visit':
+                expected = found
+            elif found != expected:
+                raise RuntimeError("Datasets found do not match.")
+            records.append({'method': method,
+                            'groups': ngroups,
+                            'datasets': ndatasets,
+                            'group': group,
+                            'found': len(found),
+                            'seconds': seconds})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare querying a file's objects by visiting it and "
+                    "through its catalog, printing JSON.")
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--datasets', type=int, default=1000)
+    parser.add_argument('--group', default='/',
+                        help="the group to find int32 datasets under")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(ngroups=args.groups, ndatasets=args.datasets,
+                        group=args.group, directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
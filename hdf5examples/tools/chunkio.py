@@ -0,0 +1,326 @@
+"""
+Parallel chunk compression and decompression using direct chunk I/O.
+
+h5ex_d_gzip and h5_comprss hand the whole array to dset.write, and HDF5 then
+runs each chunk through the filter pipeline one after another on a single
+core.  Here the array is cut into chunks, each chunk is run through the
+same pipeline (shuffle, deflate, fletcher32) in a thread or process pool,
+and the filtered bytes are written with write_direct_chunk, bypassing the
+library's filters.  The result is an ordinary HDF5 dataset that any reader
+can open.
+
+Reading works the same way in reverse: read() lists the allocated chunks,
+fetches their stored bytes with read_direct_chunk, and undoes the pipeline
+in the pool, each worker writing its chunk straight into the output array.
+
+zlib releases the GIL while it compresses and decompresses, so the default
+thread pool keeps every core busy.
+
+    >>> import h5py, numpy as np
+    >>> from hdf5examples.tools import chunkio
+    >>> data = np.arange(4096 * 4096, dtype='<i4').reshape(4096, 4096)
+    >>> with h5py.File('big.h5', 'w') as f:
+    ...     dset = chunkio.create_dataset(f, 'DS1', data, chunks=(256, 256),
+    ...                                   level=9)
+    >>> with h5py.File('big.h5', 'r') as f:
+    ...     rdata = chunkio.read(f['DS1'])
+"""
+import concurrent.futures
+import itertools
+import os
+import zlib
+
+import numpy as np
+import h5py
+
+# The filters handled here.  Any other filter in a dataset's pipeline means
+# the data goes through the library instead.
+SUPPORTED = (h5py.h5z.FILTER_SHUFFLE,
+             h5py.h5z.FILTER_DEFLATE,
+             h5py.h5z.FILTER_FLETCHER32)
+
+
+def pipeline(dset):
+    """
+    Return the dataset's filter pipeline as a list of (filter, parameter)
+    pairs in the order they are applied on writing, or None if the pipeline
+    includes a filter this module does not handle.  The parameter is the
+    compression level for deflate, the element size for shuffle, and None
+    for fletcher32.
+    """
+    dcpl = dset.id.get_create_plist()
+    lst = []
+    for k in range(dcpl.get_nfilters()):
+        code, flags, values, name = dcpl.get_filter(k)
+        if code not in SUPPORTED:
+            return None
+        if code == h5py.h5z.FILTER_DEFLATE:
+            param = values[0]
+        elif code == h5py.h5z.FILTER_SHUFFLE:
+            param = values[0] if values else dset.dtype.itemsize
+        else:
+            param = None
+        lst.append((code, param))
+    return lst
+
+
+def fletcher32(buf):
+    """
+    HDF5's Fletcher-32 checksum of a bytes-like object.
+
+    This is H5_checksum_fletcher32: big-endian 16-bit words, with an odd
+    trailing byte treated as the high byte of a final word, and both sums
+    kept in one's complement (so never zero unless the data is).
+    """
+    buf = np.frombuffer(buf, dtype=np.uint8)
+    words = buf[:len(buf) // 2 * 2].view('>u2').astype(np.uint64)
+    n = len(words)
+    weights = (n - np.arange(n, dtype=np.uint64)) % 65535
+    sum1 = int(words.sum())
+    sum2 = int((words * weights % 65535).sum())
+    if len(buf) % 2:
+        sum1 += int(buf[-1]) << 8
+        sum2 += sum1
+    # Both sums are zero only if every word is, and sum2 has been reduced
+    # modulo 65535 already, so test sum1.
+    return (_fold(sum2, sum1 != 0) << 16) | _fold(sum1, sum1 != 0)
+
+
+def _fold(s, nonzero):
+    # One's complement reduction: a nonzero sum never folds down to zero.
+    r = s % 65535
+    if r == 0 and nonzero:
+        r = 0xffff
+    return r
+
+
+def encode(chunk, filters):
+    """
+    Run one full chunk (an array in the file's dtype) through the filters,
+    returning the bytes HDF5 would store.
+    """
+    chunk = np.ascontiguousarray(chunk)
+    itemsize = chunk.dtype.itemsize
+    buf = chunk.view(np.uint8).reshape(-1)
+    for code, param in filters:
+        if code == h5py.h5z.FILTER_SHUFFLE:
+            buf = buf.reshape(-1, itemsize).T.reshape(-1)
+        elif code == h5py.h5z.FILTER_DEFLATE:
+            buf = np.frombuffer(zlib.compress(buf, param), dtype=np.uint8)
+        elif code == h5py.h5z.FILTER_FLETCHER32:
+            checksum = np.array([fletcher32(buf)], dtype='<u4')
+            buf = np.concatenate([buf, checksum.view(np.uint8)])
+    return buf.tobytes()
+
+
+def decode(buf, filters, filter_mask=0, verify=True):
+    """
+    Undo the filters on the stored bytes of one chunk, returning a uint8
+    array of the chunk's raw data.
+
+    Filters whose bit is set in filter_mask were skipped when the chunk was
+    written, and are skipped here too.  Fletcher-32 checksums are verified
+    unless verify is False; a mismatch raises OSError.
+    """
+    buf = np.frombuffer(buf, dtype=np.uint8)
+    for k in reversed(range(len(filters))):
+        if filter_mask & (1 << k):
+            continue
+        code, param = filters[k]
+        if code == h5py.h5z.FILTER_FLETCHER32:
+            body, stored = buf[:-4], buf[-4:]
+            if verify:
+                checksum = fletcher32(body)
+                # Files from very old libraries stored it byte-swapped.
+                if stored.view('<u4')[0] != checksum and \
+                        stored.view('>u4')[0] != checksum:
+                    raise OSError("Fletcher-32 checksum mismatch.")
+            buf = body
+        elif code == h5py.h5z.FILTER_DEFLATE:
+            buf = np.frombuffer(zlib.decompress(buf), dtype=np.uint8)
+        elif code == h5py.h5z.FILTER_SHUFFLE:
+            buf = buf.reshape(param, -1).T.reshape(-1)
+    return buf
+
+
+def chunk_slices(shape, chunks):
+    """
+    Yield (offset, selection) for every chunk of a dataset, in row-major
+    order.  The selection is clipped at the dataset edge.
+    """
+    starts = [range(0, n, c) for n, c in zip(shape, chunks)]
+    for offset in itertools.product(*starts):
+        sel = tuple(slice(o, min(o + c, n))
+                    for o, c, n in zip(offset, chunks, shape))
+        yield offset, sel
+
+
+def _encode_tile(tile, chunks, fillvalue, filters):
+    # Edge chunks are stored full size, padded with the fill value.
+    if tile.shape != tuple(chunks):
+        full = np.empty(chunks, dtype=tile.dtype)
+        full.fill(fillvalue)
+        full[tuple(slice(0, n) for n in tile.shape)] = tile
+        tile = full
+    return encode(tile, filters)
+
+
+def write(dset, data, executor=None, workers=None):
+    """
+    Write data, an array the shape of the dataset, to a chunked dataset,
+    compressing the chunks in parallel.
+
+    The work is done by executor (any concurrent.futures executor) if one
+    is given, or else by a thread pool of workers threads (default: one per
+    CPU).  At most twice as many chunks as workers are in flight at once.
+    If the dataset's pipeline has a filter other than shuffle, deflate and
+    fletcher32, the data is written through the library instead.
+
+    Worker processes forked while the file is open inherit its lock, so a
+    process pool used here should be shut down before the file is reopened.
+    """
+    if dset.chunks is None:
+        raise ValueError("Dataset {0} is not chunked.".format(dset.name))
+    if tuple(data.shape) != dset.shape:
+        msg = "Data has shape {0}, dataset {1} has shape {2}."
+        raise ValueError(msg.format(data.shape, dset.name, dset.shape))
+
+    filters = pipeline(dset)
+    if filters is None:
+        dset.write_direct(np.ascontiguousarray(data))
+        return
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    owner = executor is None
+    if owner:
+        executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    chunks = dset.chunks
+    fillvalue = dset.fillvalue
+    try:
+        pending = []
+        for offset, sel in chunk_slices(dset.shape, chunks):
+            tile = np.asarray(data[sel], dtype=dset.dtype)
+            future = executor.submit(_encode_tile, tile, chunks, fillvalue,
+                                     filters)
+            pending.append((offset, future))
+            if len(pending) >= 2 * workers:
+                offset, future = pending.pop(0)
+                dset.id.write_direct_chunk(offset, future.result())
+        for offset, future in pending:
+            dset.id.write_direct_chunk(offset, future.result())
+    finally:
+        if owner:
+            executor.shutdown()
+
+
+def create_dataset(group, name, data, chunks, level=6, shuffle=True,
+                   fletcher32=False, executor=None, workers=None, **kwargs):
+    """
+    Create a deflate-compressed dataset from data and fill it with write().
+
+    Any other keyword arguments are passed on to create_dataset.
+    """
+    dset = group.create_dataset(name, data.shape, dtype=data.dtype,
+                                chunks=tuple(chunks), compression='gzip',
+                                compression_opts=level, shuffle=shuffle,
+                                fletcher32=fletcher32, **kwargs)
+    write(dset, data, executor=executor, workers=workers)
+    return dset
+
+
+def _decode_tile(buf, filter_mask, filters, verify, chunks, dtype, crop,
+                 out=None, sel=None):
+    # Decode one chunk and crop it to the part inside the dataset.  With an
+    # output array (threads share memory), write it there; otherwise return
+    # it (processes do not).
+    tile = decode(buf, filters, filter_mask, verify).view(dtype)
+    tile = tile.reshape(chunks)[crop]
+    if out is None:
+        return tile
+    out[sel] = tile
+
+
+def _chunk_info(dsid):
+    # Every allocated chunk's StoreInfo.  chunk_iter is one pass over the
+    # chunk index, but needs h5py 3.8 and a recent library.
+    infos = []
+    if hasattr(dsid, 'chunk_iter'):
+        try:
+            dsid.chunk_iter(infos.append)
+            return infos
+        except (AttributeError, NotImplementedError, RuntimeError):
+            infos = []
+    for k in range(dsid.get_num_chunks()):
+        infos.append(dsid.get_chunk_info(k))
+    return infos
+
+
+def read(dset, out=None, executor=None, workers=None, verify=True):
+    """
+    Read a whole chunked dataset, decompressing the chunks in parallel.
+
+    The result goes into out if it is given (it must have the dataset's
+    shape, and may have a different dtype), or else into a new array.
+    Chunks that were never written read as the fill value.  The executor and
+    workers arguments are as for write(); with a process pool the decoded
+    chunks are copied into out by the calling thread.  Datasets that are
+    not chunked, or whose pipeline has a filter other than shuffle, deflate
+    and fletcher32, are read through the library instead.
+    """
+    if out is None:
+        out = np.empty(dset.shape, dtype=dset.dtype)
+    elif tuple(out.shape) != dset.shape:
+        msg = "Output array has shape {0}, dataset {1} has shape {2}."
+        raise ValueError(msg.format(out.shape, dset.name, dset.shape))
+
+    filters = None if dset.chunks is None else pipeline(dset)
+    if filters is None:
+        dset.read_direct(out)
+        return out
+
+    chunks = dset.chunks
+    dsid = dset.id
+    infos = _chunk_info(dsid)
+    nchunks = int(np.prod([-(-n // c) for n, c in zip(dset.shape, chunks)]))
+    if len(infos) < nchunks:
+        out[...] = dset.fillvalue
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    owner = executor is None
+    if owner:
+        executor = concurrent.futures.ThreadPoolExecutor(workers)
+    shared = not isinstance(executor, concurrent.futures.ProcessPoolExecutor)
+
+    def finish(sel, future):
+        tile = future.result()
+        if not shared:
+            out[sel] = tile
+
+    try:
+        pending = []
+        for info in infos:
+            offset = info.chunk_offset
+            sel = tuple(slice(o, min(o + c, n))
+                        for o, c, n in zip(offset, chunks, dset.shape))
+            crop = tuple(slice(0, s.stop - s.start) for s in sel)
+            filter_mask, buf = dsid.read_direct_chunk(offset)
+            if shared:
+                future = executor.submit(_decode_tile, buf, filter_mask,
+                                         filters, verify, chunks, dset.dtype,
+                                         crop, out, sel)
+            else:
+                future = executor.submit(_decode_tile, buf, filter_mask,
+                                         filters, verify, chunks, dset.dtype,
+                                         crop)
+            pending.append((sel, future))
+            if len(pending) >= 2 * workers:
+                finish(*pending.pop(0))
+        for sel, future in pending:
+            finish(sel, future)
+    finally:
+        if owner:
+            executor.shutdown()
+    return out
@@ -0,0 +1,448 @@
+"""
+Choose a chunk shape and chunk cache size from the expected read pattern.
+
+h5ex_d_chunk and the unlimited-dimension examples hard-code 4x4 chunks, which
+suits neither a 6x8 dataset (half the chunks hang off the edge) nor any real
+workload.  HDF5 always reads whole chunks, so a chunk shape that cuts across
+the way the data is read multiplies the I/O, and a chunk cache too small to
+hold the chunks one read touches makes every read start from scratch.
+
+A workload is a list of access patterns, each a function of the dataset shape
+returning a list of hyperslabs (start, stride, count, block) in the order they
+are read.  The pattern constructors are
+
+    rows(n)                           n whole rows (first axis) at a time
+    columns(n)                        n whole columns (last axis) at a time
+    hyperslab(start, stride, count, block)
+                                      one strided selection, as in
+                                      h5ex_d_chunk; count=None repeats the
+                                      blocks to the end of the dataset
+    tiles(tile, n)                    n tiles at random offsets
+
+For example, to tune for the selection h5ex_d_chunk reads back,
+
+    >>> from hdf5examples.tools import chunktune
+    >>> pattern = chunktune.hyperslab((0, 1), (4, 4), (2, 2), (2, 3))
+    >>> result = chunktune.tune((6, 8), '<i4', [pattern])
+    >>> result['chunks'], result['rdcc_nbytes']
+    ((6, 8), 1048576)
+
+tune() ranks every candidate chunk shape with a cost model (chunks read,
+bytes read, chunks reused from the cache between consecutive reads), then
+times the best few on a synthetic file and recommends the fastest.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import bufpool, datagen
+
+# HDF5 1.x's default chunk cache is 1 MiB (2.0 raised it to 8 MiB); never
+# recommend less.
+DEFAULT_CACHE = 1024 * 1024
+
+# Rough costs used to rank candidates before they are measured.
+CHUNK_OVERHEAD = 20e-6
+BANDWIDTH = 500e6
+
+
+def rows(n=1):
+    """
+    Read n whole rows (indices along the first axis) at a time, top to
+    bottom.
+    """
+    def pattern(shape):
+        lst = []
+        for i in range(0, shape[0], n):
+            start = (i,) + (0,) * (len(shape) - 1)
+            block = (min(n, shape[0] - i),) + tuple(shape[1:])
+            lst.append((start, (1,) * len(shape), (1,) * len(shape), block))
+        return lst
+    return pattern
+
+
+def columns(n=1):
+    """
+    Read n whole columns (indices along the last axis) at a time, left to
+    right.
+    """
+    def pattern(shape):
+        lst = []
+        for j in range(0, shape[-1], n):
+            start = (0,) * (len(shape) - 1) + (j,)
+            block = tuple(shape[:-1]) + (min(n, shape[-1] - j),)
+            lst.append((start, (1,) * len(shape), (1,) * len(shape), block))
+        return lst
+    return pattern
+
+
+def hyperslab(start, stride, count, block):
+    """
+    Read one regular hyperslab.  If count is None, or None along an axis,
+    the blocks repeat to the end of the dataset along that axis.
+    """
+    def pattern(shape):
+        if count is None:
+            cnt = (None,) * len(shape)
+        else:
+            cnt = count
+        cnt = tuple(c if c is not None else (n - s - b) // st + 1
+                    for c, n, s, st, b in zip(cnt, shape, start, stride,
+                                              block))
+        return [(tuple(start), tuple(stride), cnt, tuple(block))]
+    return pattern
+
+
+def tiles(tile, n=100, seed=0):
+    """
+    Read n tiles of the given shape at random offsets.
+    """
+    def pattern(shape):
+        rs = np.random.RandomState(seed)
+        t = tuple(min(a, b) for a, b in zip(tile, shape))
+        ones = (1,) * len(shape)
+        lst = []
+        for _ in range(n):
+            start = tuple(int(rs.randint(0, s - b + 1))
+                          for s, b in zip(shape, t))
+            lst.append((start, ones, ones, t))
+        return lst
+    return pattern
+
+
+def _touched(start, stride, count, block, c):
+    """
+    Chunk indices touched along one axis, as a range if they are contiguous
+    or else a sorted array.
+    """
+    if count == 1 or stride <= block:
+        stop = start + (count - 1) * stride + block
+        return range(start // c, (stop - 1) // c + 1)
+    starts = start + stride * np.arange(count)
+    lo = starts // c
+    hi = (starts + block - 1) // c
+    if np.all(lo[1:] <= hi[:-1] + 1):
+        return range(int(lo[0]), int(hi[-1]) + 1)
+    idx = np.concatenate([np.arange(a, b + 1) for a, b in zip(lo, hi)])
+    return np.unique(idx)
+
+
+def _overlap(a, b):
+    if isinstance(a, range) and isinstance(b, range):
+        return max(0, min(a.stop, b.stop) - max(a.start, b.start))
+    return len(np.intersect1d(np.asarray(a), np.asarray(b)))
+
+
+def _axis_counts(accesses, axis, c, memo):
+    """
+    Number of chunk indices each access touches along one axis, and how
+    many of them the previous access also touched.  Every candidate sharing
+    this chunk extent shares the answer, so it is memoized.
+    """
+    key = (id(accesses), axis, c)
+    if key not in memo:
+        lens = np.zeros(len(accesses), dtype=np.int64)
+        overlaps = np.zeros(len(accesses), dtype=np.int64)
+        previous = None
+        for k, (start, stride, count, block) in enumerate(accesses):
+            touched = _touched(start[axis], stride[axis], count[axis],
+                               block[axis], c)
+            lens[k] = len(touched)
+            if previous is not None:
+                overlaps[k] = _overlap(touched, previous)
+            previous = touched
+        memo[key] = (accesses, lens, overlaps)
+    return memo[key][1:]
+
+
+def model(shape, dtype, chunks, accesses, max_cache=64 * 1024 * 1024,
+          overhead=CHUNK_OVERHEAD, bandwidth=BANDWIDTH, memo=None):
+    """
+    Estimate the cost of reading a list of hyperslabs with the given chunk
+    shape.
+
+    Returns a dict with the modeled seconds, the chunks and bytes read, the
+    bytes actually selected, and the chunk cache needed to hold the chunks
+    of the largest single read (capped at max_cache).  If the cache can hold
+    them, chunks shared with the previous read are counted as free.  Pass
+    the same memo dict when scoring many chunk shapes against the same
+    accesses.
+    """
+    if memo is None:
+        memo = {}
+    chunk_bytes = int(np.prod(chunks)) * np.dtype(dtype).itemsize
+    touched = np.ones(len(accesses), dtype=np.int64)
+    shared = np.ones(len(accesses), dtype=np.int64)
+    for axis, c in enumerate(chunks):
+        lens, overlaps = _axis_counts(accesses, axis, c, memo)
+        touched *= lens
+        shared *= overlaps
+
+    working_set = int(touched.max()) * chunk_bytes
+    cache = max(DEFAULT_CACHE, min(working_set, max_cache))
+    if working_set <= cache:
+        touched = touched - shared
+    nchunks = int(touched.sum())
+
+    key = (id(accesses), 'selected')
+    if key not in memo:
+        selected = sum(int(np.prod(count)) * int(np.prod(block))
+                       for _, _, count, block in accesses)
+        memo[key] = (accesses, selected * np.dtype(dtype).itemsize)
+    selected = memo[key][1]
+    nbytes = nchunks * chunk_bytes
+    return {'seconds': nchunks * overhead + nbytes / bandwidth,
+            'chunks_read': nchunks,
+            'bytes_read': nbytes,
+            'bytes_selected': selected,
+            'rdcc_nbytes': cache}
+
+
+def cache_settings(chunks, dtype, nbytes, w0=0.75, shape=None):
+    """
+    Return (nslots, nbytes, w0) for a cache of nbytes holding chunks of the
+    given shape.  HDF5 recommends a prime number of hash slots, about 100
+    times the number of chunks that fit in the cache.  If the dataset shape
+    is given, there is no point counting more chunks than it has.
+    """
+    chunk_bytes = int(np.prod(chunks)) * np.dtype(dtype).itemsize
+    nchunks = max(1, nbytes // chunk_bytes)
+    if shape is not None:
+        nchunks = min(nchunks, int(np.prod([-(-n // c)
+                                            for n, c in zip(shape, chunks)])))
+    nslots = _next_prime(max(521, 100 * nchunks))
+    return nslots, int(nbytes), w0
+
+
+def _next_prime(n):
+    while True:
+        if n > 1 and all(n % d for d in range(2, int(n ** 0.5) + 1)):
+            return n
+        n += 1
+
+
+def candidates(shape, dtype, min_bytes=8 * 1024, max_bytes=4 * 1024 * 1024):
+    """
+    Enumerate candidate chunk shapes.
+
+    Along each axis the candidate extents are the powers of two up to the
+    dimension, the divisors of the dimension (so chunks can tile it with no
+    partial edge chunks) and the dimension itself.  Shapes whose size falls
+    outside [min_bytes, max_bytes] are dropped, with min_bytes relaxed to
+    the dataset size for datasets smaller than that.
+    """
+    itemsize = np.dtype(dtype).itemsize
+    total = int(np.prod(shape)) * itemsize
+    min_bytes = min(min_bytes, total)
+
+    extents = []
+    for n in shape:
+        vals = set(2 ** k for k in range(int(np.log2(n)) + 1))
+        vals.update(d for d in range(1, int(n ** 0.5) + 1) if n % d == 0)
+        vals.update(n // d for d in list(vals) if n % d == 0)
+        vals.add(n)
+        extents.append(sorted(vals))
+
+    lst = []
+    for chunks in itertools.product(*extents):
+        nbytes = int(np.prod(chunks)) * itemsize
+        if min_bytes <= nbytes <= max_bytes:
+            lst.append(chunks)
+    return lst
+
+
+def _accesses(patterns, shape, max_accesses):
+    lst = []
+    for pattern in patterns:
+        lst.append(pattern(shape)[:max_accesses])
+    return lst
+
+
+def _padding(shape, chunks):
+    # Fraction of allocated chunk space lying beyond the dataset edge.
+    allocated = np.prod([-(-n // c) * c for n, c in zip(shape, chunks)])
+    return float(allocated / np.prod(shape) - 1)
+
+
+def measure(filename, shape, dtype, chunks, patterns, rdcc_nbytes,
+            max_accesses=256, repeat=1, **kwargs):
+    """
+    Write a synthetic dataset with the given chunk shape and time reading
+    the patterns from it through a cache of rdcc_nbytes.  Any other keyword
+    arguments (e.g. compression) go to create_dataset.
+    """
+    with h5py.File(filename, 'w') as f:
+        dset = f.create_dataset('DS1', shape, dtype=dtype,
+                                chunks=tuple(chunks), **kwargs)
+        datagen.fill(dset, 'quotient')
+
+    nslots, nbytes, w0 = cache_settings(chunks, dtype, rdcc_nbytes,
+                                        shape=shape)
+    accesses = _accesses(patterns, shape, max_accesses)
+    pool = bufpool.BufferPool()
+    best = float('inf')
+    for _ in range(repeat):
+        with h5py.File(filename, 'r', rdcc_nslots=nslots,
+                       rdcc_nbytes=nbytes, rdcc_w0=w0) as f:
+            dsid = f['DS1'].id
+            t0 = time.perf_counter()
+            for lst in accesses:
+                for start, stride, count, block in lst:
+                    mshape = tuple(c * b for c, b in zip(count, block))
+                    mspace = h5py.h5s.create_simple(mshape)
+                    fspace = dsid.get_space()
+                    fspace.select_hyperslab(start, count, stride, block)
+                    with pool.borrow(mshape, dtype) as buf:
+                        dsid.read(mspace, fspace, buf)
+            best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def tune(shape, dtype, patterns, weights=None, verify=4, max_accesses=256,
+         max_cache=64 * 1024 * 1024, max_verify_bytes=256 * 1024 * 1024,
+         min_bytes=8 * 1024, max_bytes=4 * 1024 * 1024, directory=None,
+         repeat=1, **kwargs):
+    """
+    Recommend a chunk shape and chunk cache for reading a dataset with the
+    given access patterns.
+
+    Each candidate from candidates() is scored with model(), summing over
+    the patterns (scaled by weights, if given).  The best verify candidates
+    are then written to a synthetic file and timed with measure(), and the
+    fastest is recommended.  Datasets larger than max_verify_bytes are
+    verified on a proportionally smaller shape; the patterns are functions
+    of the shape, so they scale with it.  Set verify=0 to trust the model.
+
+    Returns a dict with the recommended 'chunks', 'rdcc_nslots',
+    'rdcc_nbytes' and 'rdcc_w0' (ready to pass to h5py.File), plus the
+    scored 'candidates', best first.
+    """
+    shape = tuple(shape)
+    if weights is None:
+        weights = [1] * len(patterns)
+    accesses = _accesses(patterns, shape, max_accesses)
+    memo = {}
+
+    scored = []
+    for chunks in candidates(shape, dtype, min_bytes, max_bytes):
+        record = {'chunks': chunks, 'seconds': 0.0, 'chunks_read': 0,
+                  'bytes_read': 0, 'bytes_selected': 0,
+                  'rdcc_nbytes': DEFAULT_CACHE,
+                  'padding': _padding(shape, chunks)}
+        for lst, weight in zip(accesses, weights):
+            m = model(shape, dtype, chunks, lst, max_cache=max_cache,
+                      memo=memo)
+            record['seconds'] += weight * m['seconds']
+            record['chunks_read'] += m['chunks_read']
+            record['bytes_read'] += m['bytes_read']
+            record['bytes_selected'] += m['bytes_selected']
+            record['rdcc_nbytes'] = max(record['rdcc_nbytes'],
+                                        m['rdcc_nbytes'])
+        scored.append(record)
+    scored.sort(key=lambda r: (r['seconds'], r['padding']))
+
+    if verify > 0:
+        vshape = _verify_shape(shape, dtype, [r['chunks']
+                                              for r in scored[:verify]],
+                               max_verify_bytes)
+        tmpdir = tempfile.mkdtemp(dir=directory)
+        try:
+            filename = os.path.join(tmpdir, 'chunktune.h5')
+            for record in scored[:verify]:
+                seconds = 0.0
+                for pattern, weight in zip(patterns, weights):
+                    seconds += weight * measure(filename, vshape, dtype,
+                                                record['chunks'], [pattern],
+                                                record['rdcc_nbytes'],
+                                                max_accesses=max_accesses,
+                                                repeat=repeat, **kwargs)
+                record['measured_seconds'] = seconds
+                record['verify_shape'] = vshape
+        finally:
+            shutil.rmtree(tmpdir)
+        measured = sorted(scored[:verify],
+                          key=lambda r: (r['measured_seconds'],
+                                         r['padding']))
+        scored = measured + scored[verify:]
+
+    best = scored[0]
+    nslots, nbytes, w0 = cache_settings(best['chunks'], dtype,
+                                        best['rdcc_nbytes'], shape=shape)
+    return {'chunks': best['chunks'],
+            'rdcc_nslots': nslots,
+            'rdcc_nbytes': nbytes,
+            'rdcc_w0': w0,
+            'candidates': scored}
+
+
+def _verify_shape(shape, dtype, chunk_list, max_bytes):
+    total = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if total <= max_bytes:
+        return shape
+    scale = (float(max_bytes) / total) ** (1.0 / len(shape))
+    vshape = []
+    for axis, n in enumerate(shape):
+        biggest = max(chunks[axis] for chunks in chunk_list)
+        vshape.append(min(n, max(int(n * scale), biggest)))
+    return tuple(vshape)
+
+
+def _ints(s, sep=','):
+    return tuple(int(x) for x in s.split(sep))
+
+
+def _pattern(kind, value):
+    if kind == 'rows':
+        return rows(int(value))
+    if kind == 'columns':
+        return columns(int(value))
+    if kind == 'hyperslab':
+        start, stride, count, block = [_ints(x) for x in value.split('/')]
+        return hyperslab(start, stride, count, block)
+    tile, _, n = value.partition(':')
+    return tiles(_ints(tile, 'x'), int(n or 100))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Recommend a chunk shape and cache size, printing JSON.")
+    parser.add_argument('shape', type=lambda s: _ints(s, 'x'),
+                        help="dataset shape, e.g. 10000x2000")
+    parser.add_argument('--dtype', default='<f8')
+    parser.add_argument('--rows', action='append', default=[],
+                        help="read N rows at a time")
+    parser.add_argument('--columns', action='append', default=[],
+                        help="read N columns at a time")
+    parser.add_argument('--hyperslab', action='append', default=[],
+                        help="start/stride/count/block, e.g. 0,1/4,4/2,2/2,3")
+    parser.add_argument('--tiles', action='append', default=[],
+                        help="random tiles, e.g. 64x64:100")
+    parser.add_argument('--verify', type=int, default=4,
+                        help="number of candidates to time")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch file")
+    args = parser.parse_args(argv)
+
+    patterns = []
+    for kind in ['rows', 'columns', 'hyperslab', 'tiles']:
+        patterns += [_pattern(kind, v) for v in getattr(args, kind)]
+    if not patterns:
+        parser.error("at least one access pattern is required")
+
+    result = tune(args.shape, args.dtype, patterns, verify=args.verify,
+                  directory=args.directory)
+    result['candidates'] = result['candidates'][:max(args.verify, 10)]
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Visit the objects of many files at once, in a process pool.
+
+h5ex_g_visit visits the objects of the one file named by sys.argv[1] and
+prints them when it has finished.  An inventory of hundreds of thousands
+of files needs them visited in parallel, the results written out as they
+arrive rather than held until the end, and one unreadable file not to
+stop the rest.
+
+crawl() takes files, directories (searched recursively for HDF5 files)
+and glob patterns, visits the files in a process pool with at most a few
+files in hand per worker, and yields a record for every object as each
+file is done, in the order the files were found: the file, the object's
+path and type, and for datasets their shape and dtype.  A file that
+cannot be visited yields one record with its error instead.  If a worker
+process dies, the crawl goes on in a new pool, the files lost with the old
+one visited again one at a time, and only a file that kills a worker by
+itself is reported as an error.  run() writes the records as JSON lines and
+returns the files, objects and errors counted and the rates per second.
+
+    >>> from hdf5examples.tools import crawler
+    >>> for record in crawler.crawl(['data/'], workers=4):
+    ...     print(record)
+    {'file': 'data/h5ex_g_visit.h5', 'path': '/', 'type': 'Group'}
+    ...
+
+From the command line, writing the records to inventory.jsonl and the
+counts to stderr:
+
+    $ python -m hdf5examples.tools.crawler /data 'more/*.h5' \\
+          --workers 8 --output inventory.jsonl
+
+Run the module with --benchmark to compare against visiting the files one
+after another:
+
+    $ python -m hdf5examples.tools.crawler --benchmark --files 100
+"""
+import argparse
+import concurrent.futures
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import h5py
+
+EXTENSIONS = ('.h5', '.hdf5', '.he5')
+
+TYPES = {h5py.h5o.TYPE_GROUP: 'Group',
+         h5py.h5o.TYPE_DATASET: 'Dataset',
+         h5py.h5o.TYPE_NAMED_DATATYPE: 'Datatype'}
+
+
+def find_files(sources, extensions=EXTENSIONS):
+    """
+    Yield the files named in sources: files as they are, the files below
+    directories whose names end with one of extensions, and the files
+    matching glob patterns ('**' matching any depth), each in sorted order.
+    """
+    for source in sources:
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(source):
+            for name in sorted(glob.glob(source, recursive=True)):
+                if os.path.isfile(name):
+                    yield name
+        else:
+            yield source
+
+
+def visit(filename):
+    """
+    Return the records of every object of filename, as crawl() yields
+    them, or a list of one error record if it cannot be visited.
+    """
+    try:
+        fid = h5py.h5f.open(os.fsencode(filename), h5py.h5f.ACC_RDONLY)
+    except Exception as e:
+        return [_error(filename, e)]
+    records = []
+    try:
+        def record(name, info):
+            rec = {'file': filename,
+                   'path': '/' if name == b'.' else '/' + name.decode(
+                       'utf-8', 'surrogateescape'),
+                   'type': TYPES.get(info.type, 'Unknown')}
+            if info.type == h5py.h5o.TYPE_DATASET:
+                dsid = h5py.h5o.open(fid, name)
+                # None for a null dataspace (h5py.Empty).
+                shape = dsid.shape
+                rec['shape'] = None if shape is None else list(shape)
+                rec['dtype'] = dsid.dtype.str
+            records.append(rec)
+        record(b'.', h5py.h5o.get_info(fid))
+        h5py.h5o.visit(fid, record, info=True)
+    except Exception as e:
+        return [_error(filename, e)]
+    finally:
+        fid.close()
+    return records
+
+
+def _error(filename, e):
+    return {'file': filename,
+            'error': "{0}: {1}".format(type(e).__name__, e)}
+
+
+def _done(records):
+    # A future already holding records.
+    future = concurrent.futures.Future()
+    future.set_result(records)
+    return future
+
+
+def crawl(sources, workers=None, executor=None, extensions=EXTENSIONS):
+    """
+    Yield the records of the objects of the files in sources, found as by
+    find_files(), visited in parallel by executor or by a new process pool
+    of workers processes, with no more than two files per worker waiting.
+
+    If a worker dies, every file the pool had in hand is lost with it.
+    Those files are visited again one at a time in a new pool (a new pool
+    of workers processes, if executor was given), so that only a file that
+    kills its worker on its own is reported as an error.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    owner = executor is None
+    if owner:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+    broken = concurrent.futures.process.BrokenProcessPool
+
+    def renew():
+        nonlocal executor, owner
+        if owner:
+            executor.shutdown()
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+        owner = True
+
+    def recover(pending):
+        # The pool broke: keep the visits that finished and redo the rest,
+        # each alone, in a new pool.
+        renew()
+        out = []
+        for filename, future in pending:
+            if future is not None and future.done() and \
+                    future.exception() is None:
+                out.append((filename, future))
+                continue
+            try:
+                records = executor.submit(visit, filename).result()
+            except broken as e:
+                records = [_error(filename, e)]
+                renew()
+            out.append((filename, _done(records)))
+        return out
+
+    def first(pending):
+        # The records of the first file pending, and the files left.
+        try:
+            records = pending[0][1].result()
+        except broken:
+            pending = recover(pending)
+            records = pending[0][1].result()
+        return records, pending[1:]
+
+    try:
+        pending = []
+        for filename in find_files(sources, extensions):
+            try:
+                future = executor.submit(visit, filename)
+            except broken:
+                future = None
+            pending.append((filename, future))
+            if future is None:
+                pending = recover(pending)
+            if len(pending) >= 2 * workers:
+                records, pending = first(pending)
+                for record in records:
+                    yield record
+        while pending:
+            records, pending = first(pending)
+            for record in records:
+                yield record
+    finally:
+        if owner:
+            executor.shutdown()
+
+
+def run(sources, out, workers=None, executor=None, extensions=EXTENSIONS):
+    """
+    Write the records of crawl() to the file object out as JSON lines and
+    return a dict of the files visited, objects found and errors, the
+    seconds taken, and the files and objects per second.
+    """
+    counts = {'files': 0, 'objects': 0, 'errors': 0}
+    last = None
+    t0 = time.perf_counter()
+    for record in crawl(sources, workers, executor, extensions):
+        if record['file'] != last:
+            counts['files'] += 1
+            last = record['file']
+        if 'error' in record:
+            counts['errors'] += 1
+        else:
+            counts['objects'] += 1
+        out.write(json.dumps(record))
+        out.write('\n')
+    seconds = time.perf_counter() - t0
+    counts['seconds'] = seconds
+    counts['files_per_s'] = counts['files'] / seconds if seconds else 0.0
+    counts['objects_per_s'] = counts['objects'] / seconds if seconds else 0.0
+    return counts
+
+
+def make_files(directory, nfiles=100, nobjects=100):
+    """
+    Write nfiles files to directory, each with nobjects objects, groups
+    each holding four scalar datasets.
+    """
+    for k in range(nfiles):
+        filename = os.path.join(directory, 'file{0:06d}.h5'.format(k))
+        with h5py.File(filename, 'w') as f:
+            group = f
+            for j in range(nobjects):
+                if j % 5 == 0:
+                    group = f.create_group('G{0:06d}'.format(j))
+                else:
+                    group.create_dataset('DS{0:06d}'.format(j), data=j)
+
+
+def benchmark(nfiles=100, nobjects=100, workers=None, directory=None):
+    """
+    Visit every object of nfiles new files of nobjects objects each, one
+    file after another in this process ('serial') and with crawl()
+    ('crawl').
+
+    Returns a record for each with the seconds taken and the files and
+    objects per second.
+    """
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        make_files(tmpdir, nfiles, nobjects)
+        for method in ['serial', 'crawl']:
+            with open(os.devnull, 'w') as out:
+                if method == 'serial':
+                    counts = {'files': 0, 'objects': 0}
+                    t0 = time.perf_counter()
+                    for filename in find_files([tmpdir]):
+                        counts['files'] += 1
+                        for record in visit(filename):
+                            counts['objects'] += 1
+                            out.write(json.dumps(record))
+                            out.write('\n')
+                    seconds = time.perf_counter() - t0
+                else:
+                    counts = run([tmpdir], out, workers=workers)
+                    seconds = counts['seconds']
+            if counts['objects'] != nfiles * (nobjects + 1):
+                raise RuntimeError("Objects visited do not match.")
+            records.append({'method': method,
+                            'files': nfiles,
+                            'objects': counts['objects'],
+                            'workers': workers,
+                            'seconds': seconds,
+                            'files_per_s': nfiles / seconds,
+                            'objects_per_s': counts['objects'] / seconds})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Visit the objects of many HDF5 files in parallel, "
+                    "writing a JSON record per object and the counts to "
+                    "stderr.")
+    parser.add_argument('sources', nargs='*',
+                        help="files, directories or glob patterns")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=None,
+                        help="where to write the records, by default stdout")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="compare against visiting files one by one, "
+                             "printing JSON")
+    parser.add_argument('--files', type=int, default=100,
+                        help="files for the benchmark")
+    parser.add_argument('--objects', type=int, default=100,
+                        help="objects per file for the benchmark")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the benchmark's scratch files")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        records = benchmark(nfiles=args.files, nobjects=args.objects,
+                            workers=args.workers, directory=args.directory)
+        json.dump(records, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+        return
+    if not args.sources:
+        parser.error("no files, directories or patterns given")
+
+    if args.output is None:
+        counts = run(args.sources, sys.stdout, workers=args.workers)
+    else:
+        with open(args.output, 'w') as out:
+            counts = run(args.sources, out, workers=args.workers)
+    json.dump(counts, sys.stderr, indent=2)
+    sys.stderr.write('\n')
+
+
+if __name__ == "__main__":
+    main()
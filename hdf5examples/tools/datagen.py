@@ -0,0 +1,159 @@
+"""
+Vectorized generators for the data patterns used throughout the examples.
+
+The examples initialize their write buffers with nested Python loops such as
+
+    for i in range(DIM0):
+        for j in range(DIM1):
+            wdata[i][j] = i * j - j
+
+which is fine for 28 integers but costs more than the HDF5 write itself once
+the datasets get large.  The functions here evaluate the same patterns with
+NumPy broadcasting, either into one array (generate) or as a stream of
+chunk-aligned blocks (iter_blocks) so that a dataset larger than memory can
+be written without ever building the whole array.
+
+In every pattern, i is the index along the first axis and j the index along
+the last axis.  Any axes in between are broadcast, and for one-dimensional
+data i and j are the same index.
+"""
+import itertools
+
+import numpy as np
+
+
+def _product(i, j, out):
+    # i * j - j
+    np.multiply(i, j, out=out, casting='unsafe')
+    np.subtract(out, j, out=out, casting='unsafe')
+
+
+def _outer(i, j, out):
+    # i * j
+    np.multiply(i, j, out=out, casting='unsafe')
+
+
+def _quotient(i, j, out):
+    # i / (j + 0.5) + j
+    np.divide(i, j + 0.5, out=out, casting='unsafe')
+    np.add(out, j, out=out, casting='unsafe')
+
+
+def _sum(i, j, out):
+    # i + j
+    np.add(i, j, out=out, casting='unsafe')
+
+
+def _column(i, j, out):
+    # j
+    out[...] = j
+
+
+def _ones(i, j, out):
+    out.fill(1)
+
+
+PATTERNS = {'product': _product,
+            'outer': _outer,
+            'quotient': _quotient,
+            'sum': _sum,
+            'column': _column,
+            'ones': _ones}
+
+
+def generate(shape, pattern='product', dtype=np.int32, offset=None,
+             modulo=None, out=None):
+    """
+    Evaluate a pattern over an array of the given shape.
+
+    The offset gives the global index of the array's first element, so a
+    block of a larger dataset gets the same values it would have had if the
+    whole dataset had been generated at once.  If modulo is given, the
+    pattern is reduced modulo that value (handy for enumerations).  The
+    result is written into out if it is supplied.
+    """
+    shape = tuple(shape)
+    if pattern not in PATTERNS:
+        msg = "Unknown pattern '{0}', choose from {1}."
+        raise ValueError(msg.format(pattern, sorted(PATTERNS)))
+    if offset is None:
+        offset = (0,) * len(shape)
+
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        msg = "Output buffer has shape {0}, expected {1}."
+        raise ValueError(msg.format(out.shape, shape))
+
+    if len(shape) == 0:
+        i = j = np.zeros((), dtype=np.int64)
+    else:
+        grid = np.ogrid[tuple(slice(o, o + n) for o, n in zip(offset, shape))]
+        i, j = grid[0], grid[-1]
+
+    PATTERNS[pattern](i, j, out)
+    if modulo is not None:
+        np.remainder(out, modulo, out=out)
+    return out
+
+
+def block_shape(shape, chunks, itemsize, max_bytes=64 * 1024 * 1024):
+    """
+    Choose a block shape that is a whole number of chunks and fits in
+    max_bytes.
+
+    Blocks are grown along the last axis first so that each block covers
+    complete rows where possible, which keeps the writes contiguous.  A block
+    is never smaller than one chunk, even if one chunk exceeds max_bytes,
+    nor than one element along an axis of length zero.
+    """
+    shape = tuple(shape)
+    chunks = tuple(max(1, c) for c in chunks)
+    block = list(chunks)
+    for axis in reversed(range(len(shape))):
+        others = int(np.prod(block)) // block[axis]
+        nchunks = max(1, -(-shape[axis] // chunks[axis]))
+        fit = max(1, max_bytes // (others * chunks[axis] * itemsize))
+        block[axis] = chunks[axis] * min(nchunks, fit)
+        if fit < nchunks:
+            break
+    return tuple(block)
+
+
+def iter_blocks(shape, chunks, pattern='product', dtype=np.int32,
+                modulo=None, max_bytes=64 * 1024 * 1024):
+    """
+    Yield (selection, block) pairs covering a dataset of the given shape.
+
+    Each block is aligned to the chunk grid and spans a whole number of
+    chunks (clipped at the dataset edge), so writing it never touches a
+    chunk shared with another block.  The selection is a tuple of slices
+    suitable for indexing an h5py dataset.
+    """
+    shape = tuple(shape)
+    chunks = tuple(chunks)
+    itemsize = np.dtype(dtype).itemsize
+    block = block_shape(shape, chunks, itemsize, max_bytes)
+
+    starts = [range(0, n, b) for n, b in zip(shape, block)]
+    for offset in itertools.product(*starts):
+        sel = tuple(slice(o, min(o + b, n))
+                    for o, b, n in zip(offset, block, shape))
+        bshape = tuple(s.stop - s.start for s in sel)
+        yield sel, generate(bshape, pattern, dtype=dtype, offset=offset,
+                            modulo=modulo)
+
+
+def fill(dset, pattern='product', modulo=None, max_bytes=64 * 1024 * 1024):
+    """
+    Write a pattern into an existing h5py dataset block by block.
+
+    Contiguous datasets are treated as if chunked by single rows.
+    """
+    chunks = dset.chunks
+    if chunks is None:
+        chunks = (1,) + tuple(dset.shape[1:])
+    for sel, block in iter_blocks(dset.shape, chunks, pattern,
+                                  dtype=dset.dtype, modulo=modulo,
+                                  max_bytes=max_bytes):
+        dset.write_direct(block, dest_sel=sel)
@@ -0,0 +1,240 @@
+"""
+Decode and encode enumerated values a whole array at a time.
+
+h5ex_t_enum and h5ex_t_enumatt turn the stored values into names with a
+Python dictionary lookup per element,
+
+    [inv_mapping[item] for item in row]
+
+which is fine for 28 values and hopeless for billions.  An Enum takes the
+value to name mapping from the HDF5 type itself and builds a lookup table
+from values to categorical codes, the positions of the names in value
+order.  Decoding is then one NumPy indexing operation: for 8- and 16-bit
+enums (the usual kind) the table covers every possible value and is
+indexed by the values directly; wider enums use a table spanning their
+values if that is small, and a binary search if not.  Encoding names back
+to values is a binary search over the sorted names.
+
+    >>> from hdf5examples.tools import enums
+    >>> with h5py.File('h5ex_t_enum.h5', 'r') as f:
+    ...     e = enums.Enum(f['DS1'])
+    ...     rdata = f['DS1'][...]
+    >>> e.decode(rdata)[1]
+    array(['SOLID', 'LIQUID', 'GAS', 'PLASMA', 'SOLID', 'LIQUID', 'GAS'],
+          dtype='<U6')
+    >>> codes = e.codes(rdata)
+    >>> e.names[codes]
+    >>> e.encode(['GAS', 'SOLID'])
+    array([2, 0], dtype=int16)
+
+Values not in the enum decode to code -1, and decode() and encode() raise
+ValueError on them.
+
+Run the module to compare against a dictionary lookup per element:
+
+    $ python -m hdf5examples.tools.enums --values 10000000
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import h5py
+
+# The widest span of values given a lookup table rather than a search.
+TABLE_MAX = 1 << 20
+
+
+class Enum(object):
+    """
+    The names and values of an HDF5 enumerated type, from a dtype made by
+    h5py.enum_dtype or anything with such a dtype (a dataset, attribute or
+    array read from one).
+
+    names holds the names and values the values, both in value order, so a
+    name's code is its position in names.
+    """
+
+    def __init__(self, obj):
+        dtype = getattr(obj, 'dtype', obj)
+        mapping = h5py.check_enum_dtype(dtype)
+        if mapping is None:
+            msg = "The type {0} is not an enumerated type."
+            raise ValueError(msg.format(dtype))
+        self.dtype = np.dtype(dtype.str)
+        self.mapping = dict(mapping)
+        order = sorted(self.mapping.items(), key=lambda item: item[1])
+        self.names = np.array([name for name, value in order], dtype='U')
+        self.values = np.array([value for name, value in order],
+                               dtype=self.dtype)
+        # The smallest signed type holding every code, and -1.
+        self.code_dtype = np.min_scalar_type(-max(len(order), 1))
+        # The names sorted, and their values, for encoding.
+        by_name = np.argsort(self.names)
+        self._sorted_names = self.names[by_name]
+        self._sorted_values = self.values[by_name]
+        self._tables = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def _table(self, dtype):
+        # A table of codes indexed by every value of an 8- or 16-bit dtype,
+        # viewed as unsigned.
+        table = self._tables.get(dtype)
+        if table is None:
+            unsigned = np.dtype('u{0}'.format(dtype.itemsize))
+            table = np.full(1 << (8 * dtype.itemsize), -1,
+                            dtype=self.code_dtype)
+            info = np.iinfo(dtype)
+            fits = (self.values >= info.min) & (self.values <= info.max)
+            keys = self.values[fits].astype(dtype).view(unsigned)
+            table[keys] = np.flatnonzero(fits)
+            self._tables[dtype] = table
+        return table
+
+    def codes(self, values):
+        """
+        Return the codes of values, an integer array, as an array of the
+        same shape of code_dtype, with -1 for values not in the enum.
+        """
+        values = np.asarray(values)
+        if values.dtype.kind not in 'iu':
+            msg = "Values must be integers, not {0}."
+            raise ValueError(msg.format(values.dtype))
+        if len(self) == 0:
+            return np.full(values.shape, -1, dtype=self.code_dtype)
+
+        if values.dtype.itemsize <= 2:
+            unsigned = np.dtype('u{0}'.format(values.dtype.itemsize))
+            return self._table(values.dtype)[values.view(unsigned)]
+
+        lo = int(self.values[0])
+        span = int(self.values[-1]) - lo + 1
+        if span <= TABLE_MAX:
+            # A table with -1 at either end, for the values outside it.
+            key = ('span', lo, span)
+            table = self._tables.get(key)
+            if table is None:
+                table = np.full(span + 2, -1, dtype=self.code_dtype)
+                table[self.values.astype(np.int64) - lo + 1] = \
+                    np.arange(len(self))
+                self._tables[key] = table
+            index = values.astype(np.int64)
+            index -= lo - 1
+            np.clip(index, 0, span + 1, out=index)
+            return table[index]
+
+        index = np.searchsorted(self.values, values)
+        np.clip(index, 0, len(self) - 1, out=index)
+        codes = index.astype(self.code_dtype)
+        codes[self.values[index] != values] = -1
+        return codes
+
+    def decode(self, values):
+        """
+        Return the names of values, an integer array, as a NumPy string
+        array of the same shape.  Raises ValueError if any value is not in
+        the enum.
+        """
+        codes = self.codes(values)
+        if codes.size and codes.min() < 0:
+            bad = np.asarray(values)[codes < 0].flat[0]
+            msg = "The value {0} is not in the enum."
+            raise ValueError(msg.format(bad))
+        return self.names[codes]
+
+    def encode(self, names):
+        """
+        Return the values of names, an array (or sequence) of str or bytes,
+        as an array of the enum's base dtype.  Raises ValueError if any name
+        is not in the enum.
+        """
+        names = np.asarray(names)
+        if names.dtype.kind == 'S':
+            names = np.char.decode(names, 'utf-8')
+        elif names.dtype.kind != 'U':
+            names = names.astype('U')
+        if len(self) == 0:
+            index = np.zeros(names.shape, dtype=np.intp)
+            missing = np.ones(names.shape, dtype=bool)
+        else:
+            index = np.searchsorted(self._sorted_names, names)
+            np.clip(index, 0, len(self) - 1, out=index)
+            missing = self._sorted_names[index] != names
+        if missing.any():
+            msg = "The name '{0}' is not in the enum."
+            raise ValueError(msg.format(names[missing].flat[0]))
+        return self._sorted_values[index]
+
+    def from_codes(self, codes):
+        """Return the values of codes, as returned by codes()."""
+        return self.values[np.asarray(codes)]
+
+
+def benchmark(nvalues=10000000, dtype='<i2', seed=0):
+    """
+    Decode nvalues random values of h5ex_t_enum's enum of the given base
+    dtype, and encode them again, both with a dictionary lookup per value
+    ('dict') and with an Enum ('enum').
+
+    Returns a record for each with the seconds taken to decode and to
+    encode, and for the Enum to find the codes alone.
+    """
+    mapping = {'SOLID': 0, 'LIQUID': 1, 'GAS': 2, 'PLASMA': 3}
+    enumtype = h5py.enum_dtype(mapping, basetype=np.dtype(dtype))
+    rs = np.random.RandomState(seed)
+    values = rs.randint(0, len(mapping), nvalues).astype(dtype)
+
+    records = []
+    for method in ['dict', 'enum']:
+        codes_s = None
+        if method == 'enum':
+            t0 = time.perf_counter()
+            Enum(enumtype).codes(values)
+            codes_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if method == 'dict':
+            inv_mapping = {v: k for (k, v) in mapping.items()}
+            names = [inv_mapping[item] for item in values.tolist()]
+        else:
+            e = Enum(enumtype)
+            names = e.decode(values)
+        decode_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if method == 'dict':
+            encoded = np.array([mapping[name] for name in names],
+                               dtype=dtype)
+        else:
+            encoded = e.encode(names)
+        encode_s = time.perf_counter() - t0
+        if not np.array_equal(encoded, values):
+            raise RuntimeError("Values encoded do not match.")
+
+        records.append({'method': method,
+                        'values': nvalues,
+                        'dtype': np.dtype(dtype).str,
+                        'codes_s': codes_s,
+                        'decode_s': decode_s,
+                        'encode_s': encode_s})
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare enum decoding and encoding, printing JSON.")
+    parser.add_argument('--values', type=int, default=10000000)
+    parser.add_argument('--dtype', default='<i2',
+                        help="base type of the enum")
+    args = parser.parse_args(argv)
+
+    records = benchmark(nvalues=args.values, dtype=args.dtype)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark HDF5 filter pipelines across chunk shapes, datatypes and data
+distributions.
+
+The gzip, lzf, shuffle, szip and checksum examples each apply one filter to
+a 32x64 array, which says nothing about how the filters behave on real data.
+This module sweeps a matrix of pipelines over a matrix of inputs, writing and
+reading back one dataset per combination, and reports for each
+
+    write_mbps    uncompressed megabytes per second written
+    read_mbps     uncompressed megabytes per second read back
+    ratio         uncompressed size over storage size
+    peak_bytes    peak memory allocated from Python while writing and
+                  reading, beyond the data and read buffers themselves
+                  (via tracemalloc, so NumPy temporaries are counted but
+                  HDF5's own buffers are not)
+
+Run it from the command line to get the records as JSON:
+
+    $ python -m hdf5examples.tools.filterbench --dtype '<f8' --chunks 64x64
+
+Reads are served from the operating system's page cache, so the read rate
+measures filter cost rather than disk speed.
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import datagen
+
+SHAPE = (1024, 1024)
+CHUNKS = [(64, 64), (256, 256), (1, 1024)]
+DTYPES = ['<i4', '<f8']
+DISTRIBUTIONS = ['smooth', 'random', 'sparse']
+LEVELS = range(1, 10)
+
+# Fraction of nonzero elements in the 'sparse' distribution.
+DENSITY = 0.01
+
+
+def szip_available():
+    """
+    Return True if the hdf5 library can encode szip.  Szip is an optional
+    part of the library, and may be built decode-only.
+    """
+    if not h5py.h5z.filter_avail(h5py.h5z.FILTER_SZIP):
+        return False
+    info = h5py.h5z.get_filter_info(h5py.h5z.FILTER_SZIP)
+    return bool(info & h5py.h5z.FILTER_CONFIG_ENCODE_ENABLED)
+
+
+def pipelines(levels=LEVELS, fletcher32=(False, True), szip=None):
+    """
+    Build the pipeline matrix as a list of (name, kwargs) pairs.
+
+    The kwargs are passed straight to create_dataset.  The pipelines are no
+    filter, deflate at each level, lzf, shuffle+deflate at each level,
+    shuffle+lzf and szip (if available, or if szip is True), each with and
+    without the fletcher32 checksum.
+    """
+    if szip is None:
+        szip = szip_available()
+
+    base = [('none', {})]
+    base += [('deflate-{0}'.format(level),
+              {'compression': 'gzip', 'compression_opts': level})
+             for level in levels]
+    base += [('lzf', {'compression': 'lzf'})]
+    base += [('shuffle+deflate-{0}'.format(level),
+              {'shuffle': True, 'compression': 'gzip',
+               'compression_opts': level})
+             for level in levels]
+    base += [('shuffle+lzf', {'shuffle': True, 'compression': 'lzf'})]
+    if szip:
+        base += [('szip', {'compression': 'szip',
+                           'compression_opts': ('nn', 8)})]
+
+    lst = []
+    for checksum in fletcher32:
+        for name, kwargs in base:
+            if checksum:
+                name = name + '+fletcher32'
+                kwargs = dict(kwargs, fletcher32=True)
+            lst.append((name, kwargs))
+    return lst
+
+
+def make_data(shape, dtype, distribution, seed=0):
+    """
+    Generate test data with one of the named distributions.
+
+    smooth    the examples' i / (j + 0.5) + j pattern, slowly varying
+    random    uniform over the full range of an integer type, or standard
+              normal for floats; essentially incompressible
+    sparse    zero except for a DENSITY fraction of random elements
+    """
+    dtype = np.dtype(dtype)
+    if distribution == 'smooth':
+        return datagen.generate(shape, 'quotient', dtype=dtype)
+
+    rs = np.random.RandomState(seed)
+    if distribution == 'random':
+        return _random(rs, shape, dtype)
+    if distribution == 'sparse':
+        data = np.zeros(shape, dtype=dtype)
+        n = int(data.size * DENSITY)
+        idx = rs.choice(data.size, size=n, replace=False)
+        data.flat[idx] = _random(rs, (n,), dtype)
+        return data
+
+    msg = "Unknown distribution '{0}', choose from {1}."
+    raise ValueError(msg.format(distribution, DISTRIBUTIONS))
+
+
+def _random(rs, shape, dtype):
+    if dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        data = rs.randint(info.min, int(info.max) + 1, size=shape,
+                          dtype=dtype.newbyteorder('='))
+        return data.astype(dtype)
+    return rs.standard_normal(shape).astype(dtype)
+
+
+def measure(filename, data, chunks, kwargs, repeat=1):
+    """
+    Write data to a new dataset with the given filter kwargs, then read it
+    back, and return a dict of timings and sizes.
+
+    The best of repeat runs is reported for each rate.
+    """
+    nbytes = data.nbytes
+    mb = nbytes / 1e6
+    write_time = read_time = float('inf')
+    peak = 0
+    rdata = np.empty_like(data)
+
+    for _ in range(repeat):
+        tracemalloc.start()
+        try:
+            t0 = time.perf_counter()
+            with h5py.File(filename, 'w') as f:
+                dset = f.create_dataset('DS1', data.shape, dtype=data.dtype,
+                                        chunks=tuple(chunks), **kwargs)
+                dset.write_direct(data)
+            write_time = min(write_time, time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            with h5py.File(filename, 'r') as f:
+                dset = f['DS1']
+                dset.read_direct(rdata)
+                storage = dset.id.get_storage_size()
+            read_time = min(read_time, time.perf_counter() - t0)
+
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    if not np.array_equal(data, rdata):
+        raise RuntimeError("Data read back does not match data written.")
+
+    return {'nbytes': nbytes,
+            'storage_bytes': storage,
+            'ratio': nbytes / storage if storage else float('inf'),
+            'write_mbps': mb / write_time,
+            'read_mbps': mb / read_time,
+            'peak_bytes': peak}
+
+
+def run(shape=SHAPE, chunks=CHUNKS, dtypes=DTYPES,
+        distributions=DISTRIBUTIONS, pipes=None, directory=None, repeat=1,
+        seed=0):
+    """
+    Sweep every pipeline across every chunk shape, dtype and distribution.
+
+    Returns a list of records, one per combination.  The scratch file is
+    written to a temporary directory (created inside directory, if given)
+    and removed afterwards.
+    """
+    if pipes is None:
+        pipes = pipelines()
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    filename = os.path.join(tmpdir, 'filterbench.h5')
+
+    records = []
+    try:
+        for dtype, distribution in itertools.product(dtypes, distributions):
+            data = make_data(shape, dtype, distribution, seed=seed)
+            for chunk, (name, kwargs) in itertools.product(chunks, pipes):
+                record = {'pipeline': name,
+                          'shape': list(shape),
+                          'chunks': list(chunk),
+                          'dtype': np.dtype(dtype).str,
+                          'distribution': distribution}
+                record.update(measure(filename, data, chunk, kwargs,
+                                      repeat=repeat))
+                records.append(record)
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def _shape(s):
+    return tuple(int(x) for x in s.split('x'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark HDF5 filter pipelines, printing JSON.")
+    parser.add_argument('--shape', type=_shape, default=SHAPE,
+                        help="dataset shape, e.g. 1024x1024")
+    parser.add_argument('--chunks', type=_shape, action='append',
+                        help="chunk shape, may be repeated")
+    parser.add_argument('--dtype', action='append',
+                        help="numpy dtype, may be repeated")
+    parser.add_argument('--distribution', action='append',
+                        choices=DISTRIBUTIONS,
+                        help="data distribution, may be repeated")
+    parser.add_argument('--levels', type=int, nargs='+', default=LEVELS,
+                        help="deflate levels")
+    parser.add_argument('--no-fletcher32', action='store_true',
+                        help="skip the checksummed pipelines")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch file")
+    args = parser.parse_args(argv)
+
+    fletcher32 = (False,) if args.no_fletcher32 else (False, True)
+    records = run(shape=args.shape,
+                  chunks=args.chunks or CHUNKS,
+                  dtypes=args.dtype or DTYPES,
+                  distributions=args.distribution or DISTRIBUTIONS,
+                  pipes=pipelines(args.levels, fletcher32),
+                  directory=args.directory,
+                  repeat=args.repeat)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Choose a dataset's storage layout from its size, shape and filters.
+
+h5ex_d_compact, h5ex_d_rdwr and h5ex_d_chunk each hard-code one of HDF5's
+three layouts.
+
+    compact      the data lives in the dataset's object header, so it is
+                 read along with the header and costs no extra seek; only
+                 for fixed-size data of less than 64 KiB
+    contiguous   one block of the file, located by a single address; the
+                 default, and the cheapest for fixed-size data
+    chunked      fixed-size chunks found through a B-tree index; required
+                 for unlimited dimensions and for filters
+
+Chunking every dataset, as some writers do, gives every tiny dataset its
+own chunk index, which must be read before its data, and files with many
+small datasets then open and read slowly.  advise() picks the layout the
+list above implies, and create_dataset() creates a dataset with it.
+
+    >>> from hdf5examples.tools import layout
+    >>> layout.advise((10, 10), '<f8')
+    'compact'
+    >>> layout.advise((10000, 10000), '<f8')
+    'contiguous'
+    >>> layout.advise((10, 10), '<f8', maxshape=(None, 10))
+    'chunked'
+    >>> dset = layout.create_dataset(f, 'DS1', data=wdata)
+
+Run the module to compare the layouts for a file of many small datasets:
+
+    $ python -m hdf5examples.tools.layout --datasets 100000 --shape 16
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import bufpool
+
+# The largest compact dataset the library accepts is a little under 64 KiB,
+# the limit on one object header message.
+COMPACT_MAX = 64 * 1024 - 64
+
+LAYOUTS = ('compact', 'contiguous', 'chunked')
+
+# Keywords of create_dataset that need chunked storage.
+FILTERS = ('compression', 'shuffle', 'fletcher32', 'scaleoffset')
+
+
+def storage_size(shape, dtype):
+    """
+    Return the bytes a dataset's data takes in the file.  Variable-length
+    types count the size of their references to the global heap.
+    """
+    tid = h5py.h5t.py_create(np.dtype(dtype), logical=True)
+    size = tid.get_size()
+    if tid.get_class() == h5py.h5t.STRING and tid.is_variable_str():
+        # In memory a pointer, in the file a length and a heap ID.
+        size = 16
+    return int(np.prod(shape)) * size
+
+
+def advise(shape, dtype, maxshape=None, chunks=None, external=None,
+           compact_max=COMPACT_MAX, **kwargs):
+    """
+    Return 'compact', 'contiguous' or 'chunked' for a dataset.
+
+    A dataset is chunked if it is resizable (maxshape differs from shape),
+    if chunks are given, or if any filter keyword (compression, shuffle,
+    fletcher32, scaleoffset) is set in kwargs.  Otherwise it is compact if
+    its data takes at most compact_max bytes, and contiguous if not.
+    """
+    shape = tuple(shape)
+    if maxshape is not None and tuple(maxshape) != shape:
+        return 'chunked'
+    if chunks not in (None, False):
+        return 'chunked'
+    if any(kwargs.get(key) not in (None, False) for key in FILTERS):
+        return 'chunked'
+    if external is None and storage_size(shape, dtype) <= compact_max:
+        return 'compact'
+    return 'contiguous'
+
+
+def create_dataset(group, name, shape=None, dtype=None, data=None,
+                   compact_max=COMPACT_MAX, **kwargs):
+    """
+    Create a dataset with the layout advise() picks, taking the same
+    arguments as h5py's create_dataset.  Chunked datasets get h5py's
+    automatic chunk shape unless chunks is given.
+    """
+    if data is not None:
+        if shape is None:
+            shape = np.shape(data)
+        if dtype is None:
+            dtype = np.asarray(data).dtype
+    if dtype is None:
+        dtype = np.dtype('f4')
+    kind = advise(shape, dtype, compact_max=compact_max, **kwargs)
+    if kind == 'compact':
+        dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+        dcpl.set_layout(h5py.h5d.COMPACT)
+        kwargs['dcpl'] = dcpl
+    return group.create_dataset(name, shape=shape, dtype=dtype, data=data,
+                                **kwargs)
+
+
+def _dcpl(kind, shape):
+    dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+    if kind == 'compact':
+        dcpl.set_layout(h5py.h5d.COMPACT)
+    elif kind == 'chunked':
+        dcpl.set_chunk(shape)
+    return dcpl
+
+
+def benchmark(ndatasets=100000, shape=(16,), dtype='<f8',
+              layouts=LAYOUTS, directory=None):
+    """
+    For each layout, write a file of ndatasets datasets of the given shape
+    (one chunk each when chunked), then time opening every dataset in a
+    freshly opened file, and reading every dataset in another.
+
+    Returns a record for each layout with the seconds taken to create,
+    open and read, the mean read latency, the file size, and the overhead:
+    the file size less the bytes of data.
+    """
+    shape = tuple(shape)
+    dtype = np.dtype(dtype)
+    names = ['DS{0:06d}'.format(k).encode() for k in range(ndatasets)]
+    data = np.arange(int(np.prod(shape)), dtype=dtype).reshape(shape)
+    data_bytes = ndatasets * data.nbytes
+
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        for kind in layouts:
+            filename = os.path.join(tmpdir, kind + '.h5').encode()
+
+            t0 = time.perf_counter()
+            fid = h5py.h5f.create(filename)
+            tid = h5py.h5t.py_create(dtype)
+            space = h5py.h5s.create_simple(shape)
+            dcpl = _dcpl(kind, shape)
+            for name in names:
+                dsid = h5py.h5d.create(fid, name, tid, space, dcpl)
+                dsid.write(h5py.h5s.ALL, h5py.h5s.ALL, data)
+            del dsid
+            fid.close()
+            create_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            fid = h5py.h5f.open(filename, h5py.h5f.ACC_RDONLY)
+            for name in names:
+                h5py.h5d.open(fid, name)
+            fid.close()
+            open_s = time.perf_counter() - t0
+
+            pool = bufpool.BufferPool()
+            latencies = np.empty(ndatasets)
+            t0 = time.perf_counter()
+            fid = h5py.h5f.open(filename, h5py.h5f.ACC_RDONLY)
+            for k, name in enumerate(names):
+                t1 = time.perf_counter()
+                dsid = h5py.h5d.open(fid, name)
+                with pool.borrow(shape, dtype) as buf:
+                    dsid.read(h5py.h5s.ALL, h5py.h5s.ALL, buf)
+                latencies[k] = time.perf_counter() - t1
+            del dsid
+            fid.close()
+            read_s = time.perf_counter() - t0
+
+            file_bytes = os.path.getsize(filename)
+            records.append({'layout': kind,
+                            'datasets': ndatasets,
+                            'shape': list(shape),
+                            'dtype': dtype.str,
+                            'create_s': create_s,
+                            'open_s': open_s,
+                            'read_s': read_s,
+                            'mean_read_s': float(latencies.mean()),
+                            'file_bytes': file_bytes,
+                            'overhead_bytes': file_bytes - data_bytes})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def _shape(s):
+    return tuple(int(x) for x in s.split('x'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare storage layouts for many small datasets, "
+                    "printing JSON.")
+    parser.add_argument('--datasets', type=int, default=100000)
+    parser.add_argument('--shape', type=_shape, default=(16,),
+                        help="shape of each dataset, e.g. 4x4")
+    parser.add_argument('--dtype', default='<f8')
+    parser.add_argument('--layout', action='append', choices=LAYOUTS)
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(ndatasets=args.datasets, shape=args.shape,
+                        dtype=args.dtype, layouts=args.layout or LAYOUTS,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
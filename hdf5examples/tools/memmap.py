@@ -0,0 +1,78 @@
+"""
+Memory-map contiguous, unfiltered datasets.
+
+h5ex_d_rdwr writes a dataset with the default (contiguous) layout and no
+filters, which the library stores as one flat run of bytes in the file,
+laid out exactly as a C-ordered array of the file datatype.  Such a dataset
+can be mapped straight into memory with np.memmap: reads then never enter
+the HDF5 library, random access costs only the pages touched, and every
+process mapping the file shares the operating system's page cache.
+
+    >>> from hdf5examples.tools import memmap
+    >>> with h5py.File('h5ex_d_rdwr.h5', 'r') as f:
+    ...     arr = memmap.memmap(f['DS1'])
+    >>> arr[3, 5]
+
+The map stays valid after the file is closed.  Datasets that are chunked
+(and so possibly compressed), compact, stored in external files, not yet
+allocated, or of a type whose bytes are not the values themselves
+(variable-length data and references) are refused with ValueError, as are
+files opened through a driver other than sec2 or stdio.
+"""
+import numpy as np
+import h5py
+
+# Drivers that store the file as one ordinary file, byte for byte.
+DRIVERS = ('sec2', 'stdio')
+
+MODES = ('r', 'c')
+
+
+def offset(dset):
+    """
+    Return the byte offset of a dataset's data in its file, raising
+    ValueError if the dataset cannot be memory-mapped.
+    """
+    dcpl = dset.id.get_create_plist()
+    layout = dcpl.get_layout()
+    if layout == h5py.h5d.CHUNKED:
+        msg = "Dataset {0} is chunked."
+    elif layout == h5py.h5d.COMPACT:
+        msg = "Dataset {0} is compact, stored in its object header."
+    elif layout != h5py.h5d.CONTIGUOUS:
+        msg = "Dataset {0} does not have contiguous storage."
+    elif dcpl.get_external_count() > 0:
+        msg = "Dataset {0} is stored in external files."
+    elif dset.dtype.hasobject:
+        msg = "Dataset {0} has variable-length or reference data."
+    elif dset.file.driver not in DRIVERS:
+        msg = "The file of dataset {0} uses the '{1}' driver."
+    else:
+        msg = None
+    if msg is not None:
+        raise ValueError(msg.format(dset.name, dset.file.driver))
+
+    address = dset.id.get_offset()
+    if address is None:
+        msg = "Dataset {0} has no storage allocated."
+        raise ValueError(msg.format(dset.name))
+    return address
+
+
+def memmap(dset, mode='r'):
+    """
+    Return an np.memmap of a contiguous, unfiltered dataset, with the
+    dataset's shape and its file datatype (byte order included).
+
+    The mode is 'r' for a read-only map or 'c' for copy-on-write, where
+    assignments change the map but never the file.  Pending writes to the
+    file are flushed first so the map sees them.
+    """
+    if mode not in MODES:
+        msg = "Mode must be one of {0}, not '{1}'."
+        raise ValueError(msg.format(MODES, mode))
+    address = offset(dset)
+    if dset.file.mode == 'r+':
+        dset.file.flush()
+    return np.memmap(dset.file.filename, dtype=dset.dtype, mode=mode,
+                     offset=address, shape=dset.shape)
@@ -0,0 +1,321 @@
+"""
+Resolve arrays of object references in bulk, with a cache.
+
+h5ex_t_objref and h5ex_t_objrefatt read their references as an object
+array, which makes a Python Reference for every element, and then look
+each one up twice,
+
+    ref_type[type(f[ref])], f[ref].name
+
+opening the target object both times.  For an index of millions of
+references, most of them to the same few thousand objects, nearly all of
+that work is repeated.
+
+A Resolver reads the references of a dataset or attribute as their raw
+8-byte object addresses in a single read, finds the distinct addresses
+with np.unique, and looks up only those it has not seen before, asking the
+library for the path and type without opening the object.  The results are
+cached by address and spread back over the array with one indexing
+operation.  Opened objects are made only if asked for, once per target.
+
+    >>> from hdf5examples.tools import objrefs
+    >>> with h5py.File('h5ex_t_objref.h5', 'r') as f:
+    ...     r = objrefs.Resolver(f)
+    ...     paths, types = r.resolve(f['DS1'])
+    ...     objects = r.open(f['DS1'])
+    >>> paths
+    array(['/DS2', '/G1'], dtype=object)
+    >>> [objrefs.TYPES[t] for t in types]
+    ['Dataset', 'Group']
+
+Attributes are given by their object and name, r.resolve(f['DS1'], 'A1').
+Null references resolve to the path None and type -1.
+
+The cache is dropped whenever the file's size or modification time has
+changed since it was filled.  Moving or renaming objects in a file open
+for writing changes neither, so call clear() after doing so.
+
+Run the module to compare against looking every reference up in turn:
+
+    $ python -m hdf5examples.tools.objrefs --targets 1000 --refs 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+# The library finds a reference's path by searching the file, so with more
+# than this many to look up it is quicker to visit every object once.
+VISIT_MIN = 8
+
+TYPES = {h5py.h5o.TYPE_GROUP: 'Group',
+         h5py.h5o.TYPE_DATASET: 'Dataset',
+         h5py.h5o.TYPE_NAMED_DATATYPE: 'Datatype'}
+
+
+def _source(obj, name=None):
+    # The low-level dataset or attribute holding the references, and their
+    # shape, checking they are object references.
+    if name is None:
+        if not isinstance(obj, h5py.Dataset):
+            msg = "Object {0} is not a dataset; name an attribute."
+            raise ValueError(msg.format(obj.name))
+        source = obj.id
+    else:
+        source = obj.attrs.get_id(name)
+    tid = source.get_type()
+    if not tid.equal(h5py.h5t.STD_REF_OBJ):
+        what = obj.name if name is None else "{0} of {1}".format(name,
+                                                                 obj.name)
+        msg = "{0} does not hold object references."
+        raise ValueError(msg.format(what))
+    return source, source.shape
+
+
+def addresses(obj, name=None):
+    """
+    Return the object references in a dataset, or in the attribute name of
+    obj, as an array of their uint64 object addresses, 0 for null.
+    """
+    return _addresses(*_source(obj, name))
+
+
+def _addresses(source, shape):
+    out = np.empty(shape, dtype=np.uint64)
+    if isinstance(source, h5py.h5a.AttrID):
+        source.read(out, mtype=h5py.h5t.STD_REF_OBJ)
+    elif out.size:
+        source.read(h5py.h5s.ALL, h5py.h5s.ALL, out,
+                    mtype=h5py.h5t.STD_REF_OBJ)
+    return out
+
+
+def _references(source, shape, index):
+    # The Reference objects at the flat indices index of a dataset or
+    # attribute, reading only those elements of a dataset.
+    if isinstance(source, h5py.h5a.AttrID) or len(shape) == 0:
+        refs = np.empty(shape, dtype=h5py.ref_dtype)
+        if isinstance(source, h5py.h5a.AttrID):
+            source.read(refs)
+        else:
+            source.read(h5py.h5s.ALL, h5py.h5s.ALL, refs)
+        return refs.reshape(-1)[index]
+    refs = np.empty(len(index), dtype=h5py.ref_dtype)
+    fspace = source.get_space()
+    coords = np.column_stack(np.unravel_index(index, shape))
+    fspace.select_elements(coords.astype(np.uint64))
+    mspace = h5py.h5s.create_simple((len(index),))
+    source.read(mspace, fspace, refs)
+    return refs
+
+
+class Resolver(object):
+    """
+    Resolves object references in a file, caching each target's path and
+    type, and if opened the object, by its address.
+    """
+
+    def __init__(self, f):
+        self.file = f
+        self._paths = {}
+        self._types = {}
+        self._objects = {}
+        self._state = None
+        self._visited = False
+        self.hits = 0
+        self.misses = 0
+
+    def _file_state(self):
+        try:
+            st = os.stat(self.file.filename)
+            disk = (st.st_size, st.st_mtime_ns)
+        except OSError:
+            disk = None
+        return disk, self.file.id.get_filesize()
+
+    def _check(self):
+        # Drop the cache if the file has changed since it was filled.
+        state = self._file_state()
+        if state != self._state:
+            self.clear()
+            self._state = state
+
+    def clear(self):
+        """Drop every cached path, type and object."""
+        self._paths.clear()
+        self._types.clear()
+        self._objects.clear()
+        self._visited = False
+
+    def _visit(self):
+        # Cache the path and type of every object in the file.
+        def visit(name, info):
+            if info.addr not in self._paths:
+                self._paths[info.addr] = '/' + name.decode('utf-8')
+                self._types[info.addr] = info.type
+        root = h5py.h5o.get_info(self.file.id)
+        self._paths.setdefault(root.addr, '/')
+        self._types.setdefault(root.addr, root.type)
+        h5py.h5o.visit(self.file.id, visit, info=True)
+        self._visited = True
+
+    def _lookup(self, obj, name, opening=False):
+        # The distinct addresses, the inverse and the shape, having looked
+        # up (and opened) any distinct addresses not yet cached.
+        self._check()
+        source, shape = _source(obj, name)
+        addrs = _addresses(source, shape).reshape(-1)
+        unique, first, inverse = np.unique(addrs, return_index=True,
+                                           return_inverse=True)
+        cache = self._objects if opening else self._paths
+        todo = [k for k, a in enumerate(unique.tolist())
+                if a != 0 and a not in cache]
+        self.misses += len(todo)
+        self.hits += int(np.count_nonzero(unique)) - len(todo)
+
+        unnamed = [k for k in todo if int(unique[k]) not in self._paths]
+        if len(unnamed) >= VISIT_MIN and not self._visited:
+            self._visit()
+        if not opening:
+            todo = [k for k in todo if int(unique[k]) not in self._paths]
+        if todo:
+            fid = self.file.id
+            refs = _references(source, shape, first[todo])
+            for k, ref in zip(todo, refs):
+                a = int(unique[k])
+                if opening:
+                    self._objects[a] = self.file[ref]
+                if a not in self._paths:
+                    self._paths[a] = h5py.h5r.get_name(ref, fid).decode(
+                        'utf-8')
+                    self._types[a] = h5py.h5r.get_obj_type(ref, fid)
+        return unique, inverse.reshape(-1), shape
+
+    def resolve(self, obj, name=None):
+        """
+        Return the paths and types of the targets of the references in a
+        dataset, or in the attribute name of obj, as an object array of str
+        and an int8 array of h5py.h5o.TYPE_GROUP, TYPE_DATASET or
+        TYPE_NAMED_DATATYPE, both of the references' shape.  Null
+        references have the path None and the type -1.
+        """
+        unique, inverse, shape = self._lookup(obj, name)
+        paths = np.empty(len(unique), dtype=object)
+        types = np.full(len(unique), -1, dtype=np.int8)
+        for k, a in enumerate(unique.tolist()):
+            if a != 0:
+                paths[k] = self._paths[a]
+                types[k] = self._types[a]
+        return paths[inverse].reshape(shape), types[inverse].reshape(shape)
+
+    def open(self, obj, name=None):
+        """
+        Return the targets of the references in a dataset, or in the
+        attribute name of obj, as an object array of h5py Groups, Datasets
+        and Datatypes, one object per distinct target, with None for null
+        references.
+        """
+        unique, inverse, shape = self._lookup(obj, name, opening=True)
+        objects = np.empty(len(unique), dtype=object)
+        for k, a in enumerate(unique.tolist()):
+            if a != 0:
+                objects[k] = self._objects[a]
+        return objects[inverse].reshape(shape)
+
+    def stats(self):
+        """
+        Return a dict of the distinct targets looked up (misses) and found
+        in the cache (hits), and the number cached.
+        """
+        lookups = self.hits + self.misses
+        return {'lookups': lookups,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+                'cached': len(self._paths)}
+
+
+def make_file(filename, ntargets=1000, nrefs=1000000, seed=0):
+    """
+    Write a file of ntargets groups and datasets and a dataset 'index' of
+    nrefs references to them drawn at random.
+    """
+    rs = np.random.RandomState(seed)
+    with h5py.File(filename, 'w') as f:
+        targets = []
+        for k in range(ntargets):
+            if k % 2:
+                targets.append(f.create_group('G{0:06d}'.format(k)))
+            else:
+                targets.append(f.create_dataset('DS{0:06d}'.format(k),
+                                                data=k))
+        refs = np.array([t.ref for t in targets], dtype=h5py.ref_dtype)
+        f.create_dataset('index', data=refs[rs.randint(0, ntargets, nrefs)])
+
+
+def benchmark(ntargets=1000, nrefs=1000000, directory=None):
+    """
+    Resolve the paths and types of an index of nrefs references to
+    ntargets objects as h5ex_t_objref does ('naive'), and with a Resolver,
+    first with an empty cache ('resolver') and then a full one ('cached').
+
+    Returns a record for each with the seconds taken.  The naive method
+    only resolves the first 1000 references, its time being scaled up to
+    all of them.
+    """
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        filename = os.path.join(tmpdir, 'objref.h5')
+        make_file(filename, ntargets, nrefs)
+        with h5py.File(filename, 'r') as f:
+            dset = f['index']
+            r = Resolver(f)
+            for method in ['naive', 'resolver', 'cached']:
+                t0 = time.perf_counter()
+                if method == 'naive':
+                    n = min(nrefs, 1000)
+                    rdata = dset[:n]
+                    paths = [f[ref].name for ref in rdata]
+                    types = [type(f[ref]).__name__ for ref in rdata]
+                else:
+                    n = nrefs
+                    paths, types = r.resolve(dset)
+                seconds = (time.perf_counter() - t0) * nrefs / max(n, 1)
+                if method == 'resolver':
+                    expected = [f[ref].name for ref in dset[:100]]
+                    if list(paths[:100]) != expected:
+                        raise RuntimeError("Paths resolved do not match.")
+                records.append({'method': method,
+                                'targets': ntargets,
+                                'references': nrefs,
+                                'seconds': seconds})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare ways of resolving object references, printing "
+                    "JSON.")
+    parser.add_argument('--targets', type=int, default=1000)
+    parser.add_argument('--refs', type=int, default=1000000)
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(ntargets=args.targets, nrefs=args.refs,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Read opaque data as one contiguous buffer of bytes.
+
+h5ex_t_opaque and h5ex_t_opaqueatt read their opaque values as a NumPy
+void array and then copy each element out with row.tobytes(), one small
+bytes object at a time.  When the opaque values are serialized messages to
+be parsed in bulk, those copies are pure overhead.
+
+read() reads a dataset or attribute of opaque records into a single uint8
+array with one row per record, so the whole buffer is available at once
+as data.reshape(-1) or memoryview(data), and Records gives a sequence of
+memoryviews of the records, each a zero-copy slice of the buffer.
+stream() reads a large dataset a block of records at a time into one
+reused buffer, the blocks being whole chunks of a chunked dataset.
+
+    >>> from hdf5examples.tools import opaque
+    >>> with h5py.File('h5ex_t_opaque.h5', 'r') as f:
+    ...     data = opaque.read(f['DS1'])
+    >>> data.shape
+    (4, 7)
+    >>> records = opaque.Records(data)
+    >>> bytes(records[2])
+    b'OPAQUE2'
+    >>> with h5py.File('frames.h5', 'r') as f:
+    ...     for start, block in opaque.stream(f['frames']):
+    ...         parse(memoryview(block))
+
+Run the module to compare against copying each record out:
+
+    $ python -m hdf5examples.tools.opaque --records 1000000 --size 64
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+# The most stream() reads at once from a contiguous dataset.
+BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def _source(obj, name=None):
+    # The low-level dataset or attribute, its shape and its record size,
+    # checking it holds opaque data.
+    source = obj.id if name is None else obj.attrs.get_id(name)
+    tid = source.get_type()
+    if tid.get_class() != h5py.h5t.OPAQUE:
+        what = obj.name if name is None else "{0} of {1}".format(name,
+                                                                 obj.name)
+        msg = "{0} does not hold opaque data."
+        raise ValueError(msg.format(what))
+    return source, source.shape, tid.get_size()
+
+
+def tag(obj, name=None):
+    """Return the tag of the opaque type of a dataset or attribute."""
+    source, shape, size = _source(obj, name)
+    return source.get_type().get_tag()
+
+
+def read(obj, name=None, out=None):
+    """
+    Read a dataset, or the attribute name of obj, of opaque records into a
+    uint8 array of the dataset's shape with one more axis, the bytes of
+    each record, and return it.  The result goes into out if given, which
+    must be a C-contiguous uint8 array of that shape.
+    """
+    source, shape, size = _source(obj, name)
+    shape = tuple(shape) + (size,)
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    elif (tuple(out.shape) != shape or out.dtype != np.uint8 or
+          not out.flags.c_contiguous):
+        msg = "Output must be a C-contiguous uint8 array of shape {0}."
+        raise ValueError(msg.format(shape))
+    # Read as void records into the same memory, with no conversion.
+    buf = out.view('V{0}'.format(size)).reshape(shape[:-1])
+    if isinstance(source, h5py.h5a.AttrID):
+        source.read(buf)
+    elif out.size:
+        source.read(h5py.h5s.ALL, h5py.h5s.ALL, buf)
+    return out
+
+
+class Records(object):
+    """
+    The records of data, as read() returns it, as a sequence of memoryviews
+    of their bytes, each a slice of one memoryview of data's memory, made
+    without copying.  buffer is that memoryview of all the bytes.
+    """
+
+    def __init__(self, data):
+        data = np.asarray(data)
+        if (data.dtype != np.uint8 or not data.flags.c_contiguous or
+                data.ndim < 1):
+            raise ValueError("Data must be a C-contiguous uint8 array.")
+        self.size = data.shape[-1]
+        self.buffer = memoryview(data.reshape(-1))
+
+    def __len__(self):
+        return len(self.buffer) // self.size if self.size else 0
+
+    def __getitem__(self, index):
+        n = len(self)
+        if not -n <= index < n:
+            msg = "Record {0} is out of range for {1} records."
+            raise IndexError(msg.format(index, n))
+        index %= n
+        return self.buffer[index * self.size:(index + 1) * self.size]
+
+    def __iter__(self):
+        size = self.size
+        for offset in range(0, len(self) * size, size):
+            yield self.buffer[offset:offset + size]
+
+
+def stream(dset, start=0, stop=None, block=None):
+    """
+    Yield (index, block) for the records of a dataset from start to stop
+    along the first axis, block being a uint8 array of block records (by
+    default a chunk's worth, or BLOCK_BYTES of a contiguous dataset) as
+    read() returns them, starting at record index.
+
+    Each block is a view of one buffer reused for every block, so copy
+    anything to be kept before asking for the next.
+    """
+    source, shape, size = _source(dset)
+    if not shape:
+        raise ValueError("Dataset {0} is scalar.".format(dset.name))
+    start, stop, _ = slice(start, stop).indices(shape[0])
+    row = size * int(np.prod(shape[1:]))
+    if block is None:
+        if dset.chunks is not None:
+            block = dset.chunks[0]
+        else:
+            block = max(BLOCK_BYTES // max(row, 1), 1)
+    buf = np.empty((block,) + tuple(shape[1:]) + (size,), dtype=np.uint8)
+    vbuf = buf.view('V{0}'.format(size)).reshape(buf.shape[:-1])
+
+    fspace = source.get_space()
+    mspace = h5py.h5s.create_simple(vbuf.shape)
+    # Blocks aligned with the chunks, the first perhaps short.
+    index = start
+    while index < stop:
+        end = min((index // block + 1) * block, stop)
+        count = (end - index,) + tuple(shape[1:])
+        fspace.select_hyperslab((index,) + (0,) * (len(shape) - 1), count)
+        mspace.select_hyperslab((0,) * len(shape), count)
+        source.read(mspace, fspace, vbuf)
+        yield index, buf[:end - index]
+        index = end
+
+
+def benchmark(nrecords=1000000, size=64, chunk=16384, directory=None):
+    """
+    Write nrecords random opaque records of size bytes, then read them
+    back and make every record available as a bytes-like object three ways:
+    reading a void array and copying each record with tobytes() as
+    h5ex_t_opaque does ('tobytes'), reading with read() and taking the
+    Records ('memoryview'), and reading with stream() ('stream').
+
+    Returns a record for each with the seconds taken.
+    """
+    rs = np.random.RandomState(0)
+    data = rs.randint(0, 256, (nrecords, size)).astype(np.uint8)
+    dtype = np.dtype('V{0}'.format(size))
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        filename = os.path.join(tmpdir, 'opaque.h5')
+        with h5py.File(filename, 'w') as f:
+            f.create_dataset('DS1', data=data.view(dtype).reshape(-1),
+                             chunks=(min(chunk, nrecords),))
+
+        for method in ['tobytes', 'memoryview', 'stream']:
+            with h5py.File(filename, 'r') as f:
+                dset = f['DS1']
+                t0 = time.perf_counter()
+                total = 0
+                if method == 'tobytes':
+                    for row in dset[...]:
+                        total += len(row.tobytes())
+                elif method == 'memoryview':
+                    for rec in Records(read(dset)):
+                        total += len(rec)
+                else:
+                    for index, block in stream(dset):
+                        for rec in Records(block):
+                            total += len(rec)
+                seconds = time.perf_counter() - t0
+            if total != data.nbytes:
+                raise RuntimeError("Bytes read do not match.")
+            records.append({'method': method,
+                             'records': nrecords,
+                             'size': size,
+                             'seconds': seconds})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare ways of reading opaque records, printing JSON.")
+    parser.add_argument('--records', type=int, default=1000000)
+    parser.add_argument('--size', type=int, default=64,
+                        help="bytes per record")
+    parser.add_argument('--chunk', type=int, default=16384,
+                        help="records per chunk")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(nrecords=args.records, size=args.size,
+                         chunk=args.chunk, directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
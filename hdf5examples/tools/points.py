@@ -0,0 +1,275 @@
+"""
+Batched reads and writes of scattered elements.
+
+h5_copy writes two points by handing an array of coordinates to
+select_elements.  That is fine for two points, but a point selection of
+millions of coordinates over a chunked dataset is very slow: HDF5 walks the
+points in the order given, and when they are scattered it visits the same
+chunks over and over, decompressing each again whenever it has fallen out
+of the chunk cache.
+
+Here the coordinates are sorted by the chunk they fall in, and each chunk
+touched is read once, as a single hyperslab covering the points inside it.
+The values are then gathered (or, for writes, scattered) with NumPy and
+returned in the caller's original order.
+
+    >>> from hdf5examples.tools import points
+    >>> coords = np.array([[0, 3], [0, 1]])
+    >>> points.write(dset, coords, [53, 59])
+    >>> points.read(dset, coords)
+    array([53, 59], dtype=int32)
+
+Run the module to compare against select_elements:
+
+    $ python -m hdf5examples.tools.points --shape 2000x2000 --chunks 100x100 \
+          --points 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import datagen
+
+# The rows of a contiguous dataset grouped together, like a chunk.
+CONTIGUOUS_BLOCK = 1024 * 1024
+
+
+def _coords(coords, shape):
+    coords = np.asarray(coords, dtype=np.int64)
+    if coords.ndim == 1 and len(shape) == 1:
+        coords = coords[:, np.newaxis]
+    if coords.ndim != 2 or coords.shape[1] != len(shape):
+        msg = "Coordinates must have shape (n, {0}), not {1}."
+        raise ValueError(msg.format(len(shape), coords.shape))
+    if len(coords) and ((coords < 0).any() or
+                        (coords >= np.array(shape)).any()):
+        raise IndexError("Coordinates out of range for shape {0}.".format(
+            shape))
+    return coords
+
+
+def group(coords, shape, chunks):
+    """
+    Group coordinates by the chunk they fall in.
+
+    Returns (order, first, lo, hi): coords[order] is sorted by chunk (in
+    row-major chunk order, keeping the original order within a chunk), the
+    k-th group is coords[order][first[k]:first[k + 1]], and lo and hi are
+    the inclusive and exclusive corners of the box bounding it.
+    """
+    coords = _coords(coords, shape)
+    grid = tuple(-(-n // c) for n, c in zip(shape, chunks))
+    if len(coords) == 0:
+        empty = np.zeros((0, len(shape)), dtype=np.int64)
+        return (np.zeros(0, dtype=np.intp), np.zeros(1, dtype=np.intp),
+                empty, empty)
+    index = coords // np.array(chunks, dtype=np.int64)
+    linear = np.ravel_multi_index(tuple(index.T), grid)
+    order = np.argsort(linear, kind='stable')
+    linear = linear[order]
+    first = np.flatnonzero(np.diff(linear)) + 1
+    first = np.concatenate([[0], first, [len(linear)]])
+    ordered = coords[order]
+    lo = np.minimum.reduceat(ordered, first[:-1], axis=0)
+    hi = np.maximum.reduceat(ordered, first[:-1], axis=0) + 1
+    return order, first, lo, hi
+
+
+def _chunks(dset):
+    if dset.chunks is not None:
+        return dset.chunks
+    # Not chunked, so group by blocks of whole rows instead.
+    shape = dset.shape
+    return datagen.block_shape(shape, (1,) * len(shape), dset.dtype.itemsize,
+                               CONTIGUOUS_BLOCK)
+
+
+def _box(dsid, lo, hi):
+    count = tuple(int(x) for x in hi - lo)
+    fspace = dsid.get_space()
+    fspace.select_hyperslab(tuple(int(x) for x in lo), count)
+    return h5py.h5s.create_simple(count), fspace
+
+
+def read(dset, coords, out=None):
+    """
+    Read the elements of dset at coords, an (n, rank) array of indices,
+    returning them in the same order as a 1-D array (or into out).
+    """
+    dtype = dset.dtype
+    coords = _coords(coords, dset.shape)
+    if out is None:
+        out = np.empty(len(coords), dtype=dtype)
+    elif out.shape != (len(coords),):
+        msg = "Output array has shape {0}, expected ({1},)."
+        raise ValueError(msg.format(out.shape, len(coords)))
+
+    order, first, lo, hi = group(coords, dset.shape, _chunks(dset))
+    ordered = coords[order]
+    dsid = dset.id
+    for k in range(len(lo)):
+        a, b = first[k], first[k + 1]
+        mspace, fspace = _box(dsid, lo[k], hi[k])
+        buf = np.empty(tuple(hi[k] - lo[k]), dtype=dtype)
+        dsid.read(mspace, fspace, buf)
+        out[order[a:b]] = buf[tuple((ordered[a:b] - lo[k]).T)]
+    return out
+
+
+def write(dset, coords, values):
+    """
+    Write values (one per coordinate, or a scalar) to the elements of dset
+    at coords, an (n, rank) array of indices.  As with a point selection,
+    when a coordinate is repeated the last of its values is the one kept.
+    """
+    dtype = dset.dtype
+    coords = _coords(coords, dset.shape)
+    values = np.broadcast_to(np.asarray(values, dtype=dtype), (len(coords),))
+
+    order, first, lo, hi = group(coords, dset.shape, _chunks(dset))
+    ordered = coords[order]
+    values = values[order]
+    dsid = dset.id
+    for k in range(len(lo)):
+        a, b = first[k], first[k + 1]
+        mspace, fspace = _box(dsid, lo[k], hi[k])
+        shape = tuple(hi[k] - lo[k])
+        local = tuple((ordered[a:b] - lo[k]).T)
+        buf = np.empty(shape, dtype=dtype)
+        # Only read the box if the points do not cover all of it.
+        if b - a < buf.size or \
+                len(np.unique(np.ravel_multi_index(local, shape))) < buf.size:
+            dsid.read(mspace, fspace, buf)
+        buf[local] = values[a:b]
+        dsid.write(mspace, fspace, buf)
+
+
+def _point_space(dsid, coords):
+    fspace = dsid.get_space()
+    fspace.select_elements(coords)
+    return h5py.h5s.create_simple((len(coords),)), fspace
+
+
+def native_read(dset, coords):
+    """
+    Read the elements at coords with a single point selection.
+    """
+    coords = _coords(coords, dset.shape)
+    out = np.empty(len(coords), dtype=dset.dtype)
+    mspace, fspace = _point_space(dset.id, coords)
+    dset.id.read(mspace, fspace, out)
+    return out
+
+
+def native_write(dset, coords, values):
+    """
+    Write values to the elements at coords with a single point selection.
+    """
+    coords = _coords(coords, dset.shape)
+    values = np.ascontiguousarray(
+        np.broadcast_to(np.asarray(values, dtype=dset.dtype), (len(coords),)))
+    mspace, fspace = _point_space(dset.id, coords)
+    dset.id.write(mspace, fspace, values)
+
+
+def benchmark(shape=(2000, 2000), chunks=(100, 100), npoints=100000,
+              dtype='<i4', compression='gzip', seed=0, directory=None):
+    """
+    Read and then write npoints random coordinates of a dataset, first
+    with select_elements and then with read() and write(), returning a
+    record for each with the elapsed seconds and points per second.
+    """
+    shape = tuple(shape)
+    chunks = tuple(chunks) if chunks else None
+    rs = np.random.RandomState(seed)
+    coords = np.column_stack([rs.randint(0, n, npoints) for n in shape])
+    values = rs.randint(0, 1000, npoints).astype(dtype)
+
+    methods = [('select_elements', native_read, native_write),
+               ('batched', read, write)]
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        results = []
+        for method, reader, writer in methods:
+            filename = os.path.join(tmpdir, method + '.h5')
+            with h5py.File(filename, 'w') as f:
+                dset = f.create_dataset('DS1', shape, dtype=dtype,
+                                        chunks=chunks,
+                                        compression=compression)
+                datagen.fill(dset, 'product')
+
+            timings = []
+            with h5py.File(filename, 'r') as f:
+                t0 = time.perf_counter()
+                rdata = reader(f['DS1'], coords)
+                timings.append(('read', time.perf_counter() - t0))
+            with h5py.File(filename, 'r+') as f:
+                t0 = time.perf_counter()
+                writer(f['DS1'], coords, values)
+                timings.append(('write', time.perf_counter() - t0))
+            with h5py.File(filename, 'r') as f:
+                results.append((rdata, f['DS1'][...]))
+
+            for op, seconds in timings:
+                records.append({'method': method,
+                                'op': op,
+                                'shape': list(shape),
+                                'chunks': list(chunks) if chunks else None,
+                                'compression': compression,
+                                'points': npoints,
+                                'seconds': seconds,
+                                'points_per_s': npoints / seconds})
+        for rdata, wdata in results[1:]:
+            if not (np.array_equal(rdata, results[0][0]) and
+                    np.array_equal(wdata, results[0][1])):
+                raise RuntimeError("Batched results do not match.")
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def _shape(s):
+    return tuple(int(x) for x in s.split('x'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare batched point I/O with select_elements, "
+                    "printing JSON.")
+    parser.add_argument('--shape', type=_shape, default=(2000, 2000),
+                        help="dataset shape, e.g. 2000x2000")
+    parser.add_argument('--chunks', type=_shape, default=(100, 100),
+                        help="chunk shape, e.g. 100x100")
+    parser.add_argument('--contiguous', action='store_true',
+                        help="do not chunk the dataset")
+    parser.add_argument('--points', type=int, default=100000)
+    parser.add_argument('--dtype', default='<i4')
+    parser.add_argument('--compression', default='gzip',
+                        help="e.g. gzip or lzf, or 'none'")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    compression = args.compression
+    if args.contiguous or compression == 'none':
+        compression = None
+    records = benchmark(shape=args.shape,
+                        chunks=None if args.contiguous else args.chunks,
+                        npoints=args.points, dtype=args.dtype,
+                        compression=compression, seed=args.seed,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+"""
+Store ragged strings and arrays as flat values and an array of offsets.
+
+h5ex_t_vlstring writes its strings as HDF5 variable-length strings, and
+h5ex_t_vlen and h5ex_t_vlenatt write ragged int32 arrays (a countdown and a
+Fibonacci sequence) as variable-length sequences.  Each string or sequence
+is a separate object in the file's global heap, so reading them back costs
+a heap lookup and a Python object per element, the heap is never
+compressed, and millions of them read slowly however they are chunked or
+cached.
+
+RaggedStrings and RaggedArray keep the same data as two ordinary datasets
+in a group:
+
+    values      the elements of every row end to end: for strings their
+                UTF-8 bytes as uint8, for arrays their own dtype
+    offsets     int64, one more than the number of rows; row k is
+                values[offsets[k]:offsets[k + 1]]
+
+Both are plain numeric datasets, chunked and resizable, so they read in a
+single call each, compress well, grow by appending, and a slice of the
+rows reads only its share of the offsets and of the values.  One row reads
+two offsets and its own values, whatever the row's number.
+
+encode() and decode() convert strings to and from the flat form, vectorized
+for fixed-width byte strings ('S'); object arrays of str need one Python
+object per string, but no heap lookups.  Since fixed-width byte strings
+cannot end in NUL bytes, strings that do lose them when decoded to 'S' (or
+'U').  flatten() and split() do the same for arrays, split() returning
+views of the one array of values.
+
+    >>> from hdf5examples.tools import ragged
+    >>> s = ragged.RaggedStrings.create(f, 'DS1')
+    >>> s.append(['Parting', 'is such', 'sweet', 'sorrow'])
+    >>> s.read(np.s_[1:3])
+    array(['is such', 'sweet'], dtype=object)
+    >>> s.read(dtype='S')
+    array([b'Parting', b'is such', b'sweet', b'sorrow'], dtype='|S7')
+    >>> a = ragged.RaggedArray.create(f, 'DS2', '<i4', compression='gzip')
+    >>> a.append([[3, 2, 1], [1, 1, 2, 3, 5, 8]])
+    >>> a.row(1)
+    array([1, 1, 2, 3, 5, 8], dtype=int32)
+    >>> values, offsets = a.read_flat()
+
+Run the module to compare against variable-length strings or sequences:
+
+    $ python -m hdf5examples.tools.ragged --kind str --rows 1000000
+    $ python -m hdf5examples.tools.ragged --kind array --rows 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+# The group attribute marking a ragged group, and what it holds.
+RAGGED_ATTR = 'ragged'
+
+# Small enough that reading one row of compressed data decompresses little.
+CHUNK_BYTES = 64 * 1024
+CHUNK_ROWS = 8 * 1024
+
+DTYPES = ('O', 'S', 'U')
+
+
+def encode(strings, encoding='utf-8'):
+    """
+    Return the bytes of strings (a sequence or array of str or bytes, or a
+    fixed-width 'S' or 'U' array) end to end as a uint8 array, and the
+    int64 offsets of each string's start, with one more for the end.
+    """
+    arr = np.asarray(strings)
+    if arr.dtype.kind == 'U':
+        arr = np.char.encode(arr, encoding)
+    if arr.dtype.kind == 'S':
+        # Vectorized: the strings are the rows of a byte matrix, padded
+        # with NULs, so keep each row's bytes before its padding.
+        n = arr.size
+        width = arr.dtype.itemsize
+        matrix = np.ascontiguousarray(arr.reshape(-1)).view(np.uint8)
+        matrix = matrix.reshape(n, width)
+        nonzero = matrix != 0
+        # The length is one past the last non-NUL byte.
+        lengths = width - np.argmax(nonzero[:, ::-1], axis=1)
+        lengths[~nonzero.any(axis=1)] = 0
+        blob = matrix[np.arange(width) < lengths[:, np.newaxis]]
+    else:
+        encoded = [s.encode(encoding) if isinstance(s, str) else bytes(s)
+                   for s in arr.reshape(-1)]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64,
+                              count=len(encoded))
+        blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return blob, offsets
+
+
+def decode(blob, offsets, dtype='O', encoding='utf-8'):
+    """
+    Return the strings in blob at offsets (as returned by encode()) as an
+    array of dtype: 'O' for str objects, 'S' for fixed-width bytes, or 'U'
+    for fixed-width str, each as wide as the longest string.  The offsets
+    need not start at zero; the blob starts at offsets[0].
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    blob = np.asarray(blob, dtype=np.uint8)
+    starts = offsets[:-1] - offsets[0]
+    lengths = np.diff(offsets)
+    dtype = np.dtype(dtype).kind
+    if dtype not in DTYPES:
+        msg = "The dtype must be one of {0}, not '{1}'."
+        raise ValueError(msg.format(DTYPES, dtype))
+
+    if dtype == 'O':
+        data = blob.tobytes()
+        out = np.empty(len(lengths), dtype=object)
+        out[:] = [data[i:j].decode(encoding) for i, j in
+                  zip(starts.tolist(), (starts + lengths).tolist())]
+        return out
+
+    # Vectorized: scatter the bytes into the rows of a NUL-padded matrix.
+    width = max(int(lengths.max()), 1) if len(lengths) else 1
+    matrix = np.zeros(len(lengths) * width, dtype=np.uint8)
+    rows = np.arange(len(lengths), dtype=np.int64) * width
+    matrix[_runs(rows, lengths)] = blob[:offsets[-1] - offsets[0]]
+    out = matrix.view('S{0}'.format(width))
+    if dtype == 'U':
+        out = np.char.decode(out, encoding)
+    return out
+
+
+def flatten(rows, dtype=None):
+    """
+    Return the one-dimensional arrays in rows end to end, and the int64
+    offsets of each row's start, with one more for the end.
+    """
+    rows = [np.asarray(row, dtype=dtype).reshape(-1) for row in rows]
+    lengths = np.fromiter(map(len, rows), dtype=np.int64, count=len(rows))
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    if rows:
+        values = np.concatenate(rows)
+    else:
+        values = np.empty(0, dtype=dtype)
+    if dtype is not None:
+        values = values.astype(dtype, copy=False)
+    return values, offsets
+
+
+def split(values, offsets):
+    """
+    Return an object array of the rows of values at offsets (as returned
+    by flatten()), each a view of values.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64) - offsets[0]
+    out = np.empty(len(offsets) - 1, dtype=object)
+    # Assigned one by one, lest rows of equal length be broadcast.
+    for k, row in enumerate(np.split(values[:offsets[-1]], offsets[1:-1])):
+        out[k] = row
+    return out
+
+
+class _Ragged(object):
+    # The values and offsets datasets in a group marked with RAGGED_ATTR.
+
+    kind = None
+
+    def __init__(self, group):
+        if _str(group.attrs.get(RAGGED_ATTR)) != self.kind:
+            msg = "Group {0} does not hold ragged {1} data."
+            raise ValueError(msg.format(group.name, self.kind))
+        self.group = group
+        self.values = group['values']
+        self.offsets = group['offsets']
+
+    @classmethod
+    def _create(cls, group, name, dtype, chunk_bytes, chunk_rows, **kwargs):
+        obj = group.create_group(name)
+        obj.attrs[RAGGED_ATTR] = cls.kind
+        nvalues = max(chunk_bytes // np.dtype(dtype).itemsize, 1)
+        obj.create_dataset('values', (0,), dtype=dtype, maxshape=(None,),
+                           chunks=(nvalues,), **kwargs)
+        obj.create_dataset('offsets', data=np.zeros(1, dtype=np.int64),
+                           maxshape=(None,), chunks=(chunk_rows,), **kwargs)
+        return cls(obj)
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def _append(self, values, offsets):
+        # Append flat values with offsets starting at zero.
+        nvalues = self.values.shape[0]
+        n = self.offsets.shape[0]
+        self.values.resize(nvalues + len(values), axis=0)
+        self.values[nvalues:] = values
+        self.offsets.resize(n + len(offsets) - 1, axis=0)
+        self.offsets[n:] = offsets[1:] + nvalues
+
+    def read_flat(self, sel=slice(None)):
+        """
+        Return the values and offsets of the rows in the slice sel, reading
+        only their offsets and values.  The offsets start at zero.
+        """
+        if not isinstance(sel, slice):
+            raise ValueError("Selections must be slices.")
+        start, stop, step = sel.indices(len(self))
+        if step < 0:
+            raise ValueError("Selections must be slices with positive step.")
+        stop = max(start, stop)
+        offsets = self.offsets[start:stop + 1]
+        values = self.values[offsets[0]:offsets[-1]]
+        if step > 1:
+            keep = np.arange(0, len(offsets) - 1, step)
+            values, offsets = _gather(values, offsets[keep] - offsets[0],
+                                      offsets[keep + 1] - offsets[keep])
+        return values, offsets - offsets[0]
+
+    def _row(self, index):
+        # The values of one row, from two offsets.
+        n = len(self)
+        if not -n <= index < n:
+            msg = "Row {0} is out of range for {1} rows."
+            raise IndexError(msg.format(index, n))
+        index %= n
+        start, stop = self.offsets[index:index + 2]
+        return self.values[start:stop]
+
+
+class RaggedStrings(_Ragged):
+    """
+    Strings stored as a uint8 'values' blob and int64 'offsets' in a group.
+    Open an existing one with RaggedStrings(group), or make a new one with
+    RaggedStrings.create().
+    """
+
+    kind = 'str'
+
+    @classmethod
+    def create(cls, group, name, chunk_bytes=CHUNK_BYTES,
+               chunk_rows=CHUNK_ROWS, **kwargs):
+        """
+        Create an empty group of strings.  Other keyword arguments (e.g.
+        compression) go to create_dataset for both datasets.
+        """
+        return cls._create(group, name, np.uint8, chunk_bytes, chunk_rows,
+                           **kwargs)
+
+    def append(self, strings):
+        """Append strings, as accepted by encode()."""
+        self._append(*encode(strings))
+
+    def row(self, index):
+        """Return the string at index as a str."""
+        return self._row(index).tobytes().decode('utf-8')
+
+    def read(self, sel=slice(None), dtype='O'):
+        """
+        Return the strings in the slice sel, reading only their offsets and
+        bytes, as an array of dtype ('O', 'S' or 'U', as for decode()).
+        """
+        values, offsets = self.read_flat(sel)
+        return decode(values, offsets, dtype)
+
+
+class RaggedArray(_Ragged):
+    """
+    Rows of varying length stored as a 'values' dataset of the rows end to
+    end and int64 'offsets' in a group.  Open an existing one with
+    RaggedArray(group), or make a new one with RaggedArray.create().
+    """
+
+    kind = 'array'
+
+    @classmethod
+    def create(cls, group, name, dtype='<i4', chunk_bytes=CHUNK_BYTES,
+               chunk_rows=CHUNK_ROWS, **kwargs):
+        """
+        Create an empty group of rows of dtype.  Other keyword arguments
+        (e.g. compression) go to create_dataset for both datasets.
+        """
+        return cls._create(group, name, dtype, chunk_bytes, chunk_rows,
+                           **kwargs)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def append(self, rows):
+        """
+        Append rows, a sequence of one-dimensional arrays.  Large datasets
+        can be streamed in by appending them a batch of rows at a time.
+        """
+        self._append(*flatten(rows, self.dtype))
+
+    def append_flat(self, values, offsets):
+        """
+        Append rows given as flatten() returns them: their values end to
+        end, and offsets that start at zero, never decrease and end at the
+        number of values.
+        """
+        values = np.asarray(values, dtype=self.dtype).reshape(-1)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if (offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or
+                offsets[-1] != len(values) or np.any(np.diff(offsets) < 0)):
+            msg = ("Offsets must start at 0, never decrease and end at the "
+                   "number of values ({0}).")
+            raise ValueError(msg.format(len(values)))
+        self._append(values, offsets)
+
+    def row(self, index):
+        """Return row index, reading two offsets and the row's values."""
+        return self._row(index)
+
+    def read(self, sel=slice(None)):
+        """
+        Return the rows in the slice sel as an object array of arrays, as
+        h5py returns variable-length data, the arrays being views of one
+        array of values.
+        """
+        return split(*self.read_flat(sel))
+
+
+def _runs(starts, lengths):
+    # The indices of the runs of lengths at starts, end to end.
+    ends = np.cumsum(lengths)
+    return np.arange(ends[-1] if len(ends) else 0) + np.repeat(
+        starts - (ends - lengths), lengths)
+
+
+def _gather(values, starts, lengths):
+    # The runs of values at starts with lengths, end to end, and their
+    # offsets.
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return values[_runs(starts, lengths)], offsets
+
+
+def _str(name):
+    return name.decode('utf-8') if isinstance(name, bytes) else name
+
+
+def make_strings(nstrings, seed=0):
+    """
+    Return an object array of nstrings words from h5ex_t_vlstring's
+    sentence, joined in random numbers.
+    """
+    words = np.array(['Parting', 'is', 'such', 'sweet', 'sorrow'],
+                     dtype=object)
+    rs = np.random.RandomState(seed)
+    counts = rs.randint(1, 6, nstrings)
+    picks = words[rs.randint(0, len(words), counts.sum())]
+    ends = np.cumsum(counts)
+    strings = np.empty(nstrings, dtype=object)
+    strings[:] = [' '.join(picks[i - c:i]) for i, c in
+                  zip(ends.tolist(), counts.tolist())]
+    return strings
+
+
+def make_arrays(nrows, maxlen=20, dtype='<i4', seed=0):
+    """
+    Return an object array of nrows arrays of random integers, each of a
+    random length up to maxlen.
+    """
+    rs = np.random.RandomState(seed)
+    offsets = np.zeros(nrows + 1, dtype=np.int64)
+    np.cumsum(rs.randint(0, maxlen + 1, nrows), out=offsets[1:])
+    values = rs.randint(0, 1000, offsets[-1]).astype(dtype)
+    return split(values, offsets)
+
+
+def _same(kind, rdata, expected):
+    if kind == 'str':
+        return list(rdata) == list(expected)
+    rvalues, roffsets = flatten(rdata)
+    values, offsets = flatten(expected)
+    return (np.array_equal(roffsets, offsets) and
+            np.array_equal(rvalues, values))
+
+
+def benchmark(nrows=1000000, nslice=1000, kind='str', compression=None,
+              directory=None):
+    """
+    Write nrows strings (kind 'str') or int32 arrays (kind 'array') as
+    variable-length data ('vlen') and as a RaggedStrings or RaggedArray
+    ('ragged'), then time reading them all back, reading a slice of nslice
+    rows from the middle, and reading nslice rows one at a time at random.
+
+    Returns a record for each with the seconds taken to write and to read
+    each way, and the file's size.  For the ragged data, flat_read_s is
+    the time to read everything as fixed-width bytes (strings) or as flat
+    values and offsets (arrays).
+    """
+    if kind == 'str':
+        data = make_strings(nrows)
+        vlen = h5py.string_dtype()
+        cls = RaggedStrings
+    elif kind == 'array':
+        data = make_arrays(nrows)
+        vlen = h5py.vlen_dtype(np.dtype('<i4'))
+        cls = RaggedArray
+    else:
+        raise ValueError("Unknown kind '{0}'.".format(kind))
+    middle = slice(nrows // 2, nrows // 2 + nslice)
+    rows = np.random.RandomState(0).randint(0, nrows, nslice)
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        for method in ['vlen', 'ragged']:
+            filename = os.path.join(tmpdir, method + '.h5')
+            t0 = time.perf_counter()
+            with h5py.File(filename, 'w') as f:
+                if method == 'vlen':
+                    f.create_dataset('DS1', data=data, dtype=vlen,
+                                     chunks=(min(CHUNK_ROWS, nrows),),
+                                     compression=compression)
+                else:
+                    obj = cls.create(f, 'DS1', compression=compression)
+                    obj.append(data)
+            write_s = time.perf_counter() - t0
+
+            timings = {'flat': None}
+            readers = ['read', 'slice', 'rows']
+            if method == 'ragged':
+                readers.append('flat')
+            for reader in readers:
+                with h5py.File(filename, 'r') as f:
+                    t0 = time.perf_counter()
+                    if method == 'vlen':
+                        obj = f['DS1'].asstr() if kind == 'str' else f['DS1']
+                        read_row = obj.__getitem__
+                    else:
+                        obj = cls(f['DS1'])
+                        read_row = obj.row
+                    if reader == 'rows':
+                        rdata = [read_row(k) for k in rows.tolist()]
+                    elif reader == 'slice':
+                        rdata = obj[middle] if method == 'vlen' \
+                            else obj.read(middle)
+                    elif reader == 'read':
+                        rdata = obj[...] if method == 'vlen' else obj.read()
+                    elif kind == 'str':
+                        rdata = obj.read(dtype='S')
+                    else:
+                        rdata = obj.read_flat()
+                    timings[reader] = time.perf_counter() - t0
+                if reader == 'rows':
+                    expected = data[rows]
+                elif reader == 'slice':
+                    expected = data[middle]
+                else:
+                    expected = data
+                if reader == 'flat':
+                    if kind == 'str':
+                        rdata = np.char.decode(rdata, 'utf-8')
+                    else:
+                        rdata = split(*rdata)
+                if not _same(kind, rdata, expected):
+                    raise RuntimeError("Data read back does not match.")
+
+            records.append({'method': method,
+                            'kind': kind,
+                            'rows': nrows,
+                            'compression': compression,
+                            'write_s': write_s,
+                            'read_s': timings['read'],
+                            'flat_read_s': timings['flat'],
+                            'slice_read_s': timings['slice'],
+                            'row_read_s': timings['rows'],
+                            'file_bytes': os.path.getsize(filename)})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare ragged and variable-length data, printing "
+                    "JSON.")
+    parser.add_argument('--kind', choices=['str', 'array'], default='str')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--slice', type=int, default=1000,
+                        help="rows in the slice read, and read one by one")
+    parser.add_argument('--compression', default=None,
+                        help="e.g. gzip or lzf")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(nrows=args.rows, nslice=args.slice, kind=args.kind,
+                        compression=args.compression,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Copy datasets between files without decompressing and recompressing them.
+
+h5_copy copies values from copy1.h5 to copy2.h5 by reading them and writing
+them with dset2.write.  For a compressed dataset that means every chunk is
+decompressed on the way out and compressed again on the way in, which for
+an archive of deflate-9 data costs far more CPU than the copy itself.
+
+Here a dataset is recreated in the destination with the source's creation
+property list (so the same chunk shape, filters, fill value and allocation
+time), and each allocated chunk is moved as stored: read_direct_chunk from
+the source, write_direct_chunk to the destination, filter mask and all.
+Chunks that were never written stay unwritten.  Groups are copied
+recursively, attributes and links included; an object reached again
+through another hard link is linked to its copy rather than copied twice.
+
+Object and region references, in datasets and attributes, are rewritten to
+point at the copies of their objects once everything has been copied.
+Datasets of other types whose stored bytes point back into the source file
+(variable-length data, references inside compounds), datasets with
+committed datatypes, and the committed datatypes themselves, are copied by
+the library with h5o.copy instead.
+
+h5py serializes every call into the library, so a thread pool cannot speed
+up the copy.  Given a process pool (or workers), the chunks are read by
+worker processes, each opening the source file read-only, while the calling
+process writes them.  The reads are batched across datasets, so copying
+many small datasets keeps the workers busy too.
+
+    >>> from hdf5examples.tools import rawcopy
+    >>> with h5py.File('copy1.h5', 'r') as src, \\
+    ...         h5py.File('copy2.h5', 'w') as dst:
+    ...     rawcopy.copy(src, dst, '/', workers=4)
+
+or from the command line, printing what was copied as JSON:
+
+    $ python -m hdf5examples.tools.rawcopy archive.h5 migrated.h5 --workers 4
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import posixpath
+import sys
+import time
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import chunkio, datagen
+
+# The stored bytes read by one worker task.
+BATCH_BYTES = 8 * 1024 * 1024
+
+# The largest block copied at once for datasets that are not chunked.
+BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def self_contained(tid):
+    """
+    Return True if values of the datatype can be copied byte for byte to
+    another file, i.e. they hold no variable-length data or references.
+    """
+    cls = tid.get_class()
+    if cls in (h5py.h5t.REFERENCE, h5py.h5t.VLEN):
+        return False
+    if cls == h5py.h5t.STRING:
+        return not tid.is_variable_str()
+    if cls == h5py.h5t.COMPOUND:
+        return all(self_contained(tid.get_member_type(k))
+                   for k in range(tid.get_nmembers()))
+    if cls == h5py.h5t.ARRAY:
+        return self_contained(tid.get_super())
+    return True
+
+
+def _is_ref(tid):
+    return tid.get_class() == h5py.h5t.REFERENCE
+
+
+def _library(dset):
+    # Datasets copied by h5o.copy rather than chunk by chunk.
+    tid = dset.id.get_type()
+    return tid.committed() or not (self_contained(tid) or _is_ref(tid))
+
+
+def _read_chunks(filename, items):
+    # Worker task: the stored bytes of some chunks of some datasets, given
+    # as (path, offsets) pairs.
+    with h5py.File(filename, 'r') as f:
+        out = []
+        for path, offsets in items:
+            dsid = f[path].id
+            out.append([(offset,) + dsid.read_direct_chunk(offset)
+                        for offset in offsets])
+        return out
+
+
+class _Copier(object):
+    # The state of one call to copy(): where chunks are read, the counts,
+    # the path of every object copied (by source path and by object, so
+    # that hard links to an object already copied are linked again), the
+    # chunk reads not yet submitted or written, and the references still
+    # to be remapped once everything they might point to exists.
+    #
+    # Chunk reads are batched across datasets and the pending tasks are
+    # only drained in finish(), so a tree of many small datasets keeps the
+    # workers as busy as one large dataset does.
+
+    def __init__(self, executor, workers, filename):
+        self.executor = executor
+        self.workers = workers
+        self.filename = filename
+        self.stats = {'datasets': 0, 'groups': 0, 'datatypes': 0,
+                      'library': 0, 'chunks': 0, 'bytes': 0,
+                      'references': 0}
+        self.paths = {}
+        self.copied = {}
+        self.batch = []
+        self.batch_bytes = 0
+        self.pending = []
+        self.deferred = []
+
+    def copy(self, src, group, name):
+        if isinstance(src, h5py.Dataset):
+            if _library(src):
+                h5py.h5o.copy(src.file.id, src.name.encode('utf-8'),
+                              group.id, name.encode('utf-8'))
+                self.stats['library'] += 1
+                dst = group[name]
+            else:
+                dst = self.copy_dataset(src, group, name)
+            self.copied[src.id] = dst.name
+        elif isinstance(src, h5py.Datatype):
+            h5py.h5o.copy(src.file.id, src.name.encode('utf-8'),
+                          group.id, name.encode('utf-8'))
+            self.stats['datatypes'] += 1
+            dst = group[name]
+            self.copied[src.id] = dst.name
+        else:
+            # With the name '/', the contents of src go straight into group.
+            dst = group if name == '/' else group.create_group(name)
+            self.stats['groups'] += 1
+            # Recorded before the members, as one of them may link back.
+            self.copied[src.id] = dst.name
+            self.copy_attrs(src, dst)
+            for key in src:
+                link = src.get(key, getlink=True)
+                if isinstance(link, (h5py.SoftLink, h5py.ExternalLink)):
+                    dst[key] = link
+                    continue
+                obj = src[key]
+                path = self.copied.get(obj.id)
+                if path is None:
+                    self.copy(obj, dst, key)
+                else:
+                    dst[key] = dst.file[path]
+                    self.paths[obj.name] = path
+        self.paths[src.name] = dst.name
+
+    def copy_attrs(self, src, dst):
+        for name in src.attrs:
+            aid = src.attrs.get_id(name)
+            if _is_ref(aid.get_type()):
+                self.deferred.append((src, dst, name))
+                continue
+            space = aid.get_space()
+            new = h5py.h5a.create(dst.id, aid.name, aid.get_type(), space)
+            if space.get_simple_extent_type() != h5py.h5s.NULL:
+                buf = np.empty(aid.shape, dtype=aid.dtype)
+                aid.read(buf)
+                new.write(buf)
+
+    def copy_dataset(self, src, group, name):
+        dsid = src.id
+        did = h5py.h5d.create(group.id, name.encode('utf-8'),
+                              dsid.get_type(), dsid.get_space(),
+                              dcpl=dsid.get_create_plist())
+        dst = h5py.Dataset(did)
+        self.stats['datasets'] += 1
+        if _is_ref(dsid.get_type()):
+            self.deferred.append((src, dst, None))
+        elif src.chunks is not None:
+            self.copy_chunks(src, dst)
+        elif src.shape == ():
+            dst.write_direct(np.asarray(src[()]))
+            self.stats['bytes'] += dsid.get_storage_size()
+        elif src.shape and src.size:
+            # No filters to preserve, so copy through the library a block
+            # at a time.
+            chunks = (1,) + tuple(src.shape[1:])
+            block = datagen.block_shape(src.shape, chunks,
+                                        src.dtype.itemsize, BLOCK_BYTES)
+            for offset, sel in chunkio.chunk_slices(src.shape, block):
+                dst.write_direct(src[sel], dest_sel=sel)
+            self.stats['bytes'] += dsid.get_storage_size()
+        self.copy_attrs(src, dst)
+        return dst
+
+    def copy_chunks(self, src, dst):
+        dsid = src.id
+        infos = chunkio._chunk_info(dsid)
+        self.stats['chunks'] += len(infos)
+        self.stats['bytes'] += sum(info.size for info in infos)
+        if self.executor is None:
+            for info in infos:
+                filter_mask, buf = dsid.read_direct_chunk(info.chunk_offset)
+                dst.id.write_direct_chunk(info.chunk_offset, buf,
+                                          filter_mask)
+            return
+
+        offsets = []
+        self.batch.append((src.name, offsets, dst.id))
+        for info in infos:
+            offsets.append(info.chunk_offset)
+            self.batch_bytes += info.size
+            if self.batch_bytes >= BATCH_BYTES:
+                self.submit()
+                offsets = []
+                self.batch.append((src.name, offsets, dst.id))
+
+    def submit(self):
+        # Hand the chunks gathered so far to a worker, writing the oldest
+        # task's chunks once enough tasks are in flight.
+        batch = [(path, offsets, did)
+                 for path, offsets, did in self.batch if offsets]
+        self.batch, self.batch_bytes = [], 0
+        if batch:
+            items = [(path, offsets) for path, offsets, did in batch]
+            future = self.executor.submit(_read_chunks, self.filename, items)
+            self.pending.append((future, [did for _, _, did in batch]))
+        if len(self.pending) > 2 * self.workers:
+            self.write(self.pending.pop(0))
+
+    def write(self, task):
+        future, dids = task
+        for did, chunks in zip(dids, future.result()):
+            for offset, filter_mask, buf in chunks:
+                did.write_direct_chunk(offset, buf, filter_mask)
+
+    def remap(self, refs, src_file, dst_file):
+        # Point each reference at the copy of its object.  References to
+        # objects that were not copied become null references.
+        refs = np.asarray(refs)
+        out = np.empty(refs.shape, dtype=refs.dtype)
+        flat = out.reshape(-1)
+        for k, ref in enumerate(refs.reshape(-1)):
+            path = self.paths.get(src_file[ref].name) if ref else None
+            if path is None:
+                flat[k] = type(ref)()
+                continue
+            obj = dst_file[path]
+            if isinstance(ref, h5py.RegionReference):
+                space = h5py.h5r.get_region(ref, src_file.id)
+                flat[k] = h5py.h5r.create(obj.id, b'.',
+                                          h5py.h5r.DATASET_REGION, space)
+            else:
+                flat[k] = obj.ref
+            self.stats['references'] += 1
+        return out
+
+    def finish(self):
+        if self.executor is not None:
+            self.submit()
+            while self.pending:
+                self.write(self.pending.pop(0))
+        for src, dst, name in self.deferred:
+            if name is None:
+                if src.shape:
+                    dst[...] = self.remap(src[...], src.file, dst.file)
+                elif src.shape == ():
+                    dst[()] = self.remap(src[()], src.file, dst.file)[()]
+            else:
+                aid = src.attrs.get_id(name)
+                dst.attrs.create(name, self.remap(src.attrs[name], src.file,
+                                                  dst.file),
+                                 shape=aid.shape, dtype=aid.dtype)
+
+
+def copy(src, group, name=None, executor=None, workers=None):
+    """
+    Copy a dataset or group (recursively) to group, under its own name
+    unless name is given.  A group copied with the name '/' has its
+    contents copied straight into group.
+
+    Returns a dict counting the datasets, groups and committed datatypes
+    copied, the datasets left to the library, the chunks and stored bytes moved, and the object
+    and region references remapped.  A reference is remapped to the copy of
+    the object it points to; references to objects outside src become null
+    references.
+
+    With executor (a ProcessPoolExecutor) or workers, chunks are read by
+    worker processes; a thread pool is accepted but gains nothing.
+    """
+    if name is None:
+        name = posixpath.basename(src.name.rstrip('/')) or 'root'
+    owner = executor is None and workers is not None and workers > 1
+    if owner:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    copier = _Copier(executor, workers, src.file.filename)
+    try:
+        copier.copy(src, group, name)
+        copier.finish()
+    finally:
+        if owner:
+            executor.shutdown()
+    return copier.stats
+
+
+def copy_file(src_filename, dst_filename, executor=None, workers=None):
+    """
+    Copy everything in one file into a new file, returning the counts from
+    copy() plus the elapsed seconds.
+    """
+    t0 = time.perf_counter()
+    with h5py.File(src_filename, 'r') as src, \
+            h5py.File(dst_filename, 'w') as dst:
+        stats = copy(src, dst, '/', executor=executor, workers=workers)
+    stats['seconds'] = time.perf_counter() - t0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Copy an HDF5 file without recompressing its chunks, "
+                    "printing JSON.")
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processes reading chunks (default: none)")
+    args = parser.parse_args(argv)
+
+    stats = copy_file(args.source, args.destination, workers=args.workers)
+    json.dump(stats, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Plan chunk-aligned I/O for complex selections.
+
+h5ex_d_hyper and h5ex_d_chunk build their selections by selecting a set of
+blocks with SELECT_SET and then carving pieces out of them with
+SELECT_NOTB.  HDF5 carries out such a selection by walking it piece by piece
+inside every chunk it touches.  The planner here instead sorts the chunks a
+selection touches into
+
+    full       chunks the selection covers entirely, transferred whole
+    partial    chunks it covers in part, handled as one read of the chunk
+               plus a masked copy (and, for writes, one write back), i.e.
+               a read-modify-write
+
+and orders each group by the chunks' addresses in the file.  A selection may
+be given as a dataspace (an h5py.h5s.SpaceID with any hyperslab, point, all
+or none selection) or as a boolean mask the shape of the dataset.
+
+    >>> from hdf5examples.tools import selplan
+    >>> p = selplan.plan(dset, space)
+    >>> p.summary()['amplification']
+    >>> rdata = np.zeros(dset.shape, dtype=dset.dtype)
+    >>> selplan.read(dset, p, rdata)
+
+As with dset.read(h5py.h5s.ALL, space, rdata) in the examples, read() and
+write() take arrays the shape of the dataset and only touch the selected
+elements of them.
+"""
+import numpy as np
+import h5py
+
+from hdf5examples.tools import bufpool
+
+
+class Plan(object):
+    """
+    The chunk-aligned operations for one selection of one dataset.
+
+    full is a list of (chunk offset, slices) and partial a list of
+    (chunk offset, slices, mask), each sorted by the chunk's address in the
+    file, with unallocated chunks last.  The slices cover the chunk clipped
+    to the dataset extent, and the mask has the shape of that region.
+    """
+
+    def __init__(self, shape, chunks, itemsize, full, partial, nselected):
+        self.shape = shape
+        self.chunks = chunks
+        self.itemsize = itemsize
+        self.full = full
+        self.partial = partial
+        self.nselected = nselected
+
+    def summary(self):
+        """
+        Return a dict comparing the bytes the plan touches with the bytes
+        selected.  Each chunk is counted once, although a partial chunk is
+        both read and written by write().
+        """
+        def volume(sel):
+            return int(np.prod([s.stop - s.start for s in sel]))
+        full = sum(volume(sel) for _, sel in self.full)
+        partial = sum(volume(sel) for _, sel, _ in self.partial)
+        selected = self.nselected * self.itemsize
+        touched = (full + partial) * self.itemsize
+        return {'full_chunks': len(self.full),
+                'partial_chunks': len(self.partial),
+                'bytes_selected': selected,
+                'bytes_touched': touched,
+                'amplification': (float(touched) / selected
+                                  if selected else 0.0)}
+
+
+def _chunk_sel(index, chunks, shape):
+    return tuple(slice(int(i) * c, min((int(i) + 1) * c, n))
+                 for i, c, n in zip(index, chunks, shape))
+
+
+def _blocks(space):
+    # The selection as disjoint blocks, (starts, stops) with exclusive
+    # stops.
+    rank = space.get_simple_extent_ndims()
+    dims = space.get_simple_extent_dims()
+    kind = space.get_select_type()
+    if kind == h5py.h5s.SEL_NONE:
+        empty = np.zeros((0, rank), dtype=np.int64)
+        return empty, empty
+    if kind == h5py.h5s.SEL_ALL:
+        return (np.zeros((1, rank), dtype=np.int64),
+                np.array([dims], dtype=np.int64))
+    if kind == h5py.h5s.SEL_POINTS:
+        points = np.asarray(space.get_select_elem_pointlist(),
+                            dtype=np.int64).reshape(-1, rank)
+        # A point may be listed more than once, but must count once.
+        points = np.unique(points, axis=0)
+        return points, points + 1
+    blocks = np.asarray(space.get_select_hyper_blocklist(), dtype=np.int64)
+    blocks = blocks.reshape(-1, 2, rank)
+    return blocks[:, 0], blocks[:, 1] + 1
+
+
+def _from_mask(mask, chunks):
+    # Count the selected elements in each chunk by padding the mask out to
+    # whole chunks and summing within them.
+    shape = mask.shape
+    grid = tuple(-(-n // c) for n, c in zip(shape, chunks))
+    padded = np.zeros(tuple(g * c for g, c in zip(grid, chunks)), dtype=bool)
+    padded[tuple(slice(0, n) for n in shape)] = mask
+    split = []
+    for g, c in zip(grid, chunks):
+        split += [g, c]
+    counts = padded.reshape(split).sum(axis=tuple(range(1, 2 * len(shape),
+                                                        2)))
+    nselected = int(counts.sum())
+
+    full, partial = [], []
+    for index in zip(*np.nonzero(counts)):
+        sel = _chunk_sel(index, chunks, shape)
+        volume = int(np.prod([s.stop - s.start for s in sel]))
+        if counts[index] == volume:
+            full.append(sel)
+        else:
+            partial.append((sel, mask[sel]))
+    return full, partial, nselected
+
+
+def _split(starts, stops, chunks):
+    # Split the blocks at chunk boundaries, one axis at a time, until every
+    # piece lies within a single chunk.
+    for axis, c in enumerate(chunks):
+        heads, tails = [], []
+        while len(starts):
+            boundary = (starts[:, axis] // c + 1) * c
+            cross = stops[:, axis] > boundary
+            head = stops.copy()
+            head[cross, axis] = boundary[cross]
+            heads.append(starts)
+            tails.append(head)
+            starts = starts[cross].copy()
+            starts[:, axis] = boundary[cross]
+            stops = stops[cross]
+        if heads:
+            starts = np.concatenate(heads)
+            stops = np.concatenate(tails)
+    return starts, stops
+
+
+def _from_space(space, chunks):
+    shape = space.get_simple_extent_dims()
+    starts, stops = _split(*(_blocks(space) + (chunks,)))
+    volumes = np.prod(stops - starts, axis=1)
+    nselected = int(volumes.sum())
+    if nselected == 0:
+        return [], [], 0
+
+    # Selected elements per chunk.
+    grid = tuple(-(-n // c) for n, c in zip(shape, chunks))
+    index = starts // np.array(chunks)
+    linear = np.ravel_multi_index(tuple(index.T), grid)
+    order = np.argsort(linear, kind='stable')
+    linear, starts, stops = linear[order], starts[order], stops[order]
+    touched, first, npieces = np.unique(linear, return_index=True,
+                                        return_counts=True)
+    counts = np.add.reduceat(volumes[order], first)
+
+    full, partial = [], []
+    for lin, k0, n, count in zip(touched, first, npieces, counts):
+        sel = _chunk_sel(np.unravel_index(lin, grid), chunks, shape)
+        volume = int(np.prod([s.stop - s.start for s in sel]))
+        if count == volume:
+            full.append(sel)
+            continue
+        origin = np.array([s.start for s in sel])
+        mask = np.zeros(tuple(s.stop - s.start for s in sel), dtype=bool)
+        for lo, hi in zip(starts[k0:k0 + n] - origin,
+                          stops[k0:k0 + n] - origin):
+            mask[tuple(slice(a, b) for a, b in zip(lo, hi))] = True
+        partial.append((sel, mask))
+    return full, partial, nselected
+
+
+def _address(dsid, offset):
+    # Chunks that were never written have no address; put them last.
+    info = dsid.get_chunk_info_by_coord(offset)
+    if info.byte_offset is None:
+        return (1, 0)
+    return (0, info.byte_offset)
+
+
+def plan(dset, selection):
+    """
+    Plan the I/O for a selection of a chunked dataset.
+
+    The selection is an h5py.h5s.SpaceID with the dataset's extent, or a
+    boolean array of the dataset's shape.  Returns a Plan.
+    """
+    if dset.chunks is None:
+        raise ValueError("Dataset {0} is not chunked.".format(dset.name))
+    chunks = dset.chunks
+    shape = dset.shape
+
+    if isinstance(selection, h5py.h5s.SpaceID):
+        if selection.get_simple_extent_dims() != shape:
+            msg = "Selection extent {0} does not match dataset shape {1}."
+            raise ValueError(msg.format(selection.get_simple_extent_dims(),
+                                        shape))
+        full, partial, nselected = _from_space(selection, chunks)
+    else:
+        mask = np.asarray(selection, dtype=bool)
+        if mask.shape != shape:
+            msg = "Mask shape {0} does not match dataset shape {1}."
+            raise ValueError(msg.format(mask.shape, shape))
+        full, partial, nselected = _from_mask(mask, chunks)
+
+    dsid = dset.id
+    full = [(tuple(s.start for s in sel), sel) for sel in full]
+    partial = [(tuple(s.start for s in sel), sel, mask)
+               for sel, mask in partial]
+    full.sort(key=lambda op: _address(dsid, op[0]))
+    partial.sort(key=lambda op: _address(dsid, op[0]))
+    return Plan(shape, chunks, dset.dtype.itemsize, full, partial, nselected)
+
+
+def read(dset, p, out, pool=None):
+    """
+    Read the selected elements of dset into the same positions of out, an
+    array of the dataset's shape, following plan p.  The partial chunks
+    are read into buffers from pool (a bufpool.BufferPool) if one is given.
+    """
+    if pool is None:
+        pool = bufpool.BufferPool()
+    dtype = dset.dtype
+    for offset, sel in p.full:
+        dset.read_direct(out, sel, sel)
+    for offset, sel, mask in p.partial:
+        with pool.borrow(mask.shape, dtype) as buf:
+            dset.read_direct(buf, sel)
+            np.copyto(out[sel], buf, where=mask)
+    return out
+
+
+def write(dset, p, data, pool=None):
+    """
+    Write the selected elements of data, an array of the dataset's shape,
+    to the same positions of dset, following plan p.  The pool is as for
+    read().
+    """
+    if pool is None:
+        pool = bufpool.BufferPool()
+    data = np.asarray(data)
+    dtype = dset.dtype
+    for offset, sel in p.full:
+        dset.write_direct(np.ascontiguousarray(data[sel], dtype=dtype),
+                          dest_sel=sel)
+    for offset, sel, mask in p.partial:
+        with pool.borrow(mask.shape, dtype) as buf:
+            dset.read_direct(buf, sel)
+            np.copyto(buf, data[sel], where=mask, casting='unsafe')
+            dset.write_direct(buf, dest_sel=sel)
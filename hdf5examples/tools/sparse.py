@@ -0,0 +1,330 @@
+"""
+Write mostly-empty arrays without storing their empty chunks.
+
+h5ex_d_fillvalue and h5ex_d_alloc show that a chunked dataset reads as its
+fill value wherever nothing has been written, and that with incremental
+allocation (the default for chunked datasets) a chunk only takes space in
+the file once something is written to it.  Yet they, like most writers,
+write the whole array, so a detector frame that is almost all zeros is
+stored, and compressed, in full.
+
+write() finds the chunks whose every element equals the fill value, with
+one vectorized comparison and a reduction per axis, and writes only the
+others.  The skipped chunks are never allocated and cost neither space nor
+time; they read back as the fill value.  Chunks that are written are
+written whole, so the library never has to fill part of a chunk first.
+
+Reading is the mirror image.  The library looks every chunk up in the
+chunk index, stored or not, so reading a sparse dataset costs time in
+proportion to its full size.  read() lists the stored chunks once, sets
+the output to the fill value in one step, and reads only those chunks.
+
+    >>> from hdf5examples.tools import sparse
+    >>> with h5py.File('frames.h5', 'w') as f:
+    ...     dset, stats = sparse.create_dataset(f, 'frames', frames,
+    ...                                         chunks=(1, 128, 128),
+    ...                                         compression='gzip')
+    >>> stats['storage_before'], stats['storage_after']
+    >>> with h5py.File('frames.h5', 'r') as f:
+    ...     frames = sparse.read(f['frames'])
+
+Run the module to compare against writing and reading everything:
+
+    $ python -m hdf5examples.tools.sparse --shape 8x1024x1024 \
+          --chunks 1x128x128 --density 0.01 --density 0.1
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import chunkio
+
+DENSITIES = [0.0, 0.01, 0.1, 0.5, 1.0]
+
+
+def fill_mask(data, chunks, fillvalue=0):
+    """
+    Return a boolean array with one element per chunk of data, True where
+    every element of the chunk equals fillvalue.  A NaN fill value matches
+    NaNs.
+    """
+    data = np.asarray(data)
+    fillvalue = np.asarray(fillvalue, dtype=data.dtype)
+    if data.dtype.kind in 'fc' and np.isnan(fillvalue):
+        mask = np.isnan(data)
+    else:
+        mask = data == fillvalue
+    # Reducing the last axis first is much the fastest.
+    for axis in reversed(range(data.ndim)):
+        starts = np.arange(0, data.shape[axis], chunks[axis])
+        mask = np.logical_and.reduceat(mask, starts, axis=axis)
+    return mask
+
+
+def write(dset, data):
+    """
+    Write data, an array the shape of the dataset, to a chunked dataset,
+    skipping the chunks that hold nothing but the dataset's fill value.
+
+    A skipped chunk that is already stored (from an earlier write) is
+    written anyway, since leaving it would keep the old values.  Returns a
+    dict with the number of chunks, how many were written and skipped, and
+    the dataset's storage size before and after.
+    """
+    if dset.chunks is None:
+        raise ValueError("Dataset {0} is not chunked.".format(dset.name))
+    if tuple(data.shape) != dset.shape:
+        msg = "Data has shape {0}, dataset {1} has shape {2}."
+        raise ValueError(msg.format(data.shape, dset.name, dset.shape))
+
+    dsid = dset.id
+    chunks = dset.chunks
+    data = np.ascontiguousarray(data, dtype=dset.dtype)
+    before = dsid.get_storage_size()
+    stored = set(info.chunk_offset for info in chunkio._chunk_info(dsid)) \
+        if before else set()
+
+    empty = fill_mask(data, chunks, dset.fillvalue)
+    written = 0
+    if not empty.any():
+        # Nothing to skip, so write it all at once.
+        dset.write_direct(data)
+        written = empty.size
+    else:
+        fspace = dsid.get_space()
+        mspace = h5py.h5s.create_simple(data.shape)
+        for index in itertools.product(*[range(g) for g in empty.shape]):
+            offset = tuple(i * c for i, c in zip(index, chunks))
+            if empty[index] and offset not in stored:
+                continue
+            count = tuple(min(c, n - o)
+                          for o, c, n in zip(offset, chunks, dset.shape))
+            fspace.select_hyperslab(offset, count)
+            mspace.select_hyperslab(offset, count)
+            dsid.write(mspace, fspace, data)
+            written += 1
+    return {'chunks': empty.size,
+            'written': written,
+            'skipped': empty.size - written,
+            'storage_before': before,
+            'storage_after': dsid.get_storage_size()}
+
+
+def create_dataset(group, name, data, chunks, fillvalue=None,
+                   fill_time='ifset', **kwargs):
+    """
+    Create a chunked dataset with incremental allocation and write data
+    to it with write(), returning the dataset and write()'s dict.
+
+    The fill value defaults to zero.  fill_time may be 'never' to stop the
+    library ever writing fill values, but note that the library then reads
+    unwritten chunks as undefined values rather than the fill value; only
+    readers that fill them in themselves should read such a dataset.  Other
+    keyword arguments are passed on to create_dataset.
+    """
+    dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+    dcpl.set_alloc_time(h5py.h5d.ALLOC_TIME_INCR)
+    dset = group.create_dataset(name, data.shape, dtype=data.dtype,
+                                chunks=tuple(chunks), fillvalue=fillvalue,
+                                fill_time=fill_time, dcpl=dcpl, **kwargs)
+    return dset, write(dset, data)
+
+
+def _region(sel, shape):
+    # The (start, stop) of each axis of a selection made of slices.
+    if sel is None:
+        sel = ()
+    elif not isinstance(sel, tuple):
+        sel = (sel,)
+    sel = sel + (slice(None),) * (len(shape) - len(sel))
+    region = []
+    for s, n in zip(sel, shape):
+        if not isinstance(s, slice) or s.step not in (None, 1):
+            raise ValueError("Selections must be slices with unit step.")
+        start, stop, _ = s.indices(n)
+        region.append((start, max(start, stop)))
+    return region
+
+
+def read(dset, sel=None, out=None):
+    """
+    Read a chunked dataset, or the part of it selected by sel (a slice or
+    tuple of slices), touching only the chunks that are stored.
+
+    The stored chunks are listed with one pass over the chunk index, the
+    output is set to the fill value in one step (unless the stored chunks
+    cover it), and each stored chunk overlapping the selection is read.
+    Unwritten chunks thus read as the fill value even in datasets created
+    with fill_time='never'.  The result goes into out if given, which must
+    have the selection's shape.
+    """
+    region = _region(sel, dset.shape)
+    shape = tuple(stop - start for start, stop in region)
+    if out is None:
+        out = np.empty(shape, dtype=dset.dtype)
+    elif tuple(out.shape) != shape:
+        msg = "Output array has shape {0}, the selection has shape {1}."
+        raise ValueError(msg.format(out.shape, shape))
+    if dset.chunks is None:
+        if out.size:
+            dset.read_direct(out, tuple(slice(a, b) for a, b in region))
+        return out
+
+    chunks = dset.chunks
+    boxes = []
+    for info in chunkio._chunk_info(dset.id):
+        box = [(max(o, a), min(o + c, b))
+               for o, c, (a, b) in zip(info.chunk_offset, chunks, region)]
+        if all(lo < hi for lo, hi in box):
+            boxes.append(box)
+
+    # The chunks the selection overlaps.
+    nchunks = 1
+    for c, (a, b) in zip(chunks, region):
+        nchunks *= (b - 1) // c - a // c + 1 if b > a else 0
+    if len(boxes) == nchunks:
+        # Nothing to fill in, so let the library read it all at once.
+        if out.size:
+            dset.read_direct(out, tuple(slice(a, b) for a, b in region))
+        return out
+    # The low-level read needs a C-contiguous buffer; a strided out gets a
+    # filled scratch array that is copied back at the end.
+    if out.flags.c_contiguous:
+        buf = out
+        buf[...] = dset.fillvalue
+    else:
+        buf = np.full(shape, dset.fillvalue, dtype=out.dtype)
+    # The low-level calls, reusing the dataspaces, cost a good deal less
+    # per chunk than read_direct.
+    dsid = dset.id
+    fspace = dsid.get_space()
+    mspace = h5py.h5s.create_simple(shape)
+    for box in boxes:
+        count = tuple(hi - lo for lo, hi in box)
+        fspace.select_hyperslab(tuple(lo for lo, hi in box), count)
+        mspace.select_hyperslab(tuple(lo - a for (lo, hi), (a, b)
+                                      in zip(box, region)), count)
+        dsid.read(mspace, fspace, buf)
+    if buf is not out:
+        out[...] = buf
+    return out
+
+
+def make_data(shape, chunks, density, dtype='<i4', seed=0):
+    """
+    Return an array of zeros in which a random fraction density of the
+    chunks hold random values.
+    """
+    rs = np.random.RandomState(seed)
+    grid = tuple(-(-n // c) for n, c in zip(shape, chunks))
+    occupied = rs.random_sample(grid) < density
+    for axis, c in enumerate(chunks):
+        occupied = np.repeat(occupied, c, axis=axis)
+    occupied = occupied[tuple(slice(0, n) for n in shape)]
+    values = rs.randint(1, 1000, size=shape).astype(dtype)
+    return np.where(occupied, values, np.zeros((), dtype=dtype))
+
+
+def benchmark(shape=(8, 1024, 1024), chunks=(1, 128, 128),
+              densities=DENSITIES, dtype='<i4', compression=None,
+              directory=None):
+    """
+    For each density, write an array with that fraction of chunks occupied
+    to a new file, first whole ('dense') and then with write() ('sparse'),
+    and read it back, both through the library and with read().
+
+    Returns a record for each with the seconds taken to write and to read
+    both ways, the chunks written, and the dataset's storage size and the
+    file's size.
+    """
+    shape = tuple(shape)
+    chunks = tuple(chunks)
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        for density in densities:
+            data = make_data(shape, chunks, density, dtype)
+            for method in ['dense', 'sparse']:
+                filename = os.path.join(tmpdir, method + '.h5')
+                t0 = time.perf_counter()
+                with h5py.File(filename, 'w') as f:
+                    if method == 'dense':
+                        dset = f.create_dataset('DS1', data=data,
+                                                chunks=chunks,
+                                                compression=compression)
+                        written = dset.id.get_num_chunks()
+                    else:
+                        dset, stats = create_dataset(f, 'DS1', data, chunks,
+                                                     compression=compression)
+                        written = stats['written']
+                    storage = dset.id.get_storage_size()
+                write_s = time.perf_counter() - t0
+
+                timings = {}
+                rdata = np.empty(shape, dtype=dtype)
+                for reader in ['library', 'sparse']:
+                    with h5py.File(filename, 'r') as f:
+                        t0 = time.perf_counter()
+                        if reader == 'library':
+                            f['DS1'].read_direct(rdata)
+                        else:
+                            read(f['DS1'], out=rdata)
+                        timings[reader] = time.perf_counter() - t0
+                    if not np.array_equal(rdata, data):
+                        raise RuntimeError("Data read back does not match.")
+
+                records.append({'method': method,
+                                'density': density,
+                                'shape': list(shape),
+                                'chunks': list(chunks),
+                                'compression': compression,
+                                'write_s': write_s,
+                                'library_read_s': timings['library'],
+                                'sparse_read_s': timings['sparse'],
+                                'chunks_written': written,
+                                'storage_bytes': storage,
+                                'file_bytes': os.path.getsize(filename)})
+                os.unlink(filename)
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def _shape(s):
+    return tuple(int(x) for x in s.split('x'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare sparse and dense writes, printing JSON.")
+    parser.add_argument('--shape', type=_shape, default=(8, 1024, 1024),
+                        help="dataset shape, e.g. 8x1024x1024")
+    parser.add_argument('--chunks', type=_shape, default=(1, 128, 128),
+                        help="chunk shape, e.g. 1x128x128")
+    parser.add_argument('--density', type=float, action='append',
+                        help="fraction of chunks occupied, may be repeated")
+    parser.add_argument('--dtype', default='<i4')
+    parser.add_argument('--compression', default=None,
+                        help="e.g. gzip or lzf")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(shape=args.shape, chunks=args.chunks,
+                        densities=args.density or DENSITIES,
+                        dtype=args.dtype, compression=args.compression,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Tables of records stored either as one compound dataset or column by column.
+
+h5ex_t_cmpd stores records of Serial number, Location (a variable-length
+string), Temperature and Pressure as one compound dataset, so each record's
+fields sit side by side in the file.  That suits reading whole records, but
+a scan of Temperature alone still reads (and, if compressed, decompresses)
+every byte of every record.
+
+A Table stores the same records either way
+
+    compound    one compound dataset, as in h5ex_t_cmpd
+    columnar    a group holding one dataset per field, each compressible
+                and readable on its own, with the field order kept in the
+                group's 'fields' attribute
+
+and reads them back as a NumPy structured array either way, so callers need
+not know which layout a file uses.  Both layouts are chunked along the rows
+with an unlimited first dimension, and can be appended to.
+
+    >>> from hdf5examples.tools import table
+    >>> t = table.Table.create(f, 'DS1', wdata.dtype, layout='columnar')
+    >>> t.append(wdata)
+    >>> t.column('Temperature')
+    >>> t.read(fields=['Serial number', 'Pressure'])
+
+Run the module to compare the layouts:
+
+    $ python -m hdf5examples.tools.table --rows 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import h5py
+
+LAYOUTS = ('compound', 'columnar')
+
+# The group attributes marking a columnar table and listing its fields.
+LAYOUT_ATTR = 'layout'
+FIELDS_ATTR = 'fields'
+
+CHUNK_ROWS = 4096
+
+
+class Table(object):
+    """
+    A table of records backed by a compound dataset or by a group with one
+    dataset per field.  Open an existing table with Table(obj), where obj
+    is the dataset or group, or make a new one with Table.create().
+    """
+
+    def __init__(self, obj):
+        if isinstance(obj, h5py.Dataset):
+            if obj.dtype.names is None:
+                msg = "Dataset {0} does not have a compound type."
+                raise ValueError(msg.format(obj.name))
+            self.layout = 'compound'
+            self.names = list(obj.dtype.names)
+            self.dtype = obj.dtype
+        elif obj.attrs.get(LAYOUT_ATTR) == 'columnar':
+            self.layout = 'columnar'
+            self.names = [_str(name) for name in obj.attrs[FIELDS_ATTR]]
+            self.dtype = np.dtype([(name, obj[name].dtype)
+                                   for name in self.names])
+        else:
+            msg = "Group {0} is not a columnar table."
+            raise ValueError(msg.format(obj.name))
+        self.obj = obj
+
+    @classmethod
+    def create(cls, group, name, dtype, layout='columnar',
+               chunk_rows=CHUNK_ROWS, **kwargs):
+        """
+        Create an empty table of records of the compound dtype in group.
+        Other keyword arguments (e.g. compression) go to create_dataset,
+        for every column of a columnar table.
+        """
+        dtype = np.dtype(dtype)
+        if dtype.names is None:
+            raise ValueError("The dtype must have fields.")
+        if layout == 'compound':
+            obj = group.create_dataset(name, (0,), dtype=dtype,
+                                       maxshape=(None,),
+                                       chunks=(chunk_rows,), **kwargs)
+        elif layout == 'columnar':
+            obj = group.create_group(name)
+            obj.attrs[LAYOUT_ATTR] = 'columnar'
+            obj.attrs[FIELDS_ATTR] = [n.encode('utf-8') for n in dtype.names]
+            for field in dtype.names:
+                obj.create_dataset(field, (0,), dtype=dtype.fields[field][0],
+                                   maxshape=(None,), chunks=(chunk_rows,),
+                                   **kwargs)
+        else:
+            msg = "Unknown layout '{0}', choose from {1}."
+            raise ValueError(msg.format(layout, LAYOUTS))
+        return cls(obj)
+
+    def __len__(self):
+        if self.layout == 'compound':
+            return self.obj.shape[0]
+        return self.obj[self.names[0]].shape[0]
+
+    def append(self, rows):
+        """
+        Append a structured array (or anything convertible to one) of
+        records with the table's fields.
+        """
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1)
+        n = len(self)
+        if self.layout == 'compound':
+            self.obj.resize(n + len(rows), axis=0)
+            self.obj[n:] = rows
+            return
+        for name in self.names:
+            dset = self.obj[name]
+            dset.resize(n + len(rows), axis=0)
+            dset[n:] = rows[name]
+
+    def column(self, name, sel=slice(None)):
+        """
+        Return the rows sel (a slice or index array) of one field as a
+        plain array.
+        """
+        if name not in self.names:
+            msg = "Table {0} has no field '{1}'."
+            raise ValueError(msg.format(self.obj.name, name))
+        if self.layout == 'compound':
+            return self.obj.fields(name)[sel]
+        return self.obj[name][sel]
+
+    def read(self, sel=slice(None), fields=None):
+        """
+        Return the rows sel (a slice, index array or integer) as a
+        structured array, or one record for an integer, with all fields or
+        only those listed.
+        """
+        fields = list(fields or self.names)
+        for name in fields:
+            if name not in self.names:
+                msg = "Table {0} has no field '{1}'."
+                raise ValueError(msg.format(self.obj.name, name))
+        if self.layout == 'compound':
+            if fields == self.names:
+                return self.obj[sel]
+            return self.obj.fields(fields)[sel]
+        columns = [self.obj[name][sel] for name in fields]
+        out = np.empty(np.shape(columns[0]),
+                       dtype=[(name, self.dtype.fields[name][0])
+                              for name in fields])
+        for name, column in zip(fields, columns):
+            out[name] = column
+        # An integer sel gives one record, as the compound layout does.
+        return out[()] if out.ndim == 0 else out
+
+
+def _str(name):
+    return name.decode('utf-8') if isinstance(name, bytes) else name
+
+
+def make_records(nrows, seed=0):
+    """
+    Return nrows records like those of h5ex_t_cmpd, with locations drawn
+    from its four and random temperatures and pressures.
+    """
+    dtype = np.dtype([("Serial number", np.int32),
+                      ("Location", h5py.string_dtype()),
+                      ("Temperature", np.float64),
+                      ("Pressure", np.float64)])
+    locations = np.array(["Exterior (static)", "Intake", "Intake manifold",
+                          "Exhaust manifold"], dtype=object)
+    rs = np.random.RandomState(seed)
+    rows = np.empty(nrows, dtype=dtype)
+    rows['Serial number'] = np.arange(nrows) + 1000
+    rows['Location'] = locations[rs.randint(0, 4, nrows)]
+    rows['Temperature'] = rs.uniform(50, 1300, nrows)
+    rows['Pressure'] = rs.uniform(20, 90, nrows)
+    return rows
+
+
+def benchmark(nrows=1000000, batch=10000, chunk_rows=CHUNK_ROWS,
+              compression=None, field='Temperature', directory=None):
+    """
+    For each layout, append nrows records in batches, then time a scan of
+    one field and a read of every full row, returning a record for each
+    with the seconds taken and the file size.
+    """
+    rows = make_records(nrows)
+    tmpdir = tempfile.mkdtemp(dir=directory)
+    records = []
+    try:
+        for layout in LAYOUTS:
+            filename = os.path.join(tmpdir, layout + '.h5')
+            t0 = time.perf_counter()
+            with h5py.File(filename, 'w') as f:
+                t = Table.create(f, 'DS1', rows.dtype, layout=layout,
+                                 chunk_rows=chunk_rows,
+                                 compression=compression)
+                for k in range(0, nrows, batch):
+                    t.append(rows[k:k + batch])
+            append_s = time.perf_counter() - t0
+
+            with h5py.File(filename, 'r') as f:
+                t = Table(f['DS1'])
+                t0 = time.perf_counter()
+                column = t.column(field)
+                scan_s = time.perf_counter() - t0
+            with h5py.File(filename, 'r') as f:
+                t = Table(f['DS1'])
+                t0 = time.perf_counter()
+                rdata = t.read()
+                read_s = time.perf_counter() - t0
+            if not (np.array_equal(column, rows[field]) and
+                    np.array_equal(rdata['Serial number'],
+                                   rows['Serial number'])):
+                raise RuntimeError("Data read back does not match.")
+
+            records.append({'layout': layout,
+                            'rows': nrows,
+                            'batch': batch,
+                            'compression': compression,
+                            'append_s': append_s,
+                            'scan_s': scan_s,
+                            'read_s': read_s,
+                            'file_bytes': os.path.getsize(filename)})
+    finally:
+        shutil.rmtree(tmpdir)
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare compound and columnar tables, printing JSON.")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=10000,
+                        help="rows per append")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--compression', default=None,
+                        help="e.g. gzip or lzf")
+    parser.add_argument('--directory', default=None,
+                        help="where to write the scratch files")
+    args = parser.parse_args(argv)
+
+    records = benchmark(nrows=args.rows, batch=args.batch,
+                        chunk_rows=args.chunk_rows,
+                        compression=args.compression,
+                        directory=args.directory)
+    json.dump(records, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == "__main__":
+    main()
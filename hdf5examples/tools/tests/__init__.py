@@ -0,0 +1,21 @@
+from .test_all import TestDatagen as datagen
+from .test_all import TestFilterbench as filterbench
+from .test_all import TestChunktune as chunktune
+from .test_all import TestCachebench as cachebench
+from .test_all import TestChunkio as chunkio
+from .test_all import TestAppender as appender
+from .test_all import TestSelplan as selplan
+from .test_all import TestPoints as points
+from .test_all import TestRawcopy as rawcopy
+from .test_all import TestBufpool as bufpool
+from .test_all import TestMemmap as memmap
+from .test_all import TestLayout as layout
+from .test_all import TestSparse as sparse
+from .test_all import TestTable as table
+from .test_all import TestRagged as ragged
+from .test_all import TestEnums as enums
+from .test_all import TestObjrefs as objrefs
+from .test_all import TestOpaque as opaque
+from .test_all import TestBulkattrs as bulkattrs
+from .test_all import TestCatalog as catalog
+from .test_all import TestCrawler as crawler
@@ -0,0 +1,2041 @@
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import unittest.mock
+if sys.hexversion < 0x03000000:
+    from StringIO import StringIO
+else:
+    from io import StringIO
+
+import numpy as np
+import h5py
+
+from hdf5examples.tools import (appender, bufpool, bulkattrs, cachebench,
+                                catalog, chunkio, chunktune, crawler,
+                                datagen, enums, filterbench, layout, memmap,
+                                objrefs, opaque, points, ragged, rawcopy,
+                                selplan, sparse, table)
+
+
+class TestDatagen(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_matches_loops(self):
+        # Each pattern must reproduce the nested loop it replaces.
+        exprs = {'product': lambda i, j: i * j - j,
+                 'outer': lambda i, j: i * j,
+                 'quotient': lambda i, j: i / (j + 0.5) + j,
+                 'sum': lambda i, j: i + j,
+                 'column': lambda i, j: j}
+        for pattern, expr in exprs.items():
+            for dtype in ['<i4', '>i8', '<f8']:
+                expected = np.zeros((5, 7), dtype=dtype)
+                for i in range(5):
+                    for j in range(7):
+                        expected[i][j] = expr(i, j)
+                actual = datagen.generate((5, 7), pattern, dtype=dtype)
+                self.assertEqual(actual.dtype, np.dtype(dtype))
+                np.testing.assert_array_equal(actual, expected)
+
+    def test_modulo(self):
+        actual = datagen.generate((4, 7), 'outer', modulo=4)
+        expected = np.zeros((4, 7), dtype=np.int32)
+        for i in range(4):
+            for j in range(7):
+                expected[i][j] = ((i + 1) * j - j) % 4
+        np.testing.assert_array_equal(actual, expected)
+
+    def test_bad_pattern(self):
+        with self.assertRaises(ValueError):
+            datagen.generate((4, 7), 'nonesuch')
+
+    def test_bad_out(self):
+        with self.assertRaises(ValueError):
+            datagen.generate((4, 7), out=np.empty((7, 4), dtype=np.int32))
+
+    def test_blocks_cover_dataset(self):
+        # Blocks assembled by their selections must equal a single call.
+        shape, chunks = (100, 90), (16, 20)
+        expected = datagen.generate(shape, 'product')
+        actual = np.zeros(shape, dtype=np.int32)
+        nblocks = 0
+        for sel, block in datagen.iter_blocks(shape, chunks, 'product',
+                                              max_bytes=16 * 20 * 4 * 3):
+            for s, c in zip(sel, chunks):
+                self.assertEqual(s.start % c, 0)
+            actual[sel] = block
+            nblocks += 1
+        np.testing.assert_array_equal(actual, expected)
+        self.assertTrue(nblocks > 1)
+
+    def test_block_shape(self):
+        # A small limit still gets one whole chunk.
+        self.assertEqual(datagen.block_shape((100, 90), (16, 20), 4, 1),
+                         (16, 20))
+        # Plenty of room gets whole rows of chunks.
+        self.assertEqual(datagen.block_shape((100, 90), (16, 20), 4),
+                         (112, 100))
+
+    def test_fill(self):
+        filename = os.path.join(self.tmpdir, 'fill.h5')
+        with h5py.File(filename, 'w') as f:
+            dset = f.create_dataset('DS1', (50, 33), chunks=(8, 8),
+                                    dtype='<f8')
+            datagen.fill(dset, 'quotient', max_bytes=1024)
+            contig = f.create_dataset('DS2', (50, 33), dtype='<i4')
+            datagen.fill(contig, 'sum', max_bytes=1024)
+            # Empty datasets, as an unlimited one starts, get no blocks.
+            empty = f.create_dataset('DS3', (0, 33), maxshape=(None, 33),
+                                     chunks=(8, 8), dtype='<i4')
+            datagen.fill(empty)
+            datagen.fill(f.create_dataset('DS4', (5, 0), dtype='<i4'))
+            self.assertEqual(list(datagen.iter_blocks((0, 33), (8, 8))), [])
+        with h5py.File(filename, 'r') as f:
+            np.testing.assert_array_equal(
+                f['DS1'][...], datagen.generate((50, 33), 'quotient',
+                                                dtype='<f8'))
+            np.testing.assert_array_equal(
+                f['DS2'][...], datagen.generate((50, 33), 'sum'))
+
+
+class TestFilterbench(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_pipelines(self):
+        pipes = dict(filterbench.pipelines(szip=False))
+        # none, 9 deflate, lzf, 9 shuffle+deflate, shuffle+lzf, twice over
+        self.assertEqual(len(pipes), 42)
+        self.assertEqual(pipes['shuffle+deflate-4+fletcher32'],
+                         {'shuffle': True, 'compression': 'gzip',
+                          'compression_opts': 4, 'fletcher32': True})
+        self.assertNotIn('szip', pipes)
+        pipes = dict(filterbench.pipelines(levels=[1], fletcher32=(False,),
+                                           szip=True))
+        self.assertEqual(sorted(pipes), ['deflate-1', 'lzf', 'none',
+                                         'shuffle+deflate-1', 'shuffle+lzf',
+                                         'szip'])
+
+    def test_distributions(self):
+        for dtype in ['<i2', '>i4', '<f8']:
+            smooth = filterbench.make_data((64, 64), dtype, 'smooth')
+            self.assertEqual(smooth.dtype, np.dtype(dtype))
+            sparse = filterbench.make_data((64, 64), dtype, 'sparse')
+            self.assertTrue(np.count_nonzero(sparse) <= 41)
+            random = filterbench.make_data((64, 64), dtype, 'random')
+            np.testing.assert_array_equal(
+                random, filterbench.make_data((64, 64), dtype, 'random'))
+        with self.assertRaises(ValueError):
+            filterbench.make_data((64, 64), '<i4', 'lumpy')
+
+    def test_run(self):
+        pipes = filterbench.pipelines(levels=[1], szip=False)
+        records = filterbench.run(shape=(64, 64), chunks=[(16, 16)],
+                                  dtypes=['<i4'], pipes=pipes,
+                                  directory=self.tmpdir)
+        self.assertEqual(len(records), 3 * len(pipes))
+        for record in records:
+            self.assertEqual(record['nbytes'], 64 * 64 * 4)
+            self.assertTrue(record['write_mbps'] > 0)
+            self.assertTrue(record['read_mbps'] > 0)
+        ratios = dict(((r['pipeline'], r['distribution']), r['ratio'])
+                      for r in records)
+        self.assertTrue(ratios[('deflate-1', 'sparse')] > 2)
+        self.assertTrue(ratios[('none', 'smooth')] <= 1)
+        # The scratch directory is cleaned up.
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_main(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            filterbench.main(['--shape', '32x32', '--chunks', '16x16',
+                              '--dtype', '<f4', '--distribution', 'smooth',
+                              '--levels', '6', '--no-fletcher32',
+                              '--directory', self.tmpdir])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        records = json.loads(output)
+        names = set(r['pipeline'] for r in records)
+        self.assertIn('shuffle+deflate-6', names)
+        self.assertFalse(any('fletcher32' in name for name in names))
+
+
+class TestChunktune(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_patterns(self):
+        self.assertEqual(chunktune.rows(4)((10, 6))[-1],
+                         ((8, 0), (1, 1), (1, 1), (2, 6)))
+        self.assertEqual(chunktune.columns(4)((10, 6))[-1],
+                         ((0, 4), (1, 1), (1, 1), (10, 2)))
+        self.assertEqual(chunktune.hyperslab((0, 1), (4, 4), None,
+                                             (2, 3))((6, 8)),
+                         [((0, 1), (4, 4), (2, 2), (2, 3))])
+        for start, _, _, block in chunktune.tiles((3, 3), n=20)((6, 8)):
+            self.assertTrue(start[0] + block[0] <= 6)
+            self.assertTrue(start[1] + block[1] <= 8)
+
+    def test_model(self):
+        # The selection h5ex_d_chunk reads back touches all four of its 4x4
+        # chunks, but only the one chunk of a 6x8 chunk.
+        accesses = chunktune.hyperslab((0, 1), (4, 4), (2, 2),
+                                       (2, 3))((6, 8))
+        m = chunktune.model((6, 8), '<i4', (4, 4), accesses)
+        self.assertEqual(m['chunks_read'], 4)
+        self.assertEqual(m['bytes_read'], 4 * 16 * 4)
+        self.assertEqual(m['bytes_selected'], 4 * 6 * 4)
+        m = chunktune.model((6, 8), '<i4', (6, 8), accesses)
+        self.assertEqual(m['chunks_read'], 1)
+
+        # Row scans over 8-row chunks read each chunk once if the cache
+        # holds a row of chunks (2 MiB here), and eight times if it is
+        # stuck at the 1 MiB default.
+        accesses = chunktune.rows(1)((64, 32768))
+        m = chunktune.model((64, 32768), '<f8', (8, 128), accesses)
+        self.assertEqual(m['chunks_read'], 8 * 256)
+        self.assertEqual(m['rdcc_nbytes'], 2 * 1024 * 1024)
+        m = chunktune.model((64, 32768), '<f8', (8, 128), accesses,
+                            max_cache=0)
+        self.assertEqual(m['chunks_read'], 64 * 256)
+
+    def test_candidates(self):
+        lst = chunktune.candidates((6, 8), '<i4', min_bytes=1)
+        self.assertIn((3, 4), lst)
+        self.assertIn((6, 8), lst)
+        self.assertNotIn((4, 3), lst)
+        lst = chunktune.candidates((1000, 1000), '<f8')
+        for chunks in lst:
+            nbytes = chunks[0] * chunks[1] * 8
+            self.assertTrue(8 * 1024 <= nbytes <= 4 * 1024 * 1024)
+
+    def test_cache_settings(self):
+        nslots, nbytes, w0 = chunktune.cache_settings((64, 64), '<f8',
+                                                      4 * 1024 * 1024)
+        # 128 chunks fit, so about 12800 slots, and a prime number of them.
+        self.assertTrue(nslots >= 12800)
+        self.assertTrue(all(nslots % d for d in range(2, 120)))
+        self.assertEqual(nbytes, 4 * 1024 * 1024)
+
+    def test_tune(self):
+        shape = (256, 512)
+        result = chunktune.tune(shape, '<f8', [chunktune.rows(1)],
+                                verify=2, directory=self.tmpdir)
+        self.assertEqual(result['chunks'][1], 512)
+        self.assertTrue(result['rdcc_nbytes'] >= 1024 * 1024)
+        self.assertIn('measured_seconds', result['candidates'][0])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+        # Whatever is recommended can be handed straight to h5py.
+        filename = os.path.join(self.tmpdir, 'tuned.h5')
+        with h5py.File(filename, 'w', rdcc_nbytes=result['rdcc_nbytes'],
+                       rdcc_nslots=result['rdcc_nslots'],
+                       rdcc_w0=result['rdcc_w0']) as f:
+            f.create_dataset('DS1', shape, dtype='<f8',
+                             chunks=result['chunks'])
+
+        result = chunktune.tune(shape, '<f8', [chunktune.columns(1)],
+                                verify=0)
+        self.assertEqual(result['chunks'][0], 256)
+
+    def test_main(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            chunktune.main(['6x8', '--dtype', '<i4', '--hyperslab',
+                            '0,1/4,4/2,2/2,3', '--verify', '1',
+                            '--directory', self.tmpdir])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        result = json.loads(output)
+        self.assertEqual(result['chunks'], [6, 8])
+
+
+class TestCachebench(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_accesses(self):
+        lst = cachebench.accesses('strided', (10, 6), step=4)
+        self.assertEqual(lst, [((0, 0), (4, 1), (3, 1), (1, 6)),
+                               ((1, 0), (4, 1), (3, 1), (1, 6)),
+                               ((2, 0), (4, 1), (2, 1), (1, 6)),
+                               ((3, 0), (4, 1), (2, 1), (1, 6))])
+        self.assertEqual(len(cachebench.accesses('rows', (10, 6))), 10)
+        with self.assertRaises(ValueError):
+            cachebench.accesses('diagonal', (10, 6))
+
+    def test_decompressions(self):
+        # 8x4 chunks of 8x16.  Without a cache, each of the 64 row reads
+        # decompresses a row of 4 chunks, and each of the 8 strided reads
+        # decompresses all 32.  With a cache, every chunk is decompressed
+        # just once.
+        records = cachebench.run(shape=(64, 64), chunks=(8, 16),
+                                 cache_sizes=[0, 1024 * 1024],
+                                 directory=self.tmpdir)
+        counts = dict(((r['pattern'], r['rdcc_nbytes']), r['decompressions'])
+                      for r in records)
+        self.assertEqual(counts[('rows', 0)], 64 * 4)
+        self.assertEqual(counts[('rows', 1024 * 1024)], 32)
+        self.assertEqual(counts[('strided', 0)], 8 * 32)
+        self.assertEqual(counts[('strided', 1024 * 1024)], 32)
+        for record in records:
+            self.assertEqual(record['chunks_in_dataset'], 32)
+            self.assertTrue(record['median_s'] > 0)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestChunkio(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'chunkio.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fletcher32(self):
+        # Checked against the checksums HDF5 itself appends.
+        self.assertEqual(chunkio.fletcher32(b''), 0)
+        self.assertEqual(chunkio.fletcher32(b'\x01\x02'), 0x01020102)
+        self.assertEqual(chunkio.fletcher32(b'\x01\x02\x03'), 0x05040402)
+        self.assertEqual(chunkio.fletcher32(b'\xff\xff'), 0xffffffff)
+
+    def test_matches_library(self):
+        # The chunks written must be byte for byte what HDF5 would write,
+        # including the padded edge chunks.
+        for dtype in ['<i4', '>f8', 'u1']:
+            data = datagen.generate((101, 67), 'quotient', dtype=dtype)
+            for shuffle, fletcher32 in [(False, False), (True, False),
+                                        (False, True), (True, True)]:
+                with h5py.File(self.filename, 'w') as f:
+                    dset = chunkio.create_dataset(f, 'DS1', data, (32, 16),
+                                                  level=9, shuffle=shuffle,
+                                                  fletcher32=fletcher32,
+                                                  workers=3)
+                    ref = f.create_dataset('DS2', data=data, chunks=(32, 16),
+                                           compression='gzip',
+                                           compression_opts=9,
+                                           shuffle=shuffle,
+                                           fletcher32=fletcher32)
+                    for offset, _ in chunkio.chunk_slices(dset.shape,
+                                                          dset.chunks):
+                        self.assertEqual(dset.id.read_direct_chunk(offset),
+                                         ref.id.read_direct_chunk(offset))
+                with h5py.File(self.filename, 'r') as f:
+                    np.testing.assert_array_equal(f['DS1'][...], data)
+                    np.testing.assert_array_equal(
+                        chunkio.read(f['DS2'], workers=3), data)
+
+    def test_process_pool(self):
+        # Worker processes forked while a file is open for writing inherit
+        # its lock, so use a fresh pool for reading.
+        data = datagen.generate((64, 64), 'product', dtype='<i8')
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            with h5py.File(self.filename, 'w') as f:
+                chunkio.create_dataset(f, 'DS1', data, (16, 48),
+                                       executor=executor, workers=2)
+        with concurrent.futures.ProcessPoolExecutor(2) as executor:
+            with h5py.File(self.filename, 'r') as f:
+                np.testing.assert_array_equal(f['DS1'][...], data)
+                rdata = chunkio.read(f['DS1'], executor=executor, workers=2)
+                np.testing.assert_array_equal(rdata, data)
+
+    def test_read_into(self):
+        # Unwritten chunks read as the fill value, and out may have another
+        # dtype.
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', (64, 64), dtype='<i4',
+                                    chunks=(16, 16), compression='gzip',
+                                    fillvalue=-1)
+            dset[:16, :40] = 7
+            out = np.zeros((64, 64), dtype='<f8')
+            self.assertIs(chunkio.read(dset, out=out), out)
+            np.testing.assert_array_equal(out, dset[...])
+            with self.assertRaises(ValueError):
+                chunkio.read(dset, out=np.zeros((64, 32)))
+
+    def test_filter_mask(self):
+        # A chunk stored with deflate skipped (bit 1 of the mask) must be
+        # decoded without inflating it, as the library does.
+        data = datagen.generate((16, 16), 'product', dtype='<i4')
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', (16, 16), dtype='<i4',
+                                    chunks=(16, 16), compression='gzip',
+                                    shuffle=True)
+            raw = chunkio.encode(data, [(h5py.h5z.FILTER_SHUFFLE, 4)])
+            dset.id.write_direct_chunk((0, 0), raw, filter_mask=2)
+        with h5py.File(self.filename, 'r') as f:
+            np.testing.assert_array_equal(f['DS1'][...], data)
+            np.testing.assert_array_equal(chunkio.read(f['DS1']), data)
+
+    def test_checksum_mismatch(self):
+        data = datagen.generate((16, 16), 'product', dtype='<i4')
+        with h5py.File(self.filename, 'w') as f:
+            dset = chunkio.create_dataset(f, 'DS1', data, (16, 16),
+                                          fletcher32=True)
+            filter_mask, raw = dset.id.read_direct_chunk((0, 0))
+            raw = raw[:-1] + bytes([raw[-1] ^ 0xff])
+            dset.id.write_direct_chunk((0, 0), raw)
+            with self.assertRaises(OSError):
+                chunkio.read(dset)
+            np.testing.assert_array_equal(chunkio.read(dset, verify=False),
+                                          data)
+
+    def test_unsupported_filter(self):
+        # LZF is not handled, so the library does the work.
+        data = datagen.generate((64, 64), 'product')
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', data.shape, dtype=data.dtype,
+                                    chunks=(16, 16), compression='lzf')
+            self.assertIsNone(chunkio.pipeline(dset))
+            chunkio.write(dset, data)
+            np.testing.assert_array_equal(dset[...], data)
+            np.testing.assert_array_equal(chunkio.read(dset), data)
+            dset = f.create_dataset('DS2', data=data)
+            np.testing.assert_array_equal(chunkio.read(dset), data)
+
+    def test_errors(self):
+        data = datagen.generate((64, 64), 'product')
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', data.shape, dtype=data.dtype)
+            with self.assertRaises(ValueError):
+                chunkio.write(dset, data)
+            dset = f.create_dataset('DS2', data.shape, dtype=data.dtype,
+                                    chunks=(16, 16))
+            with self.assertRaises(ValueError):
+                chunkio.write(dset, data[:32])
+
+
+class TestAppender(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'appender.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create(self, f, nrows=0, **kwargs):
+        return f.create_dataset('DS1', (nrows, 7), maxshape=(None, 7),
+                                chunks=(16, 7), dtype='<i4', **kwargs)
+
+    def test_append(self):
+        data = datagen.generate((1000, 7), 'product')
+        with h5py.File(self.filename, 'w') as f:
+            dset = self.create(f, compression='gzip')
+            app = appender.Appender(dset, buffer_rows=64)
+            # Single rows, then blocks of awkward sizes.
+            for k in range(100):
+                app.append(data[k])
+            k = 100
+            for n in [1, 5, 37, 200, 3, 654]:
+                app.append(data[k:k + n])
+                k += n
+                self.assertEqual(len(app), k)
+                # Only whole chunks have been written.
+                self.assertEqual(app.flushed % 16, 0)
+            self.assertTrue(dset.shape[0] >= app.flushed)
+            app.close()
+            self.assertEqual(dset.shape, (1000, 7))
+            np.testing.assert_array_equal(dset[...], data)
+
+    def test_growth(self):
+        data = datagen.generate((1024, 7), 'product')
+        with h5py.File(self.filename, 'w') as f:
+            dset = self.create(f, nrows=16)
+            with appender.Appender(dset, buffer_rows=16) as app:
+                for row in data:
+                    app.append(row)
+            # 16 rows doubled up to 1040 is seven resizes, then the trim.
+            self.assertEqual(app.resizes, 8)
+            self.assertEqual(app.writes, 64)
+            np.testing.assert_array_equal(dset[16:], data)
+
+            dset = f.create_dataset('DS2', (0, 7), maxshape=(None, 7),
+                                    chunks=(16, 7), dtype='<i4')
+            with appender.Appender(dset, growth=1, buffer_rows=32) as app:
+                app.append(data[:100])
+                self.assertEqual(dset.shape[0], 96)
+            self.assertEqual(dset.shape[0], 100)
+
+    def test_unaligned_start(self):
+        # An existing partial chunk is completed before anything else.
+        data = datagen.generate((50, 7), 'sum')
+        with h5py.File(self.filename, 'w') as f:
+            dset = self.create(f)
+            dset.resize(5, axis=0)
+            dset[...] = data[:5]
+            with appender.Appender(dset, buffer_rows=16) as app:
+                app.append(data[5:30])
+                self.assertEqual(app.flushed, 16)
+                app.append(data[30:])
+            np.testing.assert_array_equal(dset[...], data)
+
+    def test_errors(self):
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('fixed', (10, 7), chunks=(5, 7),
+                                    dtype='i')
+            with self.assertRaises(ValueError):
+                appender.Appender(dset)
+            dset = self.create(f)
+            with self.assertRaises(ValueError):
+                appender.Appender(dset, growth=0.5)
+            app = appender.Appender(dset)
+            with self.assertRaises(ValueError):
+                app.append(np.zeros((3, 8)))
+
+    def test_benchmark(self):
+        records = appender.benchmark(nrows=500, per_append=3, chunk_rows=64,
+                                     compression='gzip',
+                                     directory=self.tmpdir)
+        self.assertEqual([r['method'] for r in records],
+                         ['naive', 'appender'])
+        for record in records:
+            self.assertTrue(record['rows_per_s'] > 0)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestSelplan(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'selplan.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def create(self, f, shape=(60, 70), chunks=(8, 8)):
+        return f.create_dataset('DS1', data=datagen.generate(shape),
+                                chunks=chunks, compression='gzip')
+
+    def test_read_matches_library(self):
+        # The selection from h5ex_d_chunk, plus all, none and points.
+        with h5py.File(self.filename, 'w') as f:
+            dset = self.create(f)
+            spaces = []
+            space = dset.id.get_space()
+            space.select_hyperslab((0, 0), (20, 23), (3, 3), (2, 2))
+            space.select_hyperslab((0, 0), (20, 23), (3, 3), (1, 1),
+                                   h5py.h5s.SELECT_NOTB)
+            spaces.append(space)
+            space = dset.id.get_space()
+            space.select_all()
+            spaces.append(space)
+            space = dset.id.get_space()
+            space.select_none()
+            spaces.append(space)
+            space = dset.id.get_space()
+            space.select_elements(np.array([[0, 0], [59, 69], [9, 1]]))
+            spaces.append(space)
+
+            for space in spaces:
+                expected = np.zeros(dset.shape, dtype=dset.dtype)
+                dset.id.read(h5py.h5s.ALL, space, expected)
+                rdata = np.zeros(dset.shape, dtype=dset.dtype)
+                selplan.read(dset, selplan.plan(dset, space), rdata)
+                np.testing.assert_array_equal(rdata, expected)
+
+    def test_summary(self):
+        with h5py.File(self.filename, 'w') as f:
+            dset = self.create(f)
+            # Rows 4 to 19: chunk row 1 whole, chunk rows 0 and 2 half.
+            space = dset.id.get_space()
+            space.select_hyperslab((4, 0), (1, 1), None, (16, 70))
+            p = selplan.plan(dset, space)
+            self.assertEqual(len(p.full), 9)
+            self.assertEqual(len(p.partial), 18)
+            summary = p.summary()
+            self.assertEqual(summary['bytes_selected'], 16 * 70 * 4)
+            self.assertEqual(summary['bytes_touched'], 24 * 70 * 4)
+            self.assertAlmostEqual(summary['amplification'], 1.5)
+
+            # The offsets are chunk offsets and the selections are clipped.
+            offsets = sorted(offset for offset, sel in p.full)
+            self.assertEqual(offsets[0], (8, 0))
+            self.assertEqual(offsets[-1], (8, 64))
+            sel = dict(p.full)[(8, 64)]
+            self.assertEqual(sel, (slice(8, 16), slice(64, 70)))
+
+            mask = np.zeros(dset.shape, dtype=bool)
+            mask[4:20] = True
+            self.assertEqual(selplan.plan(dset, mask).summary(), summary)
+
+    def test_file_order(self):
+        # Chunks written in reverse are planned in reverse.
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', (4, 16), chunks=(4, 4), dtype='i')
+            for k in reversed(range(4)):
+                dset[:, 4 * k:4 * k + 4] = k
+            mask = np.ones(dset.shape, dtype=bool)
+            p = selplan.plan(dset, mask)
+            self.assertEqual([offset for offset, sel in p.full],
+                             [(0, 12), (0, 8), (0, 4), (0, 0)])
+
+    def test_write(self):
+        with h5py.File(self.filename, 'w') as f:
+            dset = self.create(f)
+            expected = dset[...]
+            data = -datagen.generate(dset.shape, 'sum')
+            mask = np.zeros(dset.shape, dtype=bool)
+            mask[::3, ::2] = True
+            mask[10:30, 10:40] = True
+            selplan.write(dset, selplan.plan(dset, mask), data)
+            expected[mask] = data[mask]
+            np.testing.assert_array_equal(dset[...], expected)
+
+    def test_repeated_points(self):
+        # A point listed twice does not make its chunk full.
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', data=np.arange(1, 5), chunks=(2,))
+            space = dset.id.get_space()
+            space.select_elements(np.array([[0], [0]]))
+            p = selplan.plan(dset, space)
+            self.assertEqual((len(p.full), len(p.partial)), (0, 1))
+            self.assertEqual(p.summary()['bytes_selected'],
+                             dset.dtype.itemsize)
+            selplan.write(dset, p, np.zeros(4, dtype=dset.dtype))
+            np.testing.assert_array_equal(dset[...], [0, 2, 3, 4])
+
+    def test_errors(self):
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('contiguous', (10, 10), dtype='i')
+            with self.assertRaises(ValueError):
+                selplan.plan(dset, np.ones((10, 10), dtype=bool))
+            dset = self.create(f)
+            with self.assertRaises(ValueError):
+                selplan.plan(dset, np.ones((10, 10), dtype=bool))
+            with self.assertRaises(ValueError):
+                selplan.plan(dset, h5py.h5s.create_simple((10, 10)))
+
+
+class TestPoints(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'points.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_group(self):
+        coords = np.array([[9, 9], [0, 3], [8, 0], [0, 1], [9, 1]])
+        order, first, lo, hi = points.group(coords, (10, 10), (4, 4))
+        # Chunks (0, 0), (2, 0) and (2, 2), original order within each.
+        np.testing.assert_array_equal(order, [1, 3, 2, 4, 0])
+        np.testing.assert_array_equal(first, [0, 2, 4, 5])
+        np.testing.assert_array_equal(lo, [[0, 1], [8, 0], [9, 9]])
+        np.testing.assert_array_equal(hi, [[1, 4], [10, 2], [10, 10]])
+
+    def test_read(self):
+        rs = np.random.RandomState(0)
+        coords = np.column_stack([rs.randint(0, 50, 500),
+                                  rs.randint(0, 70, 500)])
+        data = datagen.generate((50, 70))
+        with h5py.File(self.filename, 'w') as f:
+            for chunks in [(8, 8), (50, 1), None]:
+                name = 'DS{0}'.format(len(f))
+                dset = f.create_dataset(name, data=data, chunks=chunks)
+                expected = data[coords[:, 0], coords[:, 1]]
+                np.testing.assert_array_equal(points.read(dset, coords),
+                                              expected)
+                np.testing.assert_array_equal(
+                    points.native_read(dset, coords), expected)
+            out = np.zeros(500, dtype='f8')
+            points.read(dset, coords, out)
+            np.testing.assert_array_equal(out, expected)
+            self.assertEqual(len(points.read(dset, np.zeros((0, 2)))), 0)
+
+    def test_write(self):
+        # The two points of h5_copy, then many with repeats.
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', (3, 4), chunks=(2, 2), dtype='i')
+            points.write(dset, [[0, 3], [0, 1]], [53, 59])
+            expected = np.zeros((3, 4), dtype='i')
+            expected[0, 3], expected[0, 1] = 53, 59
+            np.testing.assert_array_equal(dset[...], expected)
+
+            rs = np.random.RandomState(1)
+            coords = np.column_stack([rs.randint(0, 40, 2000),
+                                      rs.randint(0, 30, 2000)])
+            values = np.arange(2000)
+            dset = f.create_dataset('DS2', (40, 30), chunks=(7, 7),
+                                    dtype='i', compression='gzip')
+            dset[...] = -1
+            points.write(dset, coords, values)
+            expected = np.empty((40, 30), dtype='i')
+            expected[...] = -1
+            expected[coords[:, 0], coords[:, 1]] = values
+            np.testing.assert_array_equal(dset[...], expected)
+
+            # A scalar, and a box the points cover completely.
+            points.write(dset, [[0, 0], [0, 1], [1, 0], [1, 1]], 7)
+            np.testing.assert_array_equal(dset[:2, :2], 7)
+
+    def test_errors(self):
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', (10, 10), chunks=(5, 5), dtype='i')
+            with self.assertRaises(ValueError):
+                points.read(dset, [1, 2, 3])
+            with self.assertRaises(IndexError):
+                points.read(dset, [[10, 0]])
+            with self.assertRaises(ValueError):
+                points.read(dset, [[1, 0]], out=np.zeros(2))
+
+    def test_benchmark(self):
+        records = points.benchmark(shape=(100, 100), chunks=(10, 10),
+                                   npoints=500, directory=self.tmpdir)
+        self.assertEqual([(r['method'], r['op']) for r in records],
+                         [('select_elements', 'read'),
+                          ('select_elements', 'write'),
+                          ('batched', 'read'), ('batched', 'write')])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestRawcopy(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmpdir, 'copy1.h5')
+        self.dst = os.path.join(self.tmpdir, 'copy2.h5')
+        with h5py.File(self.src, 'w') as f:
+            dset = f.create_dataset('grp/DS1', data=datagen.generate((60, 70)),
+                                    chunks=(16, 16), compression='gzip',
+                                    compression_opts=9, fletcher32=True,
+                                    fillvalue=-1)
+            dset.attrs['units'] = 'm'
+            dset.attrs['scale'] = np.arange(3.0)
+            dset.attrs.create('empty', h5py.Empty('f'))
+            dset = f.create_dataset('sparse', (40, 40), chunks=(10, 10),
+                                    dtype='i', compression='gzip')
+            dset[:5, :5] = 3
+            f.create_dataset('contiguous', data=np.arange(10))
+            f.create_dataset('scalar', data=5)
+            f.create_dataset('strings', data=['a', 'bb'],
+                             dtype=h5py.string_dtype())
+            f['refs'] = [f['grp'].ref, f['grp/DS1'].ref]
+            f.create_dataset('regions', dtype=h5py.regionref_dtype,
+                             data=[f['grp/DS1'].regionref[1:3, 2:4]])
+            f['soft'] = h5py.SoftLink('/grp/DS1')
+            f['grp'].attrs['root'] = f.ref
+            f.attrs['title'] = 'copy1'
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check(self, stats):
+        self.assertEqual(stats['datasets'], 6)
+        self.assertEqual(stats['groups'], 2)
+        self.assertEqual(stats['library'], 1)
+        self.assertEqual(stats['chunks'], 20 + 1)
+        self.assertEqual(stats['references'], 4)
+        with h5py.File(self.src, 'r') as src, \
+                h5py.File(self.dst, 'r') as dst:
+            for name in ['grp/DS1', 'sparse', 'contiguous', 'scalar']:
+                a, b = src[name], dst[name]
+                np.testing.assert_array_equal(a[()], b[()])
+                self.assertEqual(a.chunks, b.chunks)
+                self.assertEqual(a.compression, b.compression)
+                self.assertEqual(a.fletcher32, b.fletcher32)
+                self.assertEqual(a.fillvalue, b.fillvalue)
+                self.assertEqual(a.id.get_storage_size(),
+                                 b.id.get_storage_size())
+            self.assertEqual(dst['sparse'].id.get_num_chunks(), 1)
+            attrs = dst['grp/DS1'].attrs
+            self.assertEqual(attrs['units'], 'm')
+            np.testing.assert_array_equal(attrs['scale'], np.arange(3.0))
+            self.assertEqual(attrs['empty'], h5py.Empty('f'))
+            self.assertEqual(dst.attrs['title'], 'copy1')
+            self.assertEqual(list(dst['strings'][()]), [b'a', b'bb'])
+            self.assertEqual(dst.get('soft', getlink=True).path, '/grp/DS1')
+            self.assertEqual([dst[ref].name for ref in dst['refs'][()]],
+                             ['/grp', '/grp/DS1'])
+            self.assertEqual(dst[dst['grp'].attrs['root']].name, '/')
+            ref = dst['regions'][0]
+            np.testing.assert_array_equal(dst[ref][ref], [[0, 0], [2, 3]])
+
+    def test_copy_file(self):
+        self.check(rawcopy.copy_file(self.src, self.dst))
+
+    def test_workers(self):
+        self.check(rawcopy.copy_file(self.src, self.dst, workers=2))
+
+    def test_filter_mask(self):
+        # A chunk stored with the deflate filter skipped stays that way.
+        with h5py.File(self.src, 'r+') as f:
+            dset = f['grp/DS1']
+            chunk = np.full((16, 16), 7, dtype=dset.dtype)
+            filters = chunkio.pipeline(dset)
+            dset.id.write_direct_chunk((0, 0), chunkio.encode(
+                chunk, [filters[1]]), filter_mask=1)
+        rawcopy.copy_file(self.src, self.dst)
+        with h5py.File(self.dst, 'r') as f:
+            dset = f['grp/DS1']
+            self.assertEqual(dset.id.read_direct_chunk((0, 0))[0], 1)
+            np.testing.assert_array_equal(dset[:16, :16], 7)
+
+    def test_subtree(self):
+        # References to objects outside the copy become null.
+        with h5py.File(self.src, 'r') as src, \
+                h5py.File(self.dst, 'w') as dst:
+            stats = rawcopy.copy(src['grp'], dst, 'copied')
+            self.assertEqual(stats['datasets'], 1)
+            self.assertEqual(list(dst['copied']), ['DS1'])
+            self.assertFalse(dst['copied'].attrs['root'])
+            rawcopy.copy(src['grp/DS1'], dst)
+            np.testing.assert_array_equal(dst['DS1'], src['grp/DS1'])
+
+    def test_hard_links(self):
+        # A group linking back to its ancestor, and a dataset linked
+        # twice, are copied once and linked again.
+        with h5py.File(self.src, 'r+') as f:
+            f['grp/up'] = f
+            f['alias'] = f['grp/DS1']
+        for workers in [None, 2]:
+            stats = rawcopy.copy_file(self.src, self.dst, workers=workers)
+            self.assertEqual(stats['datasets'], 6)
+            self.assertEqual(stats['groups'], 2)
+            with h5py.File(self.dst, 'r') as f:
+                self.assertEqual(f['grp/up'].id, f.id)
+                self.assertEqual(f['alias'].id, f['grp/DS1'].id)
+                np.testing.assert_array_equal(f['alias'][()],
+                                              f['grp/DS1'][()])
+
+    def test_datatypes(self):
+        # Committed datatypes are copied once, links and references to
+        # them following.
+        with h5py.File(self.src, 'r+') as f:
+            f['grp/T1'] = np.dtype('<i4')
+            f['T2'] = f['grp/T1']
+            f['grp'].attrs['type'] = f['grp/T1'].ref
+        for workers in [None, 2]:
+            stats = rawcopy.copy_file(self.src, self.dst, workers=workers)
+            self.assertEqual(stats['datatypes'], 1)
+            with h5py.File(self.dst, 'r') as f:
+                self.assertEqual(f['grp/T1'].dtype, np.dtype('<i4'))
+                self.assertEqual(f['T2'].id, f['grp/T1'].id)
+                self.assertEqual(f[f['grp'].attrs['type']].id,
+                                 f['grp/T1'].id)
+
+    def test_many_datasets(self):
+        # Chunks of many small datasets are batched into a few tasks.
+        with h5py.File(self.src, 'w') as f:
+            for k in range(50):
+                f.create_dataset('DS{0}'.format(k), data=np.arange(k, k + 40),
+                                 chunks=(8,), compression='gzip')
+        stats = rawcopy.copy_file(self.src, self.dst, workers=2)
+        self.assertEqual(stats['chunks'], 50 * 5)
+        with h5py.File(self.dst, 'r') as f:
+            for k in range(50):
+                dset = f['DS{0}'.format(k)]
+                np.testing.assert_array_equal(dset, np.arange(k, k + 40))
+                self.assertEqual(dset.compression, 'gzip')
+
+    def test_self_contained(self):
+        dtype = np.dtype([('a', 'i'), ('b', h5py.string_dtype())])
+        for dtype, expected in [('<i4', True), ('S5', True),
+                                (h5py.string_dtype(), False),
+                                (h5py.vlen_dtype('i'), False),
+                                (h5py.ref_dtype, False),
+                                (dtype, False),
+                                (np.dtype(('i', (2, 3))), True)]:
+            tid = h5py.h5t.py_create(np.dtype(dtype), logical=True)
+            self.assertEqual(rawcopy.self_contained(tid), expected)
+
+
+class TestBufpool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'bufpool.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_reuse(self):
+        pool = bufpool.BufferPool()
+        a = pool.get((6, 8), '<i4')
+        pool.put(a)
+        b = pool.get((6, 8), np.int32)
+        self.assertTrue(a is b)
+        c = pool.get((6, 8), '<i8')
+        self.assertFalse(c is b)
+        pool.put(b)
+        pool.put(c)
+        pool.put(c[:3])
+        self.assertEqual(pool.nbytes, 6 * 8 * 12)
+        d = pool.get((6, 8), '<i8', zero=True)
+        self.assertTrue(d is c)
+        self.assertEqual(d.sum(), 0)
+
+        stats = pool.stats()
+        self.assertEqual(stats['requests'], 4)
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hit_rate'], 0.5)
+        self.assertEqual(stats['bytes_avoided'], 6 * 8 * 12)
+        self.assertEqual(stats['bytes_held'], 6 * 8 * 4)
+
+        with pool.borrow(10, 'f8') as buf:
+            self.assertEqual(buf.shape, (10,))
+        self.assertEqual(pool.nbytes, 6 * 8 * 4 + 80)
+        pool.clear()
+        self.assertEqual(pool.nbytes, 0)
+
+    def test_max_bytes(self):
+        # The least recently returned buffers are dropped first.
+        pool = bufpool.BufferPool(max_bytes=200)
+        bufs = [pool.get(10, 'f8') for k in range(3)]
+        small = pool.get(5, 'f8')
+        pool.put(bufs[0])
+        pool.put(small)
+        pool.put(bufs[1])
+        self.assertEqual(pool.nbytes, 200)
+        pool.put(bufs[2])
+        self.assertEqual(pool.nbytes, 200)
+        self.assertTrue(pool.get(5, 'f8') is small)
+        self.assertTrue(pool.get(10, 'f8') is bufs[2])
+        self.assertTrue(pool.get(10, 'f8') is bufs[1])
+        pool.put(np.empty(100, 'f8'))
+        self.assertEqual(pool.nbytes, 0)
+
+    def test_read(self):
+        data = datagen.generate((6, 8))
+        with h5py.File(self.filename, 'w') as f:
+            f['DS1'] = data
+            dsid = f['DS1'].id
+            pool = bufpool.BufferPool()
+            for k in range(3):
+                rdata = bufpool.read(dsid, pool=pool)
+                np.testing.assert_array_equal(rdata, data)
+                rdata[...] = -1
+                pool.put(rdata)
+            self.assertEqual(pool.stats()['hits'], 2)
+
+            # A partial selection reads as zero elsewhere, as in
+            # h5ex_d_hyper.
+            space = dsid.get_space()
+            space.select_hyperslab((0, 1), (2, 2), (4, 4), (2, 3))
+            rdata = bufpool.read(dsid, h5py.h5s.ALL, space, pool=pool)
+            expected = np.zeros((6, 8), dtype=data.dtype)
+            dsid.read(h5py.h5s.ALL, space, expected)
+            np.testing.assert_array_equal(rdata, expected)
+
+            out = np.empty((6, 8), dtype='f8')
+            self.assertTrue(bufpool.read(dsid, out=out) is out)
+            np.testing.assert_array_equal(out, data)
+
+
+class TestMemmap(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'memmap.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_example(self):
+        # The file h5ex_d_rdwr writes.
+        from hdf5examples.low_level import h5ex_d_rdwr
+        h5ex_d_rdwr.run(shape=(40, 30), dtype='>i8', filename=self.filename,
+                        quiet=True)
+        with h5py.File(self.filename, 'r') as f:
+            expected = f['DS1'][...]
+            arr = memmap.memmap(f['DS1'])
+        self.assertEqual(arr.dtype, np.dtype('>i8'))
+        np.testing.assert_array_equal(arr, expected)
+        with self.assertRaises(ValueError):
+            arr[0, 0] = 1
+
+    def test_types(self):
+        cmpd = np.dtype([('a', '<i2'), ('b', '>f8'), ('c', 'S3')])
+        data = {'int': datagen.generate((5, 7), dtype='<u2'),
+                'compound': np.zeros(4, dtype=cmpd),
+                'scalar': np.array(2.5)}
+        data['compound']['b'] = [1, 2, 3, 4]
+        data['compound']['c'] = b'abc'
+        with h5py.File(self.filename, 'w', userblock_size=512) as f:
+            for name, value in data.items():
+                f[name] = value
+            # Writes still pending are seen.
+            for name, value in data.items():
+                np.testing.assert_array_equal(memmap.memmap(f[name]), value)
+
+    def test_copy_on_write(self):
+        with h5py.File(self.filename, 'w') as f:
+            f['DS1'] = np.arange(10)
+        with h5py.File(self.filename, 'r') as f:
+            arr = memmap.memmap(f['DS1'], mode='c')
+            arr[0] = 100
+            self.assertEqual(f['DS1'][0], 0)
+            with self.assertRaises(ValueError):
+                memmap.memmap(f['DS1'], mode='r+')
+
+    def test_refused(self):
+        with h5py.File(self.filename, 'w') as f:
+            f.create_dataset('chunked', data=np.arange(10), chunks=(5,))
+            f.create_dataset('compressed', data=np.arange(10),
+                             compression='gzip')
+            dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+            dcpl.set_layout(h5py.h5d.COMPACT)
+            h5py.h5d.create(f.id, b'compact', h5py.h5t.NATIVE_INT32,
+                            h5py.h5s.create_simple((10,)), dcpl=dcpl)
+            f.create_dataset('unallocated', (10,), dtype='i')
+            f.create_dataset('strings', data=['a', 'b'],
+                             dtype=h5py.string_dtype())
+            f.create_dataset('external', (10,), dtype='i',
+                             external=[('external.raw', 0, 40)])
+            for name in ['chunked', 'compressed', 'compact', 'unallocated',
+                         'strings', 'external']:
+                with self.assertRaises(ValueError):
+                    memmap.memmap(f[name])
+            f['plain'] = np.arange(10)
+        with h5py.File(self.filename, 'r', driver='core') as f:
+            with self.assertRaises(ValueError):
+                memmap.offset(f['plain'])
+
+
+class TestLayout(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'layout.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_advise(self):
+        self.assertEqual(layout.advise((4, 7), '>i4'), 'compact')
+        self.assertEqual(layout.advise((8184,), '<f8'), 'compact')
+        self.assertEqual(layout.advise((8192,), '<f8'), 'contiguous')
+        self.assertEqual(layout.advise((100, 100), 'u1', compact_max=1000),
+                         'contiguous')
+        self.assertEqual(layout.advise((4, 7), 'i', maxshape=(None, 7)),
+                         'chunked')
+        self.assertEqual(layout.advise((4, 7), 'i', maxshape=(4, 7)),
+                         'compact')
+        self.assertEqual(layout.advise((4, 7), 'i', chunks=(2, 7)),
+                         'chunked')
+        self.assertEqual(layout.advise((4, 7), 'i', compression='gzip'),
+                         'chunked')
+        self.assertEqual(layout.advise((4, 7), 'i', shuffle=False),
+                         'compact')
+        self.assertEqual(layout.advise((4, 7), 'i', external=[]),
+                         'contiguous')
+        # Variable-length strings take 16 bytes each in the dataset.
+        self.assertEqual(layout.storage_size((10,), h5py.string_dtype()),
+                         160)
+
+    def test_create_dataset(self):
+        layouts = {'compact': h5py.h5d.COMPACT,
+                   'contiguous': h5py.h5d.CONTIGUOUS,
+                   'chunked': h5py.h5d.CHUNKED}
+        wdata = datagen.generate((4, 7), dtype='>i4')
+        with h5py.File(self.filename, 'w') as f:
+            cases = [('compact', {'data': wdata}),
+                     ('contiguous', {'shape': (1000, 1000), 'dtype': 'f8'}),
+                     ('chunked', {'data': wdata, 'maxshape': (None, 7)}),
+                     ('gzip', {'data': wdata, 'compression': 'gzip'}),
+                     ('strings', {'data': ['a', 'bb'],
+                                  'dtype': h5py.string_dtype()})]
+            for name, kwargs in cases:
+                layout.create_dataset(f, name, **kwargs)
+        with h5py.File(self.filename, 'r') as f:
+            for name, expected in [('compact', 'compact'),
+                                   ('contiguous', 'contiguous'),
+                                   ('chunked', 'chunked'),
+                                   ('gzip', 'chunked'),
+                                   ('strings', 'compact')]:
+                dcpl = f[name].id.get_create_plist()
+                self.assertEqual(dcpl.get_layout(), layouts[expected])
+            np.testing.assert_array_equal(f['compact'][...], wdata)
+            self.assertEqual(f['compact'].dtype, np.dtype('>i4'))
+            self.assertEqual(f['gzip'].compression, 'gzip')
+            self.assertEqual(list(f['strings'][...]), [b'a', b'bb'])
+
+    def test_benchmark(self):
+        records = layout.benchmark(ndatasets=50, directory=self.tmpdir)
+        self.assertEqual([r['layout'] for r in records],
+                         ['compact', 'contiguous', 'chunked'])
+        for record in records:
+            self.assertTrue(record['open_s'] > 0)
+            self.assertTrue(record['overhead_bytes'] > 0)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestSparse(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'sparse.h5')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fill_mask(self):
+        data = np.zeros((10, 7))
+        data[9, 6] = 1
+        data[0, 3] = np.nan
+        mask = sparse.fill_mask(data, (4, 3))
+        expected = np.ones((3, 3), dtype=bool)
+        expected[2, 2] = expected[0, 1] = False
+        np.testing.assert_array_equal(mask, expected)
+
+        data = np.full((4, 4), np.nan)
+        data[0, 0] = 0
+        np.testing.assert_array_equal(sparse.fill_mask(data, (2, 2), np.nan),
+                                      [[False, True], [True, True]])
+
+    def test_create_dataset(self):
+        data = np.zeros((40, 30), dtype='>i4')
+        data[5, 5] = 1
+        data[39, 29] = 2
+        with h5py.File(self.filename, 'w') as f:
+            dset, stats = sparse.create_dataset(f, 'DS1', data,
+                                                chunks=(10, 10),
+                                                compression='gzip')
+            self.assertEqual(stats['chunks'], 12)
+            self.assertEqual(stats['written'], 2)
+            self.assertEqual(stats['skipped'], 10)
+            self.assertEqual(stats['storage_before'], 0)
+            self.assertEqual(stats['storage_after'],
+                             dset.id.get_storage_size())
+            self.assertEqual(dset.id.get_num_chunks(), 2)
+            np.testing.assert_array_equal(dset[...], data)
+
+            # A fill value other than zero.
+            data = np.full((40, 30), 99, dtype='i')
+            data[20:25, 0] = 7
+            dset, stats = sparse.create_dataset(f, 'DS2', data,
+                                                chunks=(10, 10),
+                                                fillvalue=99)
+            self.assertEqual(stats['written'], 1)
+            np.testing.assert_array_equal(dset[...], data)
+
+            # Nothing to skip.
+            dset, stats = sparse.create_dataset(f, 'DS3', data + 1,
+                                                chunks=(10, 10))
+            self.assertEqual(stats['written'], 12)
+            np.testing.assert_array_equal(dset[...], data + 1)
+
+    def test_rewrite(self):
+        # Chunks stored earlier are overwritten even when now empty.
+        with h5py.File(self.filename, 'w') as f:
+            dset, stats = sparse.create_dataset(f, 'DS1',
+                                                np.ones((20, 20), 'i'),
+                                                chunks=(10, 10))
+            data = np.zeros((20, 20), 'i')
+            data[0, 0] = 5
+            stats = sparse.write(dset, data)
+            self.assertEqual(stats['written'], 4)
+            np.testing.assert_array_equal(dset[...], data)
+
+            with self.assertRaises(ValueError):
+                sparse.write(dset, np.zeros((10, 10)))
+            dset = f.create_dataset('contiguous', (20, 20), dtype='i')
+            with self.assertRaises(ValueError):
+                sparse.write(dset, data)
+
+    def test_read(self):
+        data = np.full((40, 30), 99, dtype='<i4')
+        data[5, 5] = 1
+        data[30:40, 20:30] = datagen.generate((10, 10))
+        with h5py.File(self.filename, 'w') as f:
+            # With fill_time='never' the library reads unwritten chunks as
+            # garbage, but read() fills them in.
+            dset, stats = sparse.create_dataset(f, 'DS1', data,
+                                                chunks=(10, 10),
+                                                fillvalue=99,
+                                                fill_time='never')
+            np.testing.assert_array_equal(sparse.read(dset), data)
+            for sel in [np.s_[3:33, 4:], np.s_[5:6], np.s_[31:35, 25:29],
+                        np.s_[10:10]]:
+                np.testing.assert_array_equal(sparse.read(dset, sel),
+                                              data[sel])
+            out = np.zeros((40, 30), dtype='f8')
+            self.assertTrue(sparse.read(dset, out=out) is out)
+            np.testing.assert_array_equal(out, data)
+            # A strided out goes through a scratch buffer, which must be
+            # filled where no chunk is stored.
+            dset3, stats = sparse.create_dataset(f, 'DS3', data,
+                                                 chunks=(10, 10),
+                                                 fillvalue=99,
+                                                 fill_time='never')
+            self.assertTrue(stats['skipped'] > 0)
+            big = np.full((40, 60), -1, dtype='<i4')
+            out = big[:, ::2]
+            self.assertTrue(sparse.read(dset3, out=out) is out)
+            np.testing.assert_array_equal(out, data)
+            np.testing.assert_array_equal(big[:, 1::2], -1)
+            with self.assertRaises(ValueError):
+                sparse.read(dset, np.s_[::2])
+            with self.assertRaises(ValueError):
+                sparse.read(dset, out=np.zeros((4, 3)))
+
+            # Resized, as in h5ex_d_fillvalue.
+            dset = f.create_dataset('DS2', data=data[:4, :7],
+                                    maxshape=(None, None), chunks=(4, 4),
+                                    fillvalue=99)
+            dset.resize((6, 10))
+            np.testing.assert_array_equal(sparse.read(dset), dset[...])
+
+            dset = f.create_dataset('contiguous', data=data)
+            np.testing.assert_array_equal(sparse.read(dset, np.s_[2:5]),
+                                          data[2:5])
+
+    def test_benchmark(self):
+        records = sparse.benchmark(shape=(2, 64, 64), chunks=(1, 16, 16),
+                                   densities=[0.1], compression='gzip',
+                                   directory=self.tmpdir)
+        dense, sparse_ = records
+        self.assertEqual(dense['chunks_written'], 32)
+        self.assertTrue(sparse_['chunks_written'] < 32)
+        self.assertTrue(sparse_['storage_bytes'] < dense['storage_bytes'])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestTable(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'table.h5')
+        self.rows = table.make_records(10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_layouts(self):
+        with h5py.File(self.filename, 'w') as f:
+            for layout_ in table.LAYOUTS:
+                t = table.Table.create(f, layout_, self.rows.dtype,
+                                       layout=layout_, chunk_rows=4,
+                                       compression='gzip')
+                self.assertEqual(len(t), 0)
+                t.append(self.rows[:3])
+                t.append(self.rows[3:])
+                self.assertEqual(len(t), 10)
+
+        with h5py.File(self.filename, 'r') as f:
+            self.assertTrue(isinstance(f['compound'], h5py.Dataset))
+            self.assertTrue(isinstance(f['columnar'], h5py.Group))
+            for layout_ in table.LAYOUTS:
+                t = table.Table(f[layout_])
+                self.assertEqual(t.layout, layout_)
+                self.assertEqual(t.names, list(self.rows.dtype.names))
+                rdata = t.read()
+                self.assertEqual(rdata.dtype.names, self.rows.dtype.names)
+                for name in t.names:
+                    expected = self.rows[name]
+                    if name == 'Location':
+                        expected = [s.encode() for s in expected]
+                    np.testing.assert_array_equal(rdata[name], expected)
+
+                rdata = t.read(np.s_[2:5], fields=['Pressure',
+                                                   'Serial number'])
+                self.assertEqual(rdata.dtype.names,
+                                 ('Pressure', 'Serial number'))
+                np.testing.assert_array_equal(rdata['Serial number'],
+                                              self.rows['Serial number'][2:5])
+                rec = t.read(3, fields=['Pressure', 'Serial number'])
+                self.assertEqual(rec['Pressure'], self.rows['Pressure'][3])
+                self.assertEqual(rec['Serial number'],
+                                 self.rows['Serial number'][3])
+                self.assertEqual(t.read(3)['Temperature'],
+                                 self.rows['Temperature'][3])
+                np.testing.assert_array_equal(
+                    t.column('Temperature', [1, 7]),
+                    self.rows['Temperature'][[1, 7]])
+                with self.assertRaises(ValueError):
+                    t.column('Humidity')
+                with self.assertRaises(ValueError):
+                    t.read(fields=['Humidity'])
+
+    def test_errors(self):
+        with h5py.File(self.filename, 'w') as f:
+            with self.assertRaises(ValueError):
+                table.Table.create(f, 'DS1', self.rows.dtype, layout='rows')
+            with self.assertRaises(ValueError):
+                table.Table.create(f, 'DS1', '<f8')
+            with self.assertRaises(ValueError):
+                table.Table(f.create_dataset('plain', (4,), dtype='f4'))
+            with self.assertRaises(ValueError):
+                table.Table(f.create_group('group'))
+
+    def test_benchmark(self):
+        records = table.benchmark(nrows=1000, batch=300, chunk_rows=100,
+                                  directory=self.tmpdir)
+        self.assertEqual([r['layout'] for r in records], list(table.LAYOUTS))
+        for record in records:
+            self.assertEqual(record['rows'], 1000)
+            self.assertTrue(record['scan_s'] > 0)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestRagged(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'ragged.h5')
+        self.strings = ['Parting', 'is such', '', 'sweet', 'sorrow',
+                        'h\u00e9llo']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_encode_decode(self):
+        blob, offsets = ragged.encode(self.strings)
+        self.assertEqual(blob.dtype, np.uint8)
+        self.assertEqual(blob.tobytes(),
+                         ''.join(self.strings).encode('utf-8'))
+        np.testing.assert_array_equal(offsets, [0, 7, 14, 14, 19, 25, 31])
+        for strings in [np.array(self.strings),
+                        np.char.encode(np.array(self.strings), 'utf-8')]:
+            b, o = ragged.encode(strings)
+            np.testing.assert_array_equal(b, blob)
+            np.testing.assert_array_equal(o, offsets)
+
+        self.assertEqual(list(ragged.decode(blob, offsets)), self.strings)
+        np.testing.assert_array_equal(ragged.decode(blob, offsets, 'U'),
+                                      self.strings)
+        rdata = ragged.decode(blob, offsets, 'S')
+        self.assertEqual(rdata.dtype, np.dtype('S7'))
+        self.assertEqual(list(rdata),
+                         [s.encode('utf-8') for s in self.strings])
+        # Offsets that do not start at zero.
+        self.assertEqual(list(ragged.decode(blob[14:25], offsets[2:6])),
+                         self.strings[2:5])
+        self.assertEqual(len(ragged.decode(blob[:0], offsets[:1], 'S')), 0)
+        with self.assertRaises(ValueError):
+            ragged.decode(blob, offsets, 'f8')
+
+    def test_strings(self):
+        with h5py.File(self.filename, 'w') as f:
+            s = ragged.RaggedStrings.create(f, 'DS1', chunk_bytes=8,
+                                            chunk_rows=2,
+                                            compression='gzip')
+            self.assertEqual(len(s), 0)
+            s.append(self.strings[:2])
+            s.append(self.strings[2:])
+            self.assertEqual(len(s), 6)
+
+        with h5py.File(self.filename, 'r') as f:
+            s = ragged.RaggedStrings(f['DS1'])
+            self.assertEqual(list(s.read()), self.strings)
+            for sel in [np.s_[1:4], np.s_[3:3], np.s_[::2], np.s_[1::3],
+                        np.s_[-2:]]:
+                self.assertEqual(list(s.read(sel)), self.strings[sel])
+            np.testing.assert_array_equal(s.read(np.s_[4:], 'U'),
+                                          self.strings[4:])
+            self.assertEqual(s.row(5), self.strings[5])
+            with self.assertRaises(ValueError):
+                s.read(3)
+            with self.assertRaises(ValueError):
+                s.read(np.s_[::-1])
+            with self.assertRaises(ValueError):
+                ragged.RaggedStrings(f['/'])
+
+    def test_flatten_split(self):
+        rows = [np.arange(3, 0, -1), [1, 1, 2, 3, 5, 8], []]
+        values, offsets = ragged.flatten(rows, '<i4')
+        self.assertEqual(values.dtype, np.dtype('<i4'))
+        np.testing.assert_array_equal(values, [3, 2, 1, 1, 1, 2, 3, 5, 8])
+        np.testing.assert_array_equal(offsets, [0, 3, 9, 9])
+        rdata = ragged.split(values, offsets)
+        self.assertEqual(rdata.dtype, object)
+        for row, expected in zip(rdata, rows):
+            np.testing.assert_array_equal(row, expected)
+        self.assertTrue(rdata[1].base is not None)
+
+        # Rows of equal length stay separate arrays.
+        rdata = ragged.split(np.arange(4), [0, 2, 4])
+        self.assertEqual(rdata.shape, (2,))
+        np.testing.assert_array_equal(rdata[1], [2, 3])
+
+    def test_arrays(self):
+        # The countdown and Fibonacci sequence of h5ex_t_vlen.
+        rows = [np.arange(3, 0, -1), [1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89,
+                                      144]]
+        with h5py.File(self.filename, 'w') as f:
+            a = ragged.RaggedArray.create(f, 'DS1', '<i4', chunk_bytes=16,
+                                          chunk_rows=2, compression='gzip')
+            a.append(rows)
+            a.append_flat([7, 8, 9], [0, 1, 1, 3])
+            self.assertEqual(len(a), 5)
+            for offsets in [[1, 2, 3], [0, 2, 1, 3], [0, 1, 2], [0, 1, 4],
+                            []]:
+                with self.assertRaises(ValueError):
+                    a.append_flat([7, 8, 9], offsets)
+            # A tuple of two rows is two rows.
+            a.append((rows[0], [1, 1, 2]))
+            self.assertEqual(len(a), 7)
+
+        with h5py.File(self.filename, 'r') as f:
+            a = ragged.RaggedArray(f['DS1'])
+            self.assertEqual(a.dtype, np.dtype('<i4'))
+            rows += [[7], [], [8, 9], rows[0], [1, 1, 2]]
+            for k, row in enumerate(rows):
+                np.testing.assert_array_equal(a.row(k), row)
+            np.testing.assert_array_equal(a.row(-1), [1, 1, 2])
+            with self.assertRaises(IndexError):
+                a.row(7)
+            for sel in [np.s_[:], np.s_[1:4], np.s_[::3]]:
+                rdata = a.read(sel)
+                self.assertEqual(len(rdata), len(rows[sel]))
+                for row, expected in zip(rdata, rows[sel]):
+                    np.testing.assert_array_equal(row, expected)
+            values, offsets = a.read_flat(np.s_[1:4])
+            self.assertEqual(len(values), 13)
+            np.testing.assert_array_equal(offsets, [0, 12, 13, 13])
+            with self.assertRaises(ValueError):
+                ragged.RaggedStrings(f['DS1'])
+
+    def test_benchmark(self):
+        for kind in ['str', 'array']:
+            records = ragged.benchmark(nrows=1000, nslice=10, kind=kind,
+                                       directory=self.tmpdir)
+            vlen, ragged_ = records
+            self.assertEqual(vlen['method'], 'vlen')
+            self.assertEqual(vlen['flat_read_s'], None)
+            self.assertTrue(ragged_['flat_read_s'] > 0)
+            self.assertTrue(ragged_['row_read_s'] > 0)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        with self.assertRaises(ValueError):
+            ragged.benchmark(nrows=10, kind='float')
+
+
+class TestEnums(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'enums.h5')
+        self.mapping = {'SOLID': 0, 'LIQUID': 1, 'GAS': 2, 'PLASMA': 3}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_file(self):
+        # As in h5ex_t_enum and h5ex_t_enumatt.
+        enumtype = h5py.enum_dtype(self.mapping, basetype=np.int16)
+        wdata = datagen.generate((4, 7), 'outer', dtype=np.int32,
+                                 modulo=4)
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', (4, 7), dtype=enumtype)
+            dset[...] = wdata
+            dset.attrs.create('A1', wdata, dtype=enumtype)
+
+        inv_mapping = {v: k for (k, v) in self.mapping.items()}
+        expected = [[inv_mapping[item] for item in row] for row in wdata]
+        with h5py.File(self.filename, 'r') as f:
+            for obj in [f['DS1'], f['DS1'][...], f['DS1'].attrs['A1']]:
+                e = enums.Enum(obj)
+                self.assertEqual(e.mapping, self.mapping)
+                rdata = obj[...]
+                self.assertEqual(e.decode(rdata).tolist(), expected)
+                np.testing.assert_array_equal(e.encode(expected), wdata)
+        with self.assertRaises(ValueError):
+            enums.Enum(np.dtype('i2'))
+
+    def test_codes(self):
+        mapping = {'NEG': -5, 'ZERO': 0, 'GAS': 2, 'BIG': 100}
+        for basetype in ['i1', '>i2', '<i4', 'i8']:
+            e = enums.Enum(h5py.enum_dtype(mapping, basetype=basetype))
+            self.assertEqual(e.names.tolist(), ['NEG', 'ZERO', 'GAS', 'BIG'])
+            self.assertEqual(e.code_dtype, np.int8)
+            for dtype in ['i1', 'i2', '>i4', 'u2', 'i8']:
+                values = np.array([[2, 100], [0, 7]]).astype(dtype)
+                codes = e.codes(values)
+                self.assertEqual(codes.dtype, np.int8)
+                np.testing.assert_array_equal(codes, [[2, 3], [1, -1]])
+            np.testing.assert_array_equal(e.codes([-5, -6, 101]),
+                                          [0, -1, -1])
+            np.testing.assert_array_equal(e.from_codes([3, 0]), [100, -5])
+            with self.assertRaises(ValueError):
+                e.decode([2, 7])
+            with self.assertRaises(ValueError):
+                e.codes([2.0])
+
+        # Values too widely spread for a table.
+        mapping = {'LOW': -10 ** 12, 'MID': 0, 'HIGH': 10 ** 12}
+        e = enums.Enum(h5py.enum_dtype(mapping, basetype='i8'))
+        np.testing.assert_array_equal(
+            e.codes([10 ** 12, 0, 5, -10 ** 12, 10 ** 13]),
+            [2, 1, -1, 0, -1])
+        self.assertEqual(e.decode([0, 10 ** 12]).tolist(), ['MID', 'HIGH'])
+
+    def test_encode(self):
+        e = enums.Enum(h5py.enum_dtype(self.mapping, basetype='u1'))
+        values = e.encode([['GAS', 'SOLID'], ['PLASMA', 'LIQUID']])
+        self.assertEqual(values.dtype, np.uint8)
+        np.testing.assert_array_equal(values, [[2, 0], [3, 1]])
+        np.testing.assert_array_equal(e.encode(np.array([b'GAS'])), [2])
+        with self.assertRaises(ValueError):
+            e.encode(['GAS', 'STEAM'])
+
+    def test_benchmark(self):
+        records = enums.benchmark(nvalues=1000)
+        self.assertEqual([r['method'] for r in records], ['dict', 'enum'])
+        self.assertEqual(records[0]['codes_s'], None)
+        self.assertTrue(records[1]['codes_s'] > 0)
+
+
+class TestObjrefs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'objrefs.h5')
+        with h5py.File(self.filename, 'w') as f:
+            dset2 = f.create_dataset('DS2', data=0)
+            grp = f.create_group('G1')
+            f['T1'] = np.dtype('<f4')
+            refs = np.array([[dset2.ref, grp.ref, h5py.Reference()],
+                             [grp.ref, f['T1'].ref, f.ref]],
+                            dtype=h5py.ref_dtype)
+            dset = f.create_dataset('DS1', data=refs)
+            dset.attrs.create('A1', refs[0], dtype=h5py.ref_dtype)
+            f.create_dataset('scalar', data=grp.ref, dtype=h5py.ref_dtype)
+            f.create_dataset('empty', (0,), dtype=h5py.ref_dtype)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_resolve(self):
+        with h5py.File(self.filename, 'r') as f:
+            addrs = objrefs.addresses(f['DS1'])
+            self.assertEqual(addrs.dtype, np.uint64)
+            self.assertEqual(addrs[0, 2], 0)
+            self.assertEqual(addrs[0, 1], addrs[1, 0])
+
+            r = objrefs.Resolver(f)
+            paths, types = r.resolve(f['DS1'])
+            self.assertEqual(paths.tolist(), [['/DS2', '/G1', None],
+                                              ['/G1', '/T1', '/']])
+            self.assertEqual([[objrefs.TYPES.get(t) for t in row]
+                              for row in types],
+                             [['Dataset', 'Group', None],
+                              ['Group', 'Datatype', 'Group']])
+            self.assertEqual(r.stats()['misses'], 4)
+
+            paths, types = r.resolve(f['DS1'], 'A1')
+            self.assertEqual(paths.tolist(), ['/DS2', '/G1', None])
+            self.assertEqual(r.stats()['hits'], 2)
+            paths, types = r.resolve(f['scalar'])
+            self.assertEqual(paths.shape, ())
+            self.assertEqual(paths[()], '/G1')
+            paths, types = r.resolve(f['empty'])
+            self.assertEqual(paths.shape, (0,))
+
+            objects = r.open(f['DS1'])
+            self.assertTrue(isinstance(objects[0, 0], h5py.Dataset))
+            self.assertTrue(objects[0, 1] is objects[1, 0])
+            self.assertEqual(objects[1, 1].name, '/T1')
+            self.assertTrue(objects[0, 2] is None)
+
+            with self.assertRaises(ValueError):
+                r.resolve(f['DS2'])
+            with self.assertRaises(ValueError):
+                r.resolve(f['G1'])
+
+    def test_visit(self):
+        # Enough targets that the file is visited rather than searched.
+        with h5py.File(self.filename, 'a') as f:
+            refs = [f.create_group('g{0}'.format(k)).ref for k in range(20)]
+            f.create_dataset('many', data=np.array(refs * 3,
+                                                   dtype=h5py.ref_dtype))
+        with h5py.File(self.filename, 'r') as f:
+            r = objrefs.Resolver(f)
+            paths, types = r.resolve(f['many'])
+            self.assertEqual(paths.tolist(),
+                             ['/g{0}'.format(k) for k in range(20)] * 3)
+            self.assertTrue((types == h5py.h5o.TYPE_GROUP).all())
+
+    def test_invalidate(self):
+        with h5py.File(self.filename, 'a') as f:
+            r = objrefs.Resolver(f)
+            r.resolve(f['DS1'])
+            self.assertEqual(r.stats()['cached'], 4)
+            r.resolve(f['DS1'])
+            self.assertEqual(r.stats()['hits'], 4)
+            # Growing the file drops the cache.
+            f.create_dataset('big', data=np.zeros(100000))
+            f.flush()
+            r.resolve(f['DS1'], 'A1')
+            self.assertEqual(r.stats()['cached'], 2)
+            f.move('G1', 'G2')
+            r.clear()
+            paths, types = r.resolve(f['DS1'], 'A1')
+            self.assertEqual(paths.tolist(), ['/DS2', '/G2', None])
+
+    def test_benchmark(self):
+        records = objrefs.benchmark(ntargets=10, nrefs=100,
+                                    directory=self.tmpdir)
+        self.assertEqual([r['method'] for r in records],
+                         ['naive', 'resolver', 'cached'])
+        self.assertEqual(os.listdir(self.tmpdir), ['objrefs.h5'])
+
+
+class TestOpaque(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'opaque.h5')
+        # As in h5ex_t_opaque.
+        self.wdata = np.zeros((10,), dtype='V7')
+        for i in range(10):
+            self.wdata[i] = b'OPAQUE' + bytes([i % 10 + 48])
+        self.expected = [b'OPAQUE' + bytes([i % 10 + 48])
+                         for i in range(10)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_read(self):
+        with h5py.File(self.filename, 'w') as f:
+            dset = f.create_dataset('DS1', data=self.wdata)
+            dset.attrs.create('A1', self.wdata[:4])
+            f.create_dataset('DS2', data=self.wdata.reshape(5, 2))
+            f.create_dataset('empty', (0,), dtype='V7')
+            f.create_dataset('float', data=[1.0])
+
+        with h5py.File(self.filename, 'r') as f:
+            data = opaque.read(f['DS1'])
+            self.assertEqual(data.shape, (10, 7))
+            self.assertEqual(data.dtype, np.uint8)
+            records = opaque.Records(data)
+            self.assertEqual(len(records), 10)
+            self.assertEqual([bytes(r) for r in records], self.expected)
+            self.assertEqual(bytes(records[-1]), self.expected[-1])
+            with self.assertRaises(IndexError):
+                records[10]
+            # The records share the buffer's memory.
+            data[2, 0] = ord('X')
+            self.assertEqual(bytes(records[2]), b'XPAQUE2')
+
+            out = np.zeros((4, 7), dtype=np.uint8)
+            self.assertTrue(opaque.read(f['DS1'], 'A1', out=out) is out)
+            self.assertEqual([bytes(r) for r in opaque.Records(out)],
+                             self.expected[:4])
+            with self.assertRaises(ValueError):
+                opaque.read(f['DS1'], out=out)
+
+            data = opaque.read(f['DS2'])
+            self.assertEqual(data.shape, (5, 2, 7))
+            self.assertEqual([bytes(r) for r in opaque.Records(data)],
+                             self.expected)
+            self.assertEqual(opaque.read(f['empty']).shape, (0, 7))
+            self.assertEqual(opaque.tag(f['DS1']), b'')
+            with self.assertRaises(ValueError):
+                opaque.read(f['float'])
+            with self.assertRaises(ValueError):
+                opaque.Records(np.zeros(4))
+
+    def test_stream(self):
+        with h5py.File(self.filename, 'w') as f:
+            f.create_dataset('chunked', data=self.wdata, chunks=(4,))
+            f.create_dataset('contiguous', data=self.wdata)
+            f.create_dataset('2d', data=self.wdata.reshape(5, 2),
+                             chunks=(2, 2))
+
+        with h5py.File(self.filename, 'r') as f:
+            blocks = [(index, block.shape, [bytes(r) for r in
+                                            opaque.Records(block)])
+                      for index, block in opaque.stream(f['chunked'], 1, 9)]
+            # The blocks follow the chunks.
+            self.assertEqual([b[:2] for b in blocks],
+                             [(1, (3, 7)), (4, (4, 7)), (8, (1, 7))])
+            self.assertEqual(sum([b[2] for b in blocks], []),
+                             self.expected[1:9])
+
+            blocks = list(opaque.stream(f['contiguous'], block=3))
+            self.assertEqual([index for index, block in blocks],
+                             [0, 3, 6, 9])
+            self.assertEqual(len(list(opaque.stream(f['contiguous']))), 1)
+
+            rdata = []
+            for index, block in opaque.stream(f['2d']):
+                self.assertEqual(block.shape[1:], (2, 7))
+                rdata += [bytes(r) for r in opaque.Records(block)]
+            self.assertEqual(rdata, self.expected)
+
+    def test_benchmark(self):
+        records = opaque.benchmark(nrecords=1000, size=16, chunk=100,
+                                   directory=self.tmpdir)
+        self.assertEqual([r['method'] for r in records],
+                         ['tobytes', 'memoryview', 'stream'])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+
+class TestBulkattrs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'attrs.h5')
+        with h5py.File(self.filename, 'w') as f:
+            f.attrs['title'] = 'root'
+            dset = f.create_dataset('DS1', data=1)
+            dset.attrs['scale'] = 0.5
+            dset.attrs['units'] = 'm/s'
+            dset.attrs['shape'] = np.arange(3)
+            grp = f.create_group('G1')
+            grp.attrs['scale'] = 2
+            grp.attrs['shape'] = np.arange(4)
+            dset = grp.create_dataset('DS2', data=2)
+            dset.attrs['units'] = np.bytes_(b'km')
+            dset.attrs['empty'] = h5py.Empty('f')
+            f.create_dataset('bare', data=3)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_collect(self):
+        with h5py.File(self.filename, 'r') as f:
+            columns = bulkattrs.collect(f)
+            paths = list(columns['path'])
+            self.assertEqual(paths, ['/', '/DS1', '/G1', '/G1/DS2'])
+            self.assertEqual(sorted(columns),
+                             ['empty', 'path', 'scale', 'shape', 'title',
+                              'units'])
+            # Every value as attrs returns it.
+            for k, path in enumerate(paths):
+                attrs = f[path].attrs
+                for name, column in columns.items():
+                    if name == 'path':
+                        continue
+                    self.assertEqual(bool(np.ma.getmaskarray(column)[k]
+                                          .all()), name not in attrs)
+                    if name in attrs and name != 'empty':
+                        np.testing.assert_array_equal(
+                            np.asarray(column.data[k]), attrs[name])
+
+            # Values of one shape are stacked, others are objects.
+            self.assertEqual(columns['scale'].dtype, np.float64)
+            self.assertEqual(columns['scale'].tolist(),
+                             [None, 0.5, 2.0, None])
+            self.assertEqual(columns['shape'].dtype, object)
+            self.assertEqual(columns['units'].data[1], 'm/s')
+            self.assertEqual(columns['units'].data[3], b'km')
+            self.assertTrue(isinstance(columns['empty'].data[3], h5py.Empty))
+
+            columns = bulkattrs.collect(f['G1'], names=['units', b'scale'])
+            self.assertEqual(sorted(columns), ['path', 'scale', 'units'])
+            self.assertEqual(list(columns['path']), ['/G1', '/G1/DS2'])
+            self.assertEqual(columns['scale'].tolist(), [2, None])
+
+            columns = bulkattrs.collect(f, names=['missing'])
+            self.assertEqual(len(columns['path']), 0)
+            self.assertEqual(len(columns['missing']), 0)
+
+    def test_update(self):
+        with h5py.File(self.filename, 'r+') as f:
+            count = bulkattrs.update(f, [('DS1', 'scale', 1.5),
+                                         ('DS1', 'units', 'cm/s'),
+                                         ('G1', 'shape', np.arange(2)),
+                                         ('G1/DS2', 'empty', 4.0),
+                                         ('G1/DS2', 'units', b'mm'),
+                                         ('bare', 'new', 'added'),
+                                         ('/', 'title', 'renamed')])
+            self.assertEqual(count, 7)
+
+        with h5py.File(self.filename, 'r') as f:
+            self.assertEqual(f['DS1'].attrs['scale'], 1.5)
+            self.assertEqual(f['DS1'].attrs['units'], 'cm/s')
+            np.testing.assert_array_equal(f['G1'].attrs['shape'],
+                                          np.arange(2))
+            self.assertEqual(f['G1/DS2'].attrs['empty'], 4.0)
+            self.assertEqual(f['G1/DS2'].attrs['units'], b'mm')
+            self.assertEqual(f['bare'].attrs['new'], 'added')
+            self.assertEqual(f.attrs['title'], 'renamed')
+
+    def test_update_overflow(self):
+        # Values the existing type cannot hold recreate the attribute, as
+        # attrs[name] = value does; values it can hold keep the type.
+        with h5py.File(self.filename, 'r+') as f:
+            f['DS1'].attrs['small'] = np.array([1, 2], dtype='i2')
+            f['DS1'].attrs['word'] = np.int32(1)
+            f['DS1'].attrs['narrow'] = np.float32(1)
+            count = bulkattrs.update(f, [('DS1', 'small',
+                                          np.array([70000, 1])),
+                                         ('DS1', 'word', 2 ** 40),
+                                         ('DS1', 'narrow', 0.5),
+                                         ('G1', 'scale', 3)])
+            self.assertEqual(count, 4)
+
+        with h5py.File(self.filename, 'r') as f:
+            attrs = f['DS1'].attrs
+            np.testing.assert_array_equal(attrs['small'], [70000, 1])
+            self.assertEqual(attrs['word'], 2 ** 40)
+            self.assertEqual(attrs.get_id('narrow').dtype, np.float32)
+            self.assertEqual(attrs['narrow'], 0.5)
+            self.assertEqual(f['G1'].attrs['scale'], 3)
+
+    def test_files(self):
+        other = os.path.join(self.tmpdir, 'other.h5')
+        bulkattrs.make_file(other, 20)
+        updates = {self.filename: [('DS1', 'scale', 3.0)],
+                   other: [('DS000001', 'scale', 3.0)]}
+        counts = bulkattrs.update_files(updates, workers=1)
+        self.assertEqual(counts, {self.filename: 1, other: 1})
+
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            results = bulkattrs.collect_files([self.filename, other],
+                                              names=['scale'],
+                                              executor=executor)
+        self.assertEqual(results[0]['scale'].tolist(), [3.0, 2.0])
+        self.assertEqual(len(results[1]['path']), 20)
+        self.assertEqual(results[1]['scale'][1], 3.0)
+        self.assertEqual(results[1]['scale'][2], 1.0)
+
+    def test_benchmark(self):
+        records = bulkattrs.benchmark(nobjects=50, directory=self.tmpdir)
+        self.assertEqual([r['method'] for r in records], ['attrs', 'bulk'])
+        self.assertEqual(os.listdir(self.tmpdir), ['attrs.h5'])
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'catalog.h5')
+        with h5py.File(self.filename, 'w') as f:
+            f.create_dataset('G1/DS1', (10, 20), dtype='i4', chunks=(5, 5),
+                             compression='gzip', shuffle=True)
+            f.create_dataset('G1/sub/DS2', (3,), dtype='i4')
+            f.create_dataset('G1/sub/DS3', data=1.5)
+            f.create_dataset('G10/DS4', (4,), dtype='i4')
+            f['G1/T1'] = np.dtype('<i4')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def paths(self, rows):
+        return [p.decode('utf-8') for p in rows['path']]
+
+    def test_build(self):
+        cat = catalog.build(self.filename)
+        self.assertTrue(os.path.exists(catalog.sidecar(self.filename)))
+        self.assertEqual(self.paths(cat.records),
+                         ['/', '/G1', '/G1/DS1', '/G1/T1', '/G1/sub',
+                          '/G1/sub/DS2', '/G1/sub/DS3', '/G10', '/G10/DS4'])
+
+        rec = cat.records[2]
+        self.assertEqual(rec['type'], h5py.h5o.TYPE_DATASET)
+        self.assertEqual(rec['ndim'], 2)
+        self.assertEqual(tuple(rec['shape']), (10, 20))
+        self.assertEqual(tuple(rec['chunks']), (5, 5))
+        self.assertEqual(rec['dtype'], b'<i4')
+        self.assertEqual(rec['layout'], h5py.h5d.CHUNKED)
+        self.assertEqual(rec['filters'], b'shuffle,deflate')
+        with h5py.File(self.filename, 'r') as f:
+            self.assertEqual(rec['storage'],
+                             f['G1/DS1'].id.get_storage_size())
+        rec = cat.records[6]
+        self.assertEqual((rec['ndim'], rec['dtype'], rec['layout']),
+                         (0, b'<f8', h5py.h5d.CONTIGUOUS))
+        self.assertEqual(cat.records[1]['layout'], -1)
+        self.assertEqual(cat.records[3]['dtype'], b'<i4')
+
+    def test_null_dataspace(self):
+        with h5py.File(self.filename, 'a') as f:
+            f['G1/empty'] = h5py.Empty('f4')
+        cat = catalog.get(self.filename)
+        rec = cat.find('/G1', type='Dataset', dtype='f4')[0]
+        self.assertEqual(rec['path'], b'/G1/empty')
+        self.assertEqual(rec['ndim'], -1)
+        self.assertEqual(tuple(rec['shape']), (0, 0))
+
+    def test_find(self):
+        cat = catalog.get(self.filename)
+        self.assertEqual(self.paths(cat.under('/G1')),
+                         ['/G1/DS1', '/G1/T1', '/G1/sub', '/G1/sub/DS2',
+                          '/G1/sub/DS3'])
+        self.assertEqual(len(cat.under('/')), len(cat) - 1)
+        rows = cat.find('/G1', type='Dataset', dtype='int32')
+        self.assertEqual(self.paths(rows), ['/G1/DS1', '/G1/sub/DS2'])
+        rows = cat.find(type=h5py.h5o.TYPE_DATASET, dtype=np.int32)
+        self.assertEqual(self.paths(rows),
+                         ['/G1/DS1', '/G1/sub/DS2', '/G10/DS4'])
+        self.assertEqual(self.paths(cat.find(type='datatype')), ['/G1/T1'])
+        self.assertEqual(self.paths(cat.find(layout='chunked')),
+                         ['/G1/DS1'])
+        self.assertEqual(self.paths(cat.find(filter='deflate')),
+                         ['/G1/DS1'])
+        self.assertEqual(len(cat.find(filter='defl')), 0)
+        self.assertEqual(len(cat.find('/G2')), 0)
+        with self.assertRaises(ValueError):
+            cat.find(type='link')
+
+    def test_load(self):
+        path = os.path.join(self.tmpdir, 'index.npz')
+        self.assertTrue(catalog.load(self.filename, path) is None)
+        cat = catalog.get(self.filename, path)
+        self.assertFalse(os.path.exists(catalog.sidecar(self.filename)))
+        loaded = catalog.load(self.filename, path)
+        self.assertTrue(np.array_equal(loaded.records, cat.records))
+
+        # Changing the file invalidates the catalog.
+        with h5py.File(self.filename, 'a') as f:
+            f.create_dataset('G2/DS5', data=np.arange(100))
+        self.assertTrue(catalog.load(self.filename, path) is None)
+        cat = catalog.get(self.filename, path)
+        self.assertEqual(self.paths(cat.find('/G2')), ['/G2/DS5'])
+        self.assertEqual(len(catalog.load(self.filename, path)), len(cat))
+
+    def test_benchmark(self):
+        records = catalog.benchmark(ngroups=5, ndatasets=20,
+                                    directory=self.tmpdir)
+        self.assertEqual([r['method'] for r in records],
+                         ['visit', 'build', 'load'])
+        self.assertEqual([r['found'] for r in records], [10, 10, 10])
+        self.assertEqual(os.listdir(self.tmpdir), ['catalog.h5'])
+
+
+_visit = crawler.visit
+
+
+def _crashing_visit(filename):
+    # A visit that kills its worker on files named crash.h5.
+    if os.path.basename(filename) == 'crash.h5':
+        os._exit(1)
+    return _visit(filename)
+
+
+class TestCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.tmpdir, 'sub'))
+        self.good = [os.path.join(self.tmpdir, 'a.h5'),
+                     os.path.join(self.tmpdir, 'sub', 'b.hdf5')]
+        for filename in self.good:
+            with h5py.File(filename, 'w') as f:
+                f.create_dataset('G1/DS1', (2, 3), dtype='i4')
+                f['T1'] = np.dtype('f8')
+        self.bad = os.path.join(self.tmpdir, 'sub', 'c.h5')
+        with open(self.bad, 'w') as fh:
+            fh.write("not HDF5")
+        with open(os.path.join(self.tmpdir, 'notes.txt'), 'w') as fh:
+            fh.write("skipped")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_find_files(self):
+        self.assertEqual(list(crawler.find_files([self.tmpdir])),
+                         self.good + [self.bad])
+        pattern = os.path.join(self.tmpdir, '**', '*.h5')
+        self.assertEqual(list(crawler.find_files([pattern])),
+                         [self.good[0], self.bad])
+        self.assertEqual(list(crawler.find_files(['missing.h5'])),
+                         ['missing.h5'])
+
+    def test_visit(self):
+        records = crawler.visit(self.good[0])
+        self.assertEqual([(r['path'], r['type']) for r in records],
+                         [('/', 'Group'), ('/G1', 'Group'),
+                          ('/G1/DS1', 'Dataset'), ('/T1', 'Datatype')])
+        self.assertEqual(records[2]['shape'], [2, 3])
+        self.assertEqual(records[2]['dtype'], '<i4')
+        records = crawler.visit(self.bad)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['file'], self.bad)
+        self.assertTrue(records[0]['error'])
+
+    def test_visit_awkward(self):
+        # A null dataspace, in a file whose name is not valid UTF-8.
+        filename = os.path.join(os.fsencode(self.tmpdir), b'\xff.h5')
+        filename = os.fsdecode(filename)
+        with h5py.File(filename, 'w') as f:
+            f['empty'] = h5py.Empty('f4')
+        records = crawler.visit(filename)
+        self.assertEqual([(r['path'], r['type']) for r in records],
+                         [('/', 'Group'), ('/empty', 'Dataset')])
+        self.assertTrue(records[1]['shape'] is None)
+        self.assertEqual(records[1]['dtype'], '<f4')
+
+    def test_crawl(self):
+        sources = [self.tmpdir, os.path.join(self.tmpdir, 'missing.h5')]
+        records = list(crawler.crawl(sources, workers=1))
+        # The files in the order found, the bad ones reported in place.
+        self.assertEqual([r['file'] for r in records],
+                         [self.good[0]] * 4 + [self.good[1]] * 4 +
+                         [self.bad, sources[1]])
+        self.assertEqual([('error' in r) for r in records],
+                         [False] * 8 + [True] * 2)
+
+        with concurrent.futures.ProcessPoolExecutor(1) as executor:
+            records = list(crawler.crawl(self.good, executor=executor))
+        self.assertEqual(len(records), 8)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == 'fork',
+                         "workers must inherit the patched visit")
+    def test_worker_crash(self):
+        # Only the file that kills its worker is reported; the files lost
+        # with the pool are visited again.
+        crash = os.path.join(self.tmpdir, 'crash.h5')
+        with h5py.File(crash, 'w') as f:
+            f.create_group('G1')
+        sources = [self.good[0], crash, self.good[1], self.good[0],
+                   self.good[1]]
+        with unittest.mock.patch.object(crawler, 'visit', _crashing_visit):
+            records = list(crawler.crawl(sources, workers=2))
+            with concurrent.futures.ProcessPoolExecutor(2) as executor:
+                self.assertEqual(list(crawler.crawl(sources,
+                                                    executor=executor)),
+                                 records)
+        self.assertEqual([r['file'] for r in records],
+                         [self.good[0]] * 4 + [crash] +
+                         [self.good[1]] * 4 + [self.good[0]] * 4 +
+                         [self.good[1]] * 4)
+        self.assertEqual([('error' in r) for r in records],
+                         [False] * 4 + [True] + [False] * 12)
+        self.assertTrue('BrokenProcessPool' in records[4]['error'])
+
+    def test_run(self):
+        output = os.path.join(self.tmpdir, 'inventory.jsonl')
+        crawler.main([self.tmpdir, '--workers', '1', '--output', output])
+        with open(output) as fh:
+            records = [json.loads(line) for line in fh]
+        self.assertEqual(len(records), 9)
+
+        with open(os.devnull, 'w') as out:
+            counts = crawler.run([self.tmpdir], out, workers=1)
+        self.assertEqual((counts['files'], counts['objects'],
+                          counts['errors']), (3, 8, 1))
+        self.assertTrue(counts['files_per_s'] > 0)
+
+    def test_benchmark(self):
+        records = crawler.benchmark(nfiles=3, nobjects=6, workers=1,
+                                    directory=self.tmpdir)
+        self.assertEqual([r['method'] for r in records], ['serial', 'crawl'])
+        self.assertEqual([r['objects'] for r in records], [21, 21])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                         ['a.h5', 'notes.txt', 'sub'])
+
+
+if __name__ == "__main__":
+    unittest.main()
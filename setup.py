@@ -6,7 +6,10 @@ setup(name='hdf5examples',
       author='John Evans',
       author_email='john.g.evans.ne@gmail.com',
       url='https://github.com/quintusdias/hdf5examples',
-      packages=['hdf5examples', 'hdf5examples.tests'],
+      packages=['hdf5examples',
+                'hdf5examples.low_level', 'hdf5examples.low_level.tests',
+                'hdf5examples.high_level', 'hdf5examples.high_level.tests',
+                'hdf5examples.tools', 'hdf5examples.tools.tests'],
       package_data={'hdf5examples': ['data/*.h5']},
       license='MIT',
       platforms=['darwin'],